@@ -17,6 +17,8 @@ if settings.database_url.startswith("sqlite"):
 engine = create_engine(
     settings.database_url,
     connect_args=connect_args,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
     echo=settings.debug   # 開發模式顯示 SQL
 )
 
@@ -27,6 +29,25 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def warm_up_pool(size: int = None) -> int:
+    """
+    預先建立連線池中的連線（啟動時呼叫，避免第一批請求各自等待建立連線）
+
+    回傳實際建立的連線數
+    """
+    size = settings.db_pool_size if size is None else size
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
 def get_db():
     """
     取得資料庫 session（依賴注入用）
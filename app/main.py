@@ -3,14 +3,24 @@ Cat Claws 貓咪食堂 - FastAPI 主程式
 對應 Code.gs 的 Web App 功能
 """
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import orders, menu, analytics
 from app.config import get_settings
-from app.database import engine, Base
+from app.database import engine, SessionLocal, warm_up_pool
+from app.migrations import run_migrations
+from app.services.analytics_view_service import AnalyticsViewService
+from app.utils.assets import PrecompressedStaticFiles, asset_url
+from app.utils.compression import CompressionMiddleware
+from app.utils.order_cache import order_cache
+from app.utils.pages import RenderedPage, inline_json
+from app.services.menu_service import MenuService
+from app.services.today_service import TodayService
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
 
 # 設定日誌
 logging.basicConfig(
@@ -22,8 +32,53 @@ logger = logging.getLogger(__name__)
 # 取得設定
 settings = get_settings()
 
-# 建立資料表
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    應用程式生命週期
+
+    啟動：預熱連線池、載入選單快照、建立今天的彙總、預先渲染頁面、
+          啟動背景排程（選單版本檢查、今天的彙總同步、物化檢視更新）
+    關閉：伺服器已停止接受新請求並等待處理中的請求完成後，停止背景排程並釋放資料庫連線
+    """
+    logger.info(f"🐱 {settings.app_name} v{settings.app_version} 啟動中...")
+    # schema 遷移預設由部署流程執行（python scripts/init_db.py），不在匯入/啟動時連線資料庫
+    if settings.auto_migrate:
+        await asyncio.to_thread(run_migrations, engine)
+        logger.info("資料庫遷移已套用")
+
+    # 預熱連線池並載入選單快照，避免第一批請求負擔建立連線/載入選單的延遲
+    connections = await asyncio.to_thread(warm_up_pool)
+    await asyncio.to_thread(MenuService.refresh)
+    logger.info(f"資料庫連線池已預熱（{connections} 條連線）")
+
+    # 以一次查詢建立今天的即時彙總
+    if settings.today_aggregate_enabled:
+        await asyncio.to_thread(TodayService.sync_now)
+
+    # 預先渲染頁面
+    for page in (home_page, analytics_page):
+        page.render()
+
+    background_tasks = [asyncio.create_task(MenuService.refresh_loop(settings.menu_refresh_seconds))]
+    if settings.today_aggregate_enabled:
+        background_tasks.append(asyncio.create_task(TodayService.sync_loop(settings.today_sync_seconds)))
+    if settings.analytics_views_enabled and engine.dialect.name == "postgresql":
+        background_tasks.append(asyncio.create_task(
+            AnalyticsViewService.refresh_loop(settings.analytics_views_refresh_seconds)
+        ))
+
+    yield
+
+    logger.info("應用程式關閉中...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
+    engine.dispose()
+    logger.info("資料庫連線已釋放")
+
 
 # 建立 FastAPI 應用
 app = FastAPI(
@@ -31,9 +86,14 @@ app = FastAPI(
     version=settings.app_version,
     description="可愛的貓咪主題訂餐系統 🐾",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# 回應壓縮中介軟體（br / gzip）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
 # CORS 中介軟體
 app.add_middleware(
     CORSMiddleware,
@@ -43,11 +103,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 掛載靜態檔案
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# 掛載靜態檔案（build 後的雜湊檔案會依 Accept-Encoding 回傳預先壓縮版本）
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # 模板引擎
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_url
+
+
+def home_page_context() -> dict:
+    """首頁模板參數（選單資料內嵌時可省下載入後的 /api/menu/ 請求）"""
+    context = {"title": "🐾 Cat Claws 貓咪食堂", "menu_json": None}
+    if settings.inline_menu:
+        context["menu_json"] = inline_json(MenuService.get_menu_payload()[0])
+    return context
+
+
+# 頁面只在啟動時渲染；選單改變時重新渲染首頁，debug 模式下模板檔案改變也會重新渲染
+home_page = RenderedPage(
+    templates, "index.html", home_page_context,
+    version=lambda: MenuService.get_menu_payload()[1],
+    auto_reload=settings.debug
+)
+analytics_page = RenderedPage(templates, "analytics.html", dict, auto_reload=settings.debug)
 
 # 註冊路由
 app.include_router(orders.router)
@@ -61,19 +139,13 @@ async def home(request: Request):
     首頁
     對應 Code.gs doGet (line 9-15)
     """
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request, "title": "🐾 Cat Claws 貓咪食堂"}
-    )
+    return home_page.response(request)
 
 
 @app.get("/analytics", response_class=HTMLResponse)
 async def analytics_dashboard(request: Request):
     """分析報表後台頁面"""
-    return templates.TemplateResponse(
-        "analytics.html",
-        {"request": request}
-    )
+    return analytics_page.response(request)
 
 
 @app.get("/favicon.ico")
@@ -86,14 +158,27 @@ async def favicon():
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """健康檢查端點"""
-    return {
+    health = {
         "status": "healthy",
         "app": settings.app_name,
         "version": settings.app_version
     }
 
+    health["order_cache"] = order_cache.stats()
+    health["today_aggregate"] = TodayService.stats()
+
+    # 物化檢視距上次更新的秒數
+    if settings.analytics_views_enabled and engine.dialect.name == "postgresql":
+        db = SessionLocal()
+        try:
+            health["analytics_views_staleness_seconds"] = AnalyticsViewService.get_staleness(db)
+        finally:
+            db.close()
+
+    return health
+
 
 @app.get("/api")
 async def api_info():
@@ -111,19 +196,15 @@ async def api_info():
     }
 
 
-# 啟動事件
-@app.on_event("startup")
-async def startup_event():
-    logger.info(f"🐱 {settings.app_name} v{settings.app_version} 啟動中...")
-    logger.info("資料庫連線已建立")
-
-
-# 關閉事件
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("應用程式關閉中...")
-
-
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # 開發模式（DEBUG=True）自動重新載入；否則依 WEB_CONCURRENCY / CPU 核心數啟動多個 worker
+    # 正式環境建議使用 gunicorn -c gunicorn.conf.py app.main:app
+    if settings.debug:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        uvicorn.run(
+            "app.main:app", host="0.0.0.0", port=8000,
+            workers=settings.web_concurrency or os.cpu_count() or 1,
+            timeout_graceful_shutdown=30
+        )
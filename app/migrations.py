@@ -0,0 +1,238 @@
+"""
+資料庫 Schema 遷移
+依版本號順序執行，已執行過的版本記錄在 schema_migrations 資料表
+
+新增遷移：在檔案最下方加上 @migration("NNNN_描述") 的函式，
+函式內容需可重複執行（例如先檢查欄位/索引是否存在）。
+"""
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from app.database import Base
+from app.utils.timezone import local_date_hour, timezone_name, get_store_timezone
+from datetime import datetime
+from app.models.order import Order
+from app.utils.stores import DEFAULT_STORE_ID
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+def migration(version: str):
+    """註冊一個遷移步驟"""
+    def decorator(func):
+        MIGRATIONS.append((version, func))
+        return func
+    return decorator
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    """資料表是否已有該欄位"""
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def create_index(conn: Connection, table, name: str) -> None:
+    """建立模型上定義的索引（已存在則略過）"""
+    for index in table.indexes:
+        if index.name == name:
+            index.create(bind=conn, checkfirst=True)
+            return
+    raise ValueError(f"找不到索引定義：{name}")
+
+
+def run_migrations(engine: Engine) -> list:
+    """執行尚未套用的遷移，回傳本次執行的版本"""
+    applied_now = []
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # 多個 worker 同時啟動時只讓一個執行遷移
+            conn.execute(text("SELECT pg_advisory_xact_lock(20251229)"))
+
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(100) PRIMARY KEY, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+        for version, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+            logger.info(f"套用遷移：{version}")
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+                {"version": version}
+            )
+            applied_now.append(version)
+
+    return applied_now
+
+
+def recompute_local_time(conn: Connection, only_missing: bool = True) -> None:
+    """
+    以店家時區重新計算 orders.local_date / local_hour
+
+    only_missing=False 用於變更 store_timezone 後全部重算。
+    """
+    condition = "WHERE local_date IS NULL OR local_hour IS NULL" if only_missing else ""
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            text(
+                "UPDATE orders SET "
+                "local_date = (created_at AT TIME ZONE :tz)::date, "
+                "local_hour = EXTRACT(hour FROM created_at AT TIME ZONE :tz) "
+                + condition
+            ),
+            {"tz": timezone_name(get_store_timezone())}
+        )
+        return
+
+    rows = conn.execute(text(f"SELECT id, created_at FROM orders {condition}")).fetchall()
+    for order_id, created_at in rows:
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        local_date, local_hour = local_date_hour(created_at)
+        conn.execute(
+            text("UPDATE orders SET local_date = :local_date, local_hour = :local_hour WHERE id = :id"),
+            {"local_date": local_date, "local_hour": local_hour, "id": order_id}
+        )
+
+
+# ========== Migrations ==========
+
+@migration("0001_create_tables")
+def create_tables(conn: Connection):
+    """建立所有資料表"""
+    Base.metadata.create_all(bind=conn)
+
+
+@migration("0002_orders_local_time")
+def add_orders_local_time(conn: Connection):
+    """orders 新增店家當地日期/小時欄位並回填"""
+    if not has_column(conn, "orders", "local_date"):
+        conn.execute(text("ALTER TABLE orders ADD COLUMN local_date DATE"))
+    if not has_column(conn, "orders", "local_hour"):
+        conn.execute(text("ALTER TABLE orders ADD COLUMN local_hour SMALLINT"))
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_local_date ON orders (local_date)"))
+
+    recompute_local_time(conn)
+
+
+@migration("0003_orders_covering_indexes")
+def add_orders_covering_indexes(conn: Connection):
+    """分析查詢用的覆蓋索引，取代單欄的 created_at / local_date 索引"""
+    create_index(conn, Order.__table__, "ix_orders_created_at_covering")
+    create_index(conn, Order.__table__, "ix_orders_local_date_covering")
+    conn.execute(text("DROP INDEX IF EXISTS ix_orders_created_at"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_orders_local_date"))
+
+
+@migration("0004_analytics_materialized_views")
+def add_analytics_materialized_views(conn: Connection):
+    """分析用物化檢視（僅 PostgreSQL）"""
+    from app.services.analytics_view_service import AnalyticsViewService
+
+    Base.metadata.create_all(bind=conn)
+    if conn.dialect.name == "postgresql":
+        AnalyticsViewService.create_views(conn)
+
+
+@migration("0005_orders_store_id")
+def add_orders_store_id(conn: Connection):
+    """orders 新增分店代碼（既有訂單屬於預設分店），物化檢視改為依分店分組"""
+    from app.services.analytics_view_service import AnalyticsViewService
+
+    if not has_column(conn, "orders", "store_id"):
+        conn.execute(text(
+            f"ALTER TABLE orders ADD COLUMN store_id VARCHAR(20) NOT NULL DEFAULT '{DEFAULT_STORE_ID}'"
+        ))
+    create_index(conn, Order.__table__, "ix_orders_store_created_at_covering")
+
+    if conn.dialect.name == "postgresql":
+        AnalyticsViewService.drop_views(conn)
+        AnalyticsViewService.create_views(conn)
+
+
+@migration("0006_menu_items")
+def add_menu_items(conn: Connection):
+    """選單改存資料庫：建立 menu_items / menu_versions 並寫入初始選單"""
+    from app.models.menu import MenuItem, MenuVersion
+    from app.services.menu_service import default_menu_rows
+
+    Base.metadata.create_all(bind=conn, tables=[MenuItem.__table__, MenuVersion.__table__])
+
+    has_menu = conn.execute(
+        select(MenuItem.id).where(MenuItem.store_id == DEFAULT_STORE_ID).limit(1)
+    ).first() is not None
+    if not has_menu:
+        conn.execute(insert(MenuItem.__table__), default_menu_rows(DEFAULT_STORE_ID))
+
+    has_version = conn.execute(
+        select(MenuVersion.version).where(MenuVersion.store_id == DEFAULT_STORE_ID)
+    ).first() is not None
+    if not has_version:
+        conn.execute(insert(MenuVersion.__table__), {"store_id": DEFAULT_STORE_ID, "version": 1})
+
+
+@migration("0007_rate_limit_buckets")
+def add_rate_limit_buckets(conn: Connection):
+    """共用頻率限制狀態（RATE_LIMIT_BACKEND=database）"""
+    from app.models.rate_limit import RateLimitBucket
+
+    Base.metadata.create_all(bind=conn, tables=[RateLimitBucket.__table__])
+
+
+@migration("0008_order_archive")
+def add_order_archive(conn: Connection):
+    """訂單封存表與已封存訂單的彙總表，物化檢視改為合併彙總表"""
+    from app.models.archive import (
+        ArchivedOrder, DailyRevenueRollup, HourlyOrdersRollup, ItemSalesRollup, BeverageOptionsRollup
+    )
+    from app.services.analytics_view_service import AnalyticsViewService
+
+    Base.metadata.create_all(bind=conn, tables=[
+        ArchivedOrder.__table__, DailyRevenueRollup.__table__, HourlyOrdersRollup.__table__,
+        ItemSalesRollup.__table__, BeverageOptionsRollup.__table__
+    ])
+
+    if conn.dialect.name == "postgresql":
+        AnalyticsViewService.drop_views(conn)
+        AnalyticsViewService.create_views(conn)
+
+
+@migration("0009_item_pair_counts")
+def add_item_pair_counts(conn: Connection):
+    """品項組合統計表，並從既有訂單（含已封存）回填"""
+    from sqlalchemy.orm import Session
+    from app.models.analytics import ItemPairCount
+    from app.services.item_pair_service import ItemPairService
+
+    Base.metadata.create_all(bind=conn, tables=[ItemPairCount.__table__])
+
+    # Session 加入遷移的交易，回填的每批 commit 不會提早提交遷移
+    with Session(bind=conn) as db:
+        ItemPairService.rebuild(db)
+
+
+@migration("0010_daily_order_sketches")
+def add_daily_order_sketches(conn: Connection):
+    """每日訂單近似統計（顧客數 / 金額分位數），並為已結束的日期建立"""
+    from sqlalchemy.orm import Session
+    from app.models.analytics import DailyOrderSketch
+    from app.services.order_sketch_service import OrderSketchService
+
+    Base.metadata.create_all(bind=conn, tables=[DailyOrderSketch.__table__])
+
+    with Session(bind=conn) as db:
+        OrderSketchService.build_closed_days(db)
+
+
+@migration("0011_drop_item_pair_order_totals")
+def drop_item_pair_order_totals(conn: Connection):
+    """移除品項組合表中每天的總訂單數列（改從每日營收讀取）"""
+    conn.execute(text("DELETE FROM item_pair_counts WHERE item_a = '' AND item_b = ''"))
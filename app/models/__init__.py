@@ -1,3 +1,12 @@
 from .order import Order
+from .analytics import AnalyticsViewRefresh, ItemPairCount, DailyOrderSketch
+from .menu import MenuItem, MenuVersion
+from .rate_limit import RateLimitBucket
+from .archive import (
+    ArchivedOrder, DailyRevenueRollup, HourlyOrdersRollup, ItemSalesRollup, BeverageOptionsRollup
+)
 
-__all__ = ["Order"]
+__all__ = [
+    "Order", "AnalyticsViewRefresh", "ItemPairCount", "DailyOrderSketch", "MenuItem", "MenuVersion", "RateLimitBucket",
+    "ArchivedOrder", "DailyRevenueRollup", "HourlyOrdersRollup", "ItemSalesRollup", "BeverageOptionsRollup"
+]
@@ -0,0 +1,52 @@
+"""
+分析用資料模型（SQLAlchemy ORM）
+"""
+from sqlalchemy import Column, String, Date, DateTime, BigInteger, JSON, LargeBinary
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class AnalyticsViewRefresh(Base):
+    """物化檢視最後更新時間"""
+
+    __tablename__ = "analytics_view_refreshes"
+
+    view_name = Column(String(100), primary_key=True, comment="物化檢視名稱")
+    refreshed_at = Column(DateTime(timezone=True), nullable=False, comment="最後更新時間")
+
+    def __repr__(self):
+        return f"<AnalyticsViewRefresh {self.view_name}: {self.refreshed_at}>"
+
+
+class ItemPairCount(Base):
+    """
+    同一筆訂單中一起出現的品項組合數（分店 × 日期 × 品項對），建立訂單時遞增累加
+
+    item_a < item_b 為品項對；item_a == item_b 為包含該品項的訂單數
+    （當天的總訂單數從每日營收讀取，不在此累加）
+    """
+
+    __tablename__ = "item_pair_counts"
+
+    local_date = Column(Date, primary_key=True, comment="店家當地日期")
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    item_a = Column(String(100), primary_key=True, comment="餐點 ID（較小者）")
+    item_b = Column(String(100), primary_key=True, comment="餐點 ID（較大者）")
+    order_count = Column(BigInteger, nullable=False, default=0, comment="訂單數")
+
+
+class DailyOrderSketch(Base):
+    """
+    已結束日期的訂單近似統計（分店 × 日期），由 scripts/build_order_sketches.py 建立
+
+    合併任意區間的摘要即可估計不重複顧客數與訂單金額分位數（見 app/utils/sketches.py）
+    """
+
+    __tablename__ = "daily_order_sketches"
+
+    local_date = Column(Date, primary_key=True, comment="店家當地日期")
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    order_count = Column(BigInteger, nullable=False, default=0, comment="訂單數")
+    customer_hll = Column(LargeBinary, nullable=False, comment="顧客姓名的 HyperLogLog 暫存器")
+    amount_sketch = Column(JSON, nullable=False, comment="訂單金額的 DDSketch 區間計數")
+    built_at = Column(DateTime(timezone=True), server_default=func.now(), comment="建立時間")
@@ -0,0 +1,87 @@
+"""
+訂單封存資料模型（SQLAlchemy ORM）
+
+超過保留期限的訂單從 orders 移到 orders_archive，移出前先彙總到 rollup_* 資料表，
+歷史區間的分析結果不受影響（rollup 資料表的欄位與同名的物化檢視相同）
+"""
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, Date, DateTime, JSON, Text, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ArchivedOrder(Base):
+    """已封存的訂單（欄位與 orders 相同，保留原本的訂單 ID）"""
+
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        # 快照匯出依建立時間讀取封存訂單
+        Index("ix_orders_archive_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False, comment="原訂單 ID")
+    order_number = Column(String(20), unique=True, nullable=False, index=True, comment="訂單編號")
+    store_id = Column(String(20), nullable=False, comment="分店代碼")
+    customer_name = Column(String(100), nullable=False, comment="顧客姓名")
+    pickup_method = Column(String(20), nullable=False, comment="取餐方式（內用/外帶）")
+    items = Column(JSON, nullable=False, comment="餐點明細（JSON 格式）")
+    drinks = Column(JSON, comment="飲料明細（JSON 格式）")
+    total_amount = Column(Integer, nullable=False, comment="總金額")
+    notes = Column(Text, comment="備註")
+    created_at = Column(DateTime(timezone=True), nullable=False, comment="建立時間")
+    local_date = Column(Date, comment="店家當地日期")
+    local_hour = Column(SmallInteger, comment="店家當地小時 0-23")
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), comment="封存時間")
+
+    def __repr__(self):
+        return f"<ArchivedOrder {self.order_number}: {self.customer_name} - NT${self.total_amount}>"
+
+
+class DailyRevenueRollup(Base):
+    """已封存訂單的每日營收（分店 × 日期 × 取餐方式），對應 mv_daily_revenue"""
+
+    __tablename__ = "rollup_daily_revenue"
+
+    local_date = Column(Date, primary_key=True, comment="店家當地日期")
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    pickup_method = Column(String(20), primary_key=True, comment="取餐方式")
+    revenue = Column(BigInteger, nullable=False, default=0, comment="營收")
+    order_count = Column(BigInteger, nullable=False, default=0, comment="訂單數")
+
+
+class HourlyOrdersRollup(Base):
+    """已封存訂單的每小時訂單數（分店 × 日期 × 小時），對應 mv_hourly_orders"""
+
+    __tablename__ = "rollup_hourly_orders"
+
+    local_date = Column(Date, primary_key=True, comment="店家當地日期")
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    local_hour = Column(SmallInteger, primary_key=True, comment="店家當地小時 0-23")
+    revenue = Column(BigInteger, nullable=False, default=0, comment="營收")
+    order_count = Column(BigInteger, nullable=False, default=0, comment="訂單數")
+
+
+class ItemSalesRollup(Base):
+    """已封存訂單的商品銷量（分店 × 日期 × 分類 × 餐點），對應 mv_item_sales"""
+
+    __tablename__ = "rollup_item_sales"
+
+    local_date = Column(Date, primary_key=True, comment="店家當地日期")
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    category = Column(String(10), primary_key=True, comment="dish / drink")
+    item_id = Column(String(100), primary_key=True, comment="餐點 ID")
+    item_name = Column(String(100), nullable=False, comment="餐點名稱")
+    total_quantity = Column(BigInteger, nullable=False, default=0, comment="數量")
+    total_revenue = Column(BigInteger, nullable=False, default=0, comment="營收")
+    order_count = Column(BigInteger, nullable=False, default=0, comment="出現在幾筆明細")
+
+
+class BeverageOptionsRollup(Base):
+    """已封存訂單的飲料選項杯數（分店 × 日期 × 選項），對應 mv_beverage_options"""
+
+    __tablename__ = "rollup_beverage_options"
+
+    local_date = Column(Date, primary_key=True, comment="店家當地日期")
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    option_type = Column(String(20), primary_key=True, comment="ice_level / sweetness")
+    option = Column(String(20), primary_key=True, comment="選項")
+    drink_count = Column(BigInteger, nullable=False, default=0, comment="杯數")
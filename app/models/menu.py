@@ -0,0 +1,42 @@
+"""
+選單資料模型（SQLAlchemy ORM）
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+from app.utils.stores import DEFAULT_STORE_ID
+
+
+class MenuItem(Base):
+    """選單餐點（每家分店各自一份）"""
+
+    __tablename__ = "menu_items"
+    __table_args__ = (
+        UniqueConstraint("store_id", "item_id", name="uq_menu_items_store_item"),
+    )
+
+    id = Column(Integer, primary_key=True, comment="流水號")
+    store_id = Column(String(20), nullable=False, default=DEFAULT_STORE_ID, comment="分店代碼")
+    item_id = Column(String(20), nullable=False, comment="餐點 ID（訂單中使用）")
+    category = Column(String(20), nullable=False, comment="分類：mains/soups/desserts/drinks")
+    name = Column(String(100), nullable=False, comment="餐點名稱")
+    price = Column(Integer, nullable=False, comment="單價")
+    sort_order = Column(Integer, nullable=False, default=0, comment="同分類內的排序")
+    is_available = Column(Boolean, nullable=False, default=True, comment="是否供應中")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新時間")
+
+    def __repr__(self):
+        return f"<MenuItem {self.store_id}/{self.item_id}: {self.name} ${self.price}>"
+
+
+class MenuVersion(Base):
+    """各分店選單的版本號（每次修改選單都會加一，worker 以此判斷是否需要重新載入）"""
+
+    __tablename__ = "menu_versions"
+
+    store_id = Column(String(20), primary_key=True, comment="分店代碼")
+    version = Column(Integer, nullable=False, default=1, comment="版本號")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新時間")
+
+    def __repr__(self):
+        return f"<MenuVersion {self.store_id}: v{self.version}>"
@@ -1,18 +1,42 @@
 """
 訂單資料模型（SQLAlchemy ORM）
 """
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, DateTime, JSON, Text, Index, event
 from sqlalchemy.sql import func
 from app.database import Base
+from app.utils.stores import DEFAULT_STORE_ID
+from app.utils.timezone import local_date_hour, to_local
+from datetime import datetime, timezone
 
 
 class Order(Base):
     """訂單模型"""
 
     __tablename__ = "orders"
+    __table_args__ = (
+        # 分析查詢以 created_at 篩選、讀取金額/取餐方式/當地時段，
+        # INCLUDE 這些欄位後 PostgreSQL 可用 index-only scan，不必回表
+        Index(
+            "ix_orders_created_at_covering", "created_at",
+            postgresql_include=["id", "total_amount", "pickup_method", "local_date", "local_hour"]
+        ),
+        # 單一分店的分析只掃描該分店的索引範圍
+        Index(
+            "ix_orders_store_created_at_covering", "store_id", "created_at",
+            postgresql_include=["id", "total_amount", "pickup_method", "local_date", "local_hour"]
+        ),
+        Index(
+            "ix_orders_local_date_covering", "local_date", "local_hour",
+            postgresql_include=["id", "total_amount", "pickup_method"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, comment="訂單 ID")
     order_number = Column(String(20), unique=True, nullable=False, index=True, comment="訂單編號")
+    store_id = Column(
+        String(20), nullable=False, default=DEFAULT_STORE_ID,
+        server_default=DEFAULT_STORE_ID, comment="分店代碼"
+    )
     customer_name = Column(String(100), nullable=False, comment="顧客姓名")
     pickup_method = Column(String(20), nullable=False, comment="取餐方式（內用/外帶）")
     items = Column(JSON, nullable=False, comment="餐點明細（JSON 格式）")
@@ -22,9 +46,21 @@ class Order(Base):
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
-        index=True,
         comment="建立時間"
     )
+    local_date = Column(Date, comment="店家當地日期（分析分組用）")
+    local_hour = Column(SmallInteger, comment="店家當地小時 0-23（分析分組用）")
 
     def __repr__(self):
         return f"<Order {self.order_number}: {self.customer_name} - NT${self.total_amount}>"
+
+
+@event.listens_for(Order, "before_insert")
+def set_local_time_columns(mapper, connection, target):
+    """寫入前補上建立時間與店家當地日期/小時（時間統一以 UTC 儲存）"""
+    if target.created_at is None:
+        target.created_at = datetime.now(timezone.utc)
+    else:
+        target.created_at = to_local(target.created_at, timezone.utc)
+    if target.local_date is None or target.local_hour is None:
+        target.local_date, target.local_hour = local_date_hour(target.created_at)
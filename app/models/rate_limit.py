@@ -0,0 +1,21 @@
+"""
+請求頻率限制資料模型（SQLAlchemy ORM）
+"""
+from sqlalchemy import Column, String, Float
+from app.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    共用的頻率限制狀態（RATE_LIMIT_BACKEND=database 時使用）
+
+    每個用戶端 / 端點一列，只記錄理論到達時間（GCRA），多個 worker 共用同一份限制
+    """
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(200), primary_key=True, comment="限制對象（端點:用戶端 IP）")
+    tat = Column(Float, nullable=False, comment="下一個請求的理論到達時間（epoch 秒）")
+
+    def __repr__(self):
+        return f"<RateLimitBucket {self.key}: {self.tat}>"
@@ -2,32 +2,111 @@
 Analytics API Routes
 提供資料分析功能的 API 端點
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.services.analytics_service import AnalyticsService
+from app.services.forecast_service import ForecastService
 from app.schemas.analytics import (
     RevenueResponse,
+    RevenueSeriesResponse,
     AverageOrderValueResponse,
+    OrderValuePercentilesResponse,
+    StoreRevenueResponse,
     PopularItemsResponse,
+    ItemPairsResponse,
     PickupMethodRatioResponse,
     PeakHoursResponse,
-    BeveragePreferenceResponse
+    HeatmapResponse,
+    UniqueCustomersResponse,
+    BeveragePreferenceResponse,
+    ForecastResponse
 )
-from datetime import date as DateType
-from typing import Optional
+from app.config import get_settings
+from app.utils.http_cache import json_response
+from app.utils.rate_limit import ConcurrencyLimiter, RateLimiter
+from app.utils.stores import validate_store_id
+from app.utils.timezone import get_store_timezone, resolve_timezone, store_today
+from datetime import date as DateType, datetime, tzinfo as TzInfo
+from typing import Any, Callable, Optional
 import logging
 
-router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 分析查詢較重：限制每個用戶端的頻率，並限制每個 worker 同時處理的數量，
+# 忙碌時回 503 讓點餐 API 不受影響
+analytics_rate_limit = RateLimiter(
+    "analytics", settings.analytics_rate_limit_per_minute, settings.analytics_rate_limit_burst
+)
+analytics_concurrency = ConcurrencyLimiter(
+    "analytics", settings.analytics_max_concurrency,
+    settings.analytics_max_queue, settings.analytics_queue_timeout_seconds
+)
+
+router = APIRouter(
+    prefix="/api/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(analytics_rate_limit), Depends(analytics_concurrency)]
+)
+
+
+def _respond(request: Request, end_date: DateType, compute: Callable[[], Any],
+             tzinfo: Optional[TzInfo] = None) -> Response:
+    """
+    回傳帶 ETag 的分析結果
+
+    區間在（該時區的）今天之前結束時結果不會再變動，可長時間快取並直接命中記憶體；
+    包含今天的區間每次重新計算，但 ETag 相符時仍回 304
+    """
+    today = datetime.now(tzinfo or get_store_timezone()).date()
+    return json_response(request, compute, closed=end_date < today)
 
 
 # ========== Revenue Endpoints ==========
 
+@router.get("/revenue", response_model=RevenueSeriesResponse)
+def get_revenue(
+    request: Request,
+    start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
+    end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    granularity: str = Query("day", pattern="^(15m|hour|day|week|month)$", description="時間粒度: 15m/hour/day/week/month"),
+    tz: Optional[str] = Query(None, description="分組時區，例如 Asia/Taipei（預設為店家時區）"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
+    db: Session = Depends(get_db)
+):
+    """
+    取得依時間區間分組的營收
+
+    - **granularity**: 15m / hour / day / week（週一開始）/ month
+    - **tz**: IANA 時區名稱，日期範圍與分組都以該時區計算
+
+    返回區間內每個時間桶的營收與訂單數（沒有訂單的時間桶也會回傳 0）；
+    區間超過該粒度的上限時自動改用較粗的粒度（granularity_adapted 為 true）
+    """
+    try:
+        start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
+        validate_store_id(store_id)
+        return _respond(
+            request, end_date,
+            lambda: AnalyticsService.get_revenue(db, start_date, end_date, granularity, tz, store_id),
+            resolve_timezone(tz) if tz else None
+        )
+    except ValueError as e:
+        logger.error(f"Invalid revenue query: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting revenue: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
+
+
 @router.get("/revenue/daily", response_model=RevenueResponse)
-async def get_daily_revenue(
+def get_daily_revenue(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -36,12 +115,14 @@ async def get_daily_revenue(
     - **start_date**: 開始日期（可選，預設為 30 天前）
     - **end_date**: 結束日期（可選，預設為今天）
 
-    返回每日營收、訂單數量及總計
+    返回每日營收、訂單數量及總計；區間過長時自動改為每週或每月（granularity_adapted 為 true）
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_daily_revenue(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_period_revenue(
+            db, start_date, end_date, 'day', store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -51,20 +132,24 @@ async def get_daily_revenue(
 
 
 @router.get("/revenue/weekly", response_model=RevenueResponse)
-async def get_weekly_revenue(
+def get_weekly_revenue(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
     取得每週營收分析
 
-    返回以週為單位的營收統計
+    返回以週為單位的營收統計；區間過長時自動改為每月
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_weekly_revenue(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_period_revenue(
+            db, start_date, end_date, 'week', store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -74,9 +159,11 @@ async def get_weekly_revenue(
 
 
 @router.get("/revenue/monthly", response_model=RevenueResponse)
-async def get_monthly_revenue(
+def get_monthly_revenue(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -86,8 +173,10 @@ async def get_monthly_revenue(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_monthly_revenue(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_period_revenue(
+            db, start_date, end_date, 'month', store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -97,9 +186,11 @@ async def get_monthly_revenue(
 
 
 @router.get("/revenue/average-order-value", response_model=AverageOrderValueResponse)
-async def get_average_order_value(
+def get_average_order_value(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -109,8 +200,10 @@ async def get_average_order_value(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_average_order_value(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_average_order_value(
+            db, start_date, end_date, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -119,13 +212,65 @@ async def get_average_order_value(
         raise HTTPException(status_code=500, detail="系統錯誤")
 
 
+@router.get("/revenue/order-value-percentiles", response_model=OrderValuePercentilesResponse)
+def get_order_value_percentiles(
+    request: Request,
+    start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
+    end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
+    db: Session = Depends(get_db)
+):
+    """
+    取得訂單金額百分位數
+
+    返回指定期間訂單金額的 p50 / p90 / p99（由每日摘要合併的近似值，相對誤差 1% 內）
+    """
+    try:
+        start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_order_value_percentiles(
+            db, start_date, end_date, store_id=store_id
+        ))
+    except ValueError as e:
+        logger.error(f"Invalid date range: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting order value percentiles: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
+
+
+@router.get("/stores/revenue", response_model=StoreRevenueResponse)
+def get_store_revenue(
+    request: Request,
+    start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
+    end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    db: Session = Depends(get_db)
+):
+    """
+    取得各店家營收彙總
+
+    返回每家分店的營收、訂單數與平均客單價，以及所有店家的合計
+    """
+    try:
+        start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
+        return _respond(request, end_date, lambda: AnalyticsService.get_store_revenue(db, start_date, end_date))
+    except ValueError as e:
+        logger.error(f"Invalid date range: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting store revenue: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
+
+
 # ========== Popular Items Endpoints ==========
 
 @router.get("/popular-items/dishes", response_model=PopularItemsResponse)
-async def get_popular_dishes(
+def get_popular_dishes(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
     limit: int = Query(10, ge=1, le=100, description="返回前幾名商品"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -137,8 +282,10 @@ async def get_popular_dishes(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_popular_dishes(db, start_date, end_date, limit)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_popular_dishes(
+            db, start_date, end_date, limit, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -148,10 +295,12 @@ async def get_popular_dishes(
 
 
 @router.get("/popular-items/drinks", response_model=PopularItemsResponse)
-async def get_popular_drinks(
+def get_popular_drinks(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
     limit: int = Query(10, ge=1, le=100, description="返回前幾名商品"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -163,8 +312,10 @@ async def get_popular_drinks(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_popular_drinks(db, start_date, end_date, limit)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_popular_drinks(
+            db, start_date, end_date, limit, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -173,12 +324,46 @@ async def get_popular_drinks(
         raise HTTPException(status_code=500, detail="系統錯誤")
 
 
+@router.get("/popular-items/pairs", response_model=ItemPairsResponse)
+def get_item_pairs(
+    request: Request,
+    start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
+    end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    limit: int = Query(10, ge=1, le=100, description="返回前幾組"),
+    sort_by: str = Query("support", pattern="^(support|lift)$", description="排序方式: support/lift"),
+    min_orders: int = Query(1, ge=1, description="至少同時出現在幾筆訂單"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
+    db: Session = Depends(get_db)
+):
+    """
+    取得常一起購買的品項組合（設計套餐用）
+
+    - **sort_by**: support 依同時購買的訂單數排序；lift 依提升度排序（建議搭配 min_orders 排除偶然的組合）
+
+    返回每組的支持度、雙向信賴度與提升度
+    """
+    try:
+        start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_item_pairs(
+            db, start_date, end_date, limit, sort_by, min_orders, store_id=store_id
+        ))
+    except ValueError as e:
+        logger.error(f"Invalid date range: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting item pairs: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
+
+
 # ========== Customer Behavior Endpoints ==========
 
 @router.get("/customer-behavior/pickup-method-ratio", response_model=PickupMethodRatioResponse)
-async def get_pickup_method_ratio(
+def get_pickup_method_ratio(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -188,8 +373,10 @@ async def get_pickup_method_ratio(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_pickup_method_ratio(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_pickup_method_ratio(
+            db, start_date, end_date, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -199,9 +386,11 @@ async def get_pickup_method_ratio(
 
 
 @router.get("/customer-behavior/peak-hours", response_model=PeakHoursResponse)
-async def get_peak_hours(
+def get_peak_hours(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -211,8 +400,10 @@ async def get_peak_hours(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_peak_hours(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_peak_hours(
+            db, start_date, end_date, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -221,12 +412,69 @@ async def get_peak_hours(
         raise HTTPException(status_code=500, detail="系統錯誤")
 
 
+@router.get("/customer-behavior/heatmap", response_model=HeatmapResponse)
+def get_weekday_hour_heatmap(
+    request: Request,
+    start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
+    end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
+    db: Session = Depends(get_db)
+):
+    """
+    星期 × 時段熱度圖
+
+    返回 7 × 24 的訂單數、營收與平均客單價矩陣（[星期][小時]，週一開始），排班用
+    """
+    try:
+        start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_weekday_hour_heatmap(
+            db, start_date, end_date, store_id=store_id
+        ))
+    except ValueError as e:
+        logger.error(f"Invalid date range: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting heatmap: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
+
+
+@router.get("/customer-behavior/unique-customers", response_model=UniqueCustomersResponse)
+def get_unique_customers(
+    request: Request,
+    start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
+    end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    granularity: str = Query("day", pattern="^(day|week|month)$", description="時間粒度: day/week/month"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
+    db: Session = Depends(get_db)
+):
+    """
+    不重複顧客數
+
+    依日、週或月統計不重複的顧客姓名數（由每日 HyperLogLog 合併的近似值，相對標準誤差約 0.8%）
+    """
+    try:
+        start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_unique_customers(
+            db, start_date, end_date, granularity=granularity, store_id=store_id
+        ))
+    except ValueError as e:
+        logger.error(f"Invalid date range: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting unique customers: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
+
+
 # ========== Beverage Preference Endpoints ==========
 
 @router.get("/beverage-preferences/ice-level", response_model=BeveragePreferenceResponse)
-async def get_ice_level_preferences(
+def get_ice_level_preferences(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -236,8 +484,10 @@ async def get_ice_level_preferences(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_ice_level_preferences(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_ice_level_preferences(
+            db, start_date, end_date, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -247,9 +497,11 @@ async def get_ice_level_preferences(
 
 
 @router.get("/beverage-preferences/sweetness", response_model=BeveragePreferenceResponse)
-async def get_sweetness_preferences(
+def get_sweetness_preferences(
+    request: Request,
     start_date: Optional[DateType] = Query(None, description="開始日期 (YYYY-MM-DD)"),
     end_date: Optional[DateType] = Query(None, description="結束日期 (YYYY-MM-DD)"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -259,11 +511,41 @@ async def get_sweetness_preferences(
     """
     try:
         start_date, end_date = AnalyticsService.validate_date_range(start_date, end_date)
-        result = AnalyticsService.get_sweetness_preferences(db, start_date, end_date)
-        return result
+        validate_store_id(store_id)
+        return _respond(request, end_date, lambda: AnalyticsService.get_sweetness_preferences(
+            db, start_date, end_date, store_id=store_id
+        ))
     except ValueError as e:
         logger.error(f"Invalid date range: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting sweetness preferences: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="系統錯誤")
+
+
+# ========== Forecast Endpoints ==========
+
+@router.get("/forecast", response_model=ForecastResponse)
+def get_forecast(
+    request: Request,
+    horizon: int = Query(7, ge=1, le=28, description="預測天數（從今天開始）"),
+    store_id: Optional[str] = Query(None, description="店家代碼（未指定為所有店家合計）"),
+    db: Session = Depends(get_db)
+):
+    """
+    銷售預測
+
+    預測未來每天的訂單數、營收與各品項數量（備料用），以每週季節性的指數平滑擬合過去的每日彙總；
+    模型快取在伺服器上，每天只遞增更新一次
+    """
+    try:
+        validate_store_id(store_id)
+        return _respond(request, store_today(), lambda: ForecastService.get_forecast(
+            db, horizon=horizon, store_id=store_id
+        ))
+    except ValueError as e:
+        logger.error(f"Invalid forecast request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting forecast: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
@@ -2,25 +2,101 @@
 選單 API 路由
 對應 Code.gs getMenuData
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, status
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import get_db
+from app.schemas.menu import MenuItemUpdate, MenuItemAdminResponse
 from app.services.menu_service import MenuService
+from app.utils.http_cache import cached_response
+from app.utils.stores import DEFAULT_STORE_ID, validate_store_id
+from typing import Optional
+import logging
+import secrets
 
 router = APIRouter(prefix="/api/menu", tags=["menu"])
+logger = logging.getLogger(__name__)
+
+# 價格可由管理 API 即時修改，每次都向伺服器確認（ETag 相符時回 304，成本很低），
+# 避免購物車帶著舊價格送出而被「餐點價格不符」拒絕
+MENU_CACHE_CONTROL = "no-cache"
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """管理 API 驗證：X-Admin-Key 需與 ADMIN_API_KEY 相同"""
+    admin_api_key = get_settings().admin_api_key
+    if not admin_api_key:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="管理 API 未啟用")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, admin_api_key):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="管理金鑰錯誤")
 
 
 @router.get("/")
-async def get_menu():
+async def get_menu(
+    request: Request,
+    store_id: str = Query(DEFAULT_STORE_ID, description="店家代碼")
+):
     """
-    取得完整選單資料
+    取得指定店家的完整選單資料
     對應 Code.gs getMenuData()
+
+    帶 ETag，If-None-Match 相符時回 304
     """
-    return MenuService.get_menu_data()
+    try:
+        validate_store_id(store_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    body, etag = MenuService.get_menu_payload(store_id)
+    return cached_response(request, body, etag, MENU_CACHE_CONTROL)
 
 
 @router.get("/item/{item_id}")
-async def get_menu_item(item_id: str):
+async def get_menu_item(item_id: str, store_id: str = Query(DEFAULT_STORE_ID, description="店家代碼")):
     """根據 ID 取得單一餐點資料"""
-    item = MenuService.get_item_by_id(item_id)
+    try:
+        validate_store_id(store_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    item = MenuService.get_item_by_id(item_id, store_id)
     if not item:
         return {"error": "找不到該餐點"}
     return item
+
+
+@router.put("/admin/items/{item_id}", response_model=MenuItemAdminResponse, dependencies=[Depends(require_admin)])
+def upsert_menu_item(
+    item: MenuItemUpdate,
+    item_id: str = Path(..., min_length=1, max_length=20, description="餐點 ID"),
+    store_id: str = Query(DEFAULT_STORE_ID, description="店家代碼"),
+    db: Session = Depends(get_db)
+):
+    """
+    新增或修改餐點（需帶 X-Admin-Key 標頭）
+
+    - 下架餐點：available 設為 false
+    - 修改後立即套用到本 worker，其他 worker 在 MENU_REFRESH_SECONDS 秒內載入
+    """
+    try:
+        validate_store_id(store_id)
+        db_item = MenuService.upsert_item(
+            db, store_id, item_id, item.category, item.name, item.price,
+            sort_order=item.sortOrder, is_available=item.available
+        )
+        logger.info(f"選單已更新：{store_id}/{item_id} {item.name} ${item.price}")
+        return MenuItemAdminResponse(
+            storeId=db_item.store_id,
+            id=db_item.item_id,
+            category=db_item.category,
+            name=db_item.name,
+            price=db_item.price,
+            sortOrder=db_item.sort_order,
+            available=db_item.is_available,
+            menuVersion=MenuService.get_snapshot().versions.get(store_id, 0)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"更新選單時發生錯誤：{e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="系統錯誤")
@@ -3,18 +3,26 @@
 對應 Code.gs submitOrder
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.orm import Session
+from app.config import get_settings
 from app.database import get_db
 from app.schemas.order import OrderCreate, OrderSuccessResponse, OrderErrorResponse
+from app.services.menu_service import MenuService
 from app.services.order_service import OrderService
+from app.utils.rate_limit import RateLimiter
 import logging
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+# 同一個用戶端短時間內重複送單時回 429
+order_rate_limit = RateLimiter("orders", settings.order_rate_limit_per_minute, settings.order_rate_limit_burst)
 
-@router.post("/", response_model=OrderSuccessResponse)
-async def create_order(
+
+@router.post("/", response_model=OrderSuccessResponse, dependencies=[Depends(order_rate_limit)])
+def create_order(
     order: OrderCreate,
     db: Session = Depends(get_db)
 ):
@@ -23,8 +31,11 @@ async def create_order(
     對應 Code.gs submitOrder (line 29-163)
     """
     try:
+        # 驗證與建立訂單使用同一份選單快照，處理期間選單更新也不影響這筆訂單
+        menu = MenuService.get_snapshot()
+
         # 1. 驗證餐點項目和價格（對應 Code.gs line 105-113）
-        is_valid, error_msg = OrderService.validate_order_items(order.items)
+        is_valid, error_msg = OrderService.validate_order_items(order.items, order.storeId, menu)
         if not is_valid:
             logger.warning(f"訂單驗證失敗：{error_msg}")
             raise HTTPException(
@@ -41,7 +52,7 @@ async def create_order(
             )
 
         # 3. 建立訂單（對應 OrderService.gs saveOrder）
-        db_order = OrderService.create_order(db, order)
+        db_order = OrderService.create_order(db, order, menu)
 
         logger.info(f"訂單建立成功：{db_order.order_number}")
 
@@ -66,26 +77,26 @@ async def create_order(
 
 
 @router.get("/")
-async def get_orders(
+def get_orders(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
     """取得訂單列表"""
     orders = OrderService.get_orders(db, skip=skip, limit=limit)
-    return orders
+    return ORJSONResponse([OrderService.serialize_order(order) for order in orders])
 
 
 @router.get("/{order_number}")
-async def get_order(
+def get_order(
     order_number: str,
     db: Session = Depends(get_db)
 ):
-    """根據訂單編號查詢訂單"""
-    order = OrderService.get_order_by_number(db, order_number)
-    if not order:
+    """根據訂單編號查詢訂單（訂單不會再變動，回應快取在記憶體）"""
+    body = OrderService.get_order_json(db, order_number)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="找不到該訂單"
         )
-    return order
+    return Response(content=body, media_type="application/json")
@@ -2,8 +2,8 @@
 Analytics API Response Schemas
 """
 from pydantic import BaseModel, Field
-from typing import List
-from datetime import date as DateType
+from typing import List, Optional
+from datetime import date as DateType, datetime
 
 
 # ========== Revenue Analysis Schemas ==========
@@ -18,6 +18,8 @@ class RevenueDataPoint(BaseModel):
 class RevenueResponse(BaseModel):
     """Revenue analysis response"""
     period: str = Field(..., description="時間週期: daily/weekly/monthly")
+    requested_period: Optional[str] = Field(None, description="要求的時間週期（區間過長時 period 會改用較粗的週期）")
+    granularity_adapted: bool = Field(False, description="是否因區間過長而改用較粗的週期")
     start_date: DateType = Field(..., description="開始日期")
     end_date: DateType = Field(..., description="結束日期")
     data: List[RevenueDataPoint] = Field(..., description="營收資料點列表")
@@ -25,6 +27,26 @@ class RevenueResponse(BaseModel):
     total_orders: int = Field(..., description="總訂單數")
 
 
+class RevenueBucket(BaseModel):
+    """Single time bucket of the revenue series"""
+    bucket_start: datetime = Field(..., description="區間開始時間（當地時間，含時區）")
+    revenue: int = Field(..., description="總營收 (NT$)")
+    order_count: int = Field(..., description="訂單數量")
+
+
+class RevenueSeriesResponse(BaseModel):
+    """Time-bucketed revenue response (empty buckets included)"""
+    granularity: str = Field(..., description="時間粒度: 15m/hour/day/week/month")
+    requested_granularity: Optional[str] = Field(None, description="要求的時間粒度")
+    granularity_adapted: bool = Field(False, description="是否因區間過長而改用較粗的粒度")
+    timezone: str = Field(..., description="分組使用的時區")
+    start_date: DateType = Field(..., description="開始日期")
+    end_date: DateType = Field(..., description="結束日期")
+    data: List[RevenueBucket] = Field(..., description="營收資料點列表（含無訂單的區間）")
+    total_revenue: int = Field(..., description="總營收 (NT$)")
+    total_orders: int = Field(..., description="總訂單數")
+
+
 class AverageOrderValueResponse(BaseModel):
     """Average order value response"""
     start_date: DateType = Field(..., description="開始日期")
@@ -34,6 +56,34 @@ class AverageOrderValueResponse(BaseModel):
     total_revenue: int = Field(..., description="總營收 (NT$)")
 
 
+class OrderValuePercentilesResponse(BaseModel):
+    """Approximate order value percentiles response (merged daily DDSketches)"""
+    start_date: DateType = Field(..., description="開始日期")
+    end_date: DateType = Field(..., description="結束日期")
+    total_orders: int = Field(..., description="總訂單數")
+    p50: Optional[float] = Field(None, description="訂單金額中位數 (NT$，近似值)")
+    p90: Optional[float] = Field(None, description="訂單金額第 90 百分位數 (NT$，近似值)")
+    p99: Optional[float] = Field(None, description="訂單金額第 99 百分位數 (NT$，近似值)")
+    relative_accuracy: float = Field(..., description="百分位數的相對誤差上限")
+
+
+class StoreRevenue(BaseModel):
+    """Revenue of a single store"""
+    store_id: str = Field(..., description="店家代碼")
+    revenue: int = Field(..., description="總營收 (NT$)")
+    order_count: int = Field(..., description="訂單數量")
+    average_order_value: float = Field(..., description="平均客單價 (NT$)")
+
+
+class StoreRevenueResponse(BaseModel):
+    """Per-store revenue rollup response"""
+    start_date: DateType = Field(..., description="開始日期")
+    end_date: DateType = Field(..., description="結束日期")
+    stores: List[StoreRevenue] = Field(..., description="各店家營收")
+    total_revenue: int = Field(..., description="所有店家總營收 (NT$)")
+    total_orders: int = Field(..., description="所有店家總訂單數")
+
+
 # ========== Popular Items Schemas ==========
 
 class PopularItem(BaseModel):
@@ -53,6 +103,28 @@ class PopularItemsResponse(BaseModel):
     items: List[PopularItem] = Field(..., description="熱門商品列表")
 
 
+class ItemPairStats(BaseModel):
+    """Co-occurrence statistics of two items bought in the same order"""
+    item_a_id: str = Field(..., description="餐點 A 的 ID")
+    item_a_name: str = Field(..., description="餐點 A 的名稱")
+    item_b_id: str = Field(..., description="餐點 B 的 ID")
+    item_b_name: str = Field(..., description="餐點 B 的名稱")
+    order_count: int = Field(..., description="同時包含兩者的訂單數")
+    support: float = Field(..., description="支持度（佔全部訂單的比例）")
+    confidence_a_to_b: float = Field(..., description="信賴度：買 A 的訂單中也買 B 的比例")
+    confidence_b_to_a: float = Field(..., description="信賴度：買 B 的訂單中也買 A 的比例")
+    lift: float = Field(..., description="提升度（>1 表示比隨機搭配更常一起購買）")
+
+
+class ItemPairsResponse(BaseModel):
+    """Item pair co-occurrence response"""
+    start_date: DateType = Field(..., description="開始日期")
+    end_date: DateType = Field(..., description="結束日期")
+    total_orders: int = Field(..., description="總訂單數")
+    sort_by: str = Field(..., description="排序方式（support / lift）")
+    pairs: List[ItemPairStats] = Field(..., description="品項組合")
+
+
 # ========== Customer Behavior Schemas ==========
 
 class PickupMethodStats(BaseModel):
@@ -87,6 +159,64 @@ class PeakHoursResponse(BaseModel):
     peak_hour_orders: int = Field(..., description="尖峰時段訂單數")
 
 
+class HeatmapResponse(BaseModel):
+    """Weekday x hour-of-day heatmap response (rows are weekdays, columns are hours 0-23)"""
+    start_date: DateType = Field(..., description="開始日期")
+    end_date: DateType = Field(..., description="結束日期")
+    weekdays: List[str] = Field(..., description="列標籤（週一至週日）")
+    order_counts: List[List[int]] = Field(..., description="訂單數 [星期][小時]")
+    revenue: List[List[int]] = Field(..., description="營收 [星期][小時] (NT$)")
+    average_basket: List[List[float]] = Field(..., description="平均客單價 [星期][小時] (NT$)")
+    total_orders: int = Field(..., description="總訂單數")
+    total_revenue: int = Field(..., description="總營收 (NT$)")
+
+
+class UniqueCustomersBucket(BaseModel):
+    """Approximate distinct customers of a single day/week/month"""
+    bucket_start: DateType = Field(..., description="區間開始日期")
+    unique_customers: int = Field(..., description="不重複顧客數（近似值）")
+    order_count: int = Field(..., description="訂單數量")
+
+
+class UniqueCustomersResponse(BaseModel):
+    """Approximate distinct customers response (merged daily HyperLogLogs, empty buckets included)"""
+    granularity: str = Field(..., description="時間粒度: day/week/month")
+    start_date: DateType = Field(..., description="開始日期")
+    end_date: DateType = Field(..., description="結束日期")
+    data: List[UniqueCustomersBucket] = Field(..., description="各區間的不重複顧客數")
+    unique_customers: int = Field(..., description="整個區間的不重複顧客數（近似值）")
+    total_orders: int = Field(..., description="總訂單數")
+    relative_error: float = Field(..., description="顧客數的相對標準誤差")
+
+
+# ========== Forecast Schemas ==========
+
+class ItemForecast(BaseModel):
+    """Forecast quantity of a single menu item"""
+    item_id: str = Field(..., description="餐點 ID")
+    item_name: str = Field(..., description="餐點名稱")
+    category: str = Field(..., description="分類: dish/drink")
+    quantity: float = Field(..., description="預測數量")
+
+
+class DailyForecast(BaseModel):
+    """Forecast of a single day"""
+    date: DateType = Field(..., description="日期")
+    weekday: str = Field(..., description="星期")
+    orders: float = Field(..., description="預測訂單數")
+    revenue: int = Field(..., description="預測營收 (NT$)")
+    items: List[ItemForecast] = Field(..., description="各品項預測數量（依數量排序）")
+
+
+class ForecastResponse(BaseModel):
+    """Daily sales forecast response (weekly seasonal exponential smoothing)"""
+    store_id: Optional[str] = Field(None, description="店家代碼（未指定為所有店家合計）")
+    horizon: int = Field(..., description="預測天數")
+    history_start: DateType = Field(..., description="擬合使用的第一天")
+    fitted_through: DateType = Field(..., description="擬合使用的最後一天（昨天）")
+    data: List[DailyForecast] = Field(..., description="每天的預測（從今天開始）")
+
+
 # ========== Beverage Preference Schemas ==========
 
 class PreferenceStats(BaseModel):
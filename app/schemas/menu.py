@@ -0,0 +1,32 @@
+"""
+選單管理 Schema（Pydantic）
+"""
+from pydantic import BaseModel, Field
+
+
+class MenuItemUpdate(BaseModel):
+    """新增或修改餐點的請求資料"""
+    category: str = Field(..., pattern="^(mains|soups|desserts|drinks)$", description="分類：mains/soups/desserts/drinks")
+    name: str = Field(..., min_length=1, max_length=100, description="餐點名稱")
+    price: int = Field(..., gt=0, description="單價")
+    sortOrder: int = Field(0, alias="sortOrder", description="同分類內的排序")
+    available: bool = Field(True, description="是否供應中")
+
+    model_config = {
+        "populate_by_name": True,
+        "json_schema_extra": {
+            "example": {"category": "mains", "name": "貓爪咖哩飯", "price": 130, "sortOrder": 0, "available": True}
+        }
+    }
+
+
+class MenuItemAdminResponse(BaseModel):
+    """餐點修改結果"""
+    storeId: str = Field(..., description="店家代碼")
+    id: str = Field(..., description="餐點 ID")
+    category: str = Field(..., description="分類")
+    name: str = Field(..., description="餐點名稱")
+    price: int = Field(..., description="單價")
+    sortOrder: int = Field(..., description="同分類內的排序")
+    available: bool = Field(..., description="是否供應中")
+    menuVersion: int = Field(..., description="修改後的選單版本號")
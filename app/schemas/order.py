@@ -3,36 +3,30 @@
 對應原本 GAS Code.gs 中的 submitOrder 驗證邏輯
 """
 from pydantic import BaseModel, Field, field_validator
+from app.utils.stores import DEFAULT_STORE_ID, validate_store_id
 from typing import List, Optional
 from datetime import datetime
 
+# 飲料選項
+TEMPERATURE_OPTIONS = ['正常冰', '少冰', '微冰', '去冰', '溫', '熱']
+SWEETNESS_OPTIONS = ['正常糖', '少糖', '半糖', '微糖', '無糖']
+
 
 class MenuItem(BaseModel):
     """餐點項目"""
-    id: str = Field(..., description="餐點 ID")
+    id: str = Field(..., min_length=1, max_length=20, description="餐點 ID（是否存在於該店家選單由 OrderService 驗證）")
     name: str = Field(..., min_length=1, max_length=100, description="餐點名稱")
     quantity: int = Field(..., gt=0, le=99, description="數量（1-99）")
     price: int = Field(..., gt=0, description="單價")
     temperature: Optional[str] = Field(None, description="溫度（飲料適用）")
     sweetness: Optional[str] = Field(None, description="甜度（飲料適用）")
 
-    @field_validator('id')
-    @classmethod
-    def validate_item_id(cls, v):
-        """驗證餐點 ID（對應 Code.gs line 82-94）"""
-        valid_ids = ['m1', 'm2', 'm3', 'm4', 's1', 's2', 's3',
-                     'd1', 'd2', 'd3', 'd4', 'dr1', 'dr2', 'dr3', 'dr4', 'dr5']
-        if v not in valid_ids:
-            raise ValueError('無效的餐點 ID')
-        return v
-
     @field_validator('temperature')
     @classmethod
     def validate_temperature(cls, v):
         """驗證溫度選項"""
         if v is not None:
-            valid_temps = ['正常冰', '少冰', '微冰', '去冰', '溫', '熱']
-            if v not in valid_temps:
+            if v not in TEMPERATURE_OPTIONS:
                 raise ValueError('無效的溫度選項')
         return v
 
@@ -41,8 +35,7 @@ class MenuItem(BaseModel):
     def validate_sweetness(cls, v):
         """驗證甜度選項"""
         if v is not None:
-            valid_sweetness = ['正常糖', '少糖', '半糖', '微糖', '無糖']
-            if v not in valid_sweetness:
+            if v not in SWEETNESS_OPTIONS:
                 raise ValueError('無效的甜度選項')
         return v
 
@@ -59,6 +52,7 @@ class OrderCreate(BaseModel):
     note: Optional[str] = Field(None, max_length=200, description="備註")
     items: List[MenuItem] = Field(..., min_length=1, max_length=50, description="餐點項目")
     totalAmount: int = Field(..., gt=0, alias="totalAmount", description="總金額")
+    storeId: str = Field(DEFAULT_STORE_ID, alias="storeId", description="店家代碼")
 
     @field_validator('customerName')
     @classmethod
@@ -80,6 +74,12 @@ class OrderCreate(BaseModel):
             raise ValueError('取餐方式必須是「內用」或「外帶」')
         return v
 
+    @field_validator('storeId')
+    @classmethod
+    def validate_store(cls, v):
+        """驗證店家代碼"""
+        return validate_store_id(v)
+
     @field_validator('note')
     @classmethod
     def sanitize_note(cls, v):
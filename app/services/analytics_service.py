@@ -2,11 +2,110 @@
 Analytics Service - Business logic for data analysis
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func, cast, literal_column, Integer
+from app.models.analytics import ItemPairCount
 from app.models.order import Order
-from datetime import date, datetime, timedelta
+from app.services.menu_service import MenuService
+from app.services.order_sketch_service import OrderSketchService
+from app.services.snapshot_service import SnapshotAnalyticsBackend
+from app.services.analytics_view_service import AnalyticsViewBackend
+from app.services.archive_service import RollupAnalyticsBackend
+from app.services.today_service import TodayAnalyticsBackend
+from app.config import get_settings
+from app.utils.heatmap import heatmap_result
+from app.utils.sketches import DDSketch, HyperLogLog, DDSKETCH_RELATIVE_ACCURACY, HLL_RELATIVE_ERROR
+from app.utils.stores import DEFAULT_STORE_ID, store_revenue_result
+from app.utils.timezone import (
+    resolve_timezone, timezone_name, local_day_bounds, to_local,
+    get_store_timezone, store_today
+)
+from datetime import date, datetime, time, timedelta
 from typing import List, Dict, Tuple, Optional
-import pandas as pd
+from contextlib import contextmanager
+from functools import wraps
+
+# Bucket widths for get_revenue (month is handled separately)
+REVENUE_GRANULARITIES = {
+    '15m': timedelta(minutes=15),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': None
+}
+
+# Finest to coarsest; over-long ranges are moved along this list
+GRANULARITY_ORDER = ['15m', 'hour', 'day', 'week', 'month']
+
+# Period names of the legacy /revenue/daily|weekly|monthly responses
+REVENUE_PERIODS = {'day': 'daily', 'week': 'weekly', 'month': 'monthly'}
+
+# Accelerator backends (e.g. Parquet snapshots), tried in registration order;
+# live queries are used when none of them can serve the range
+_accelerators = []
+
+
+def register_accelerator(backend) -> None:
+    """
+    Register an analytics accelerator backend
+
+    A backend provides can_serve(db, start_date, end_date) plus analytics
+    methods with the same names and signatures as AnalyticsService.
+    """
+    _accelerators.append(backend)
+
+
+def find_accelerator(name: str, db: Session, start_date: date, end_date: date):
+    """First registered backend that implements `name` and can serve the range, if any"""
+    for backend in _accelerators:
+        if hasattr(backend, name) and backend.can_serve(db, start_date, end_date):
+            return backend
+    return None
+
+
+@contextmanager
+def live_queries_only():
+    """
+    Temporarily bypass every registered accelerator so analytics methods run
+    their live queries against orders (used by scripts/explain_analytics.py)
+    """
+    saved = list(_accelerators)
+    _accelerators.clear()
+    try:
+        yield
+    finally:
+        _accelerators[:] = saved
+
+
+def check_live_range(name: str, start_date: date, end_date: date) -> None:
+    """
+    Reject ranges too long to scan live
+
+    Limits come from ANALYTICS_MAX_LIVE_RANGE_DAYS (method name -> days,
+    with a "default" entry); ranges an accelerator can serve are not limited.
+    """
+    limits = get_settings().analytics_max_live_range_days
+    limit = limits.get(name, limits.get('default'))
+    days = (end_date - start_date).days + 1
+    if limit and days > limit:
+        raise ValueError(f"查詢區間過長：最多 {limit} 天（目前 {days} 天）")
+
+
+def accelerated(func):
+    """
+    Route an analytics method to the first accelerator that can serve the range,
+    falling back to the live query within the live range limit
+    """
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(db: Session, start_date: date, end_date: date, *args, **kwargs):
+        backend = find_accelerator(name, db, start_date, end_date)
+        if backend is not None:
+            return getattr(backend, name)(db, start_date, end_date, *args, **kwargs)
+        check_live_range(name, start_date, end_date)
+        return func(db, start_date, end_date, *args, **kwargs)
+
+    return wrapper
 
 
 class AnalyticsService:
@@ -16,8 +115,8 @@ class AnalyticsService:
 
     @staticmethod
     def get_default_date_range() -> Tuple[date, date]:
-        """Get default date range (last 30 days)"""
-        end_date = date.today()
+        """Get default date range (last 30 days, store-local)"""
+        end_date = store_today()
         start_date = end_date - timedelta(days=30)
         return start_date, end_date
 
@@ -30,169 +129,300 @@ class AnalyticsService:
         if start_date > end_date:
             raise ValueError("start_date 必須早於或等於 end_date")
 
-        if end_date > date.today():
-            end_date = date.today()
+        today = store_today()
+        if end_date > today:
+            end_date = today
 
         return start_date, end_date
 
     @staticmethod
-    def get_orders_in_range(db: Session, start_date: date, end_date: date) -> List[Order]:
-        """Get all orders within date range"""
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
+    def adapt_granularity(start_date: date, end_date: date, granularity: str) -> str:
+        """
+        Coarsest-needed granularity for the range
+
+        Starting from the requested granularity, moves to the next coarser one
+        while the range exceeds ANALYTICS_MAX_RANGE_DAYS for it (month has no limit),
+        so long ranges return a bounded number of points.
+        """
+        limits = get_settings().analytics_max_range_days
+        days = (end_date - start_date).days + 1
+        for candidate in GRANULARITY_ORDER[GRANULARITY_ORDER.index(granularity):]:
+            limit = limits.get(candidate)
+            if not limit or days <= limit:
+                return candidate
+        return GRANULARITY_ORDER[-1]
+
+    @staticmethod
+    def range_filter(start_date: date, end_date: date, store_id: Optional[str] = None) -> Tuple:
+        """
+        Half-open [start, end) created_at bounds for store-local dates,
+        optionally limited to one store
+
+        The bare column comparisons keep the (store_id, created_at) and
+        created_at indexes usable.
+        """
+        start_dt, end_dt = local_day_bounds(start_date, end_date, get_store_timezone())
+        conditions = (Order.created_at >= start_dt, Order.created_at < end_dt)
+        if store_id:
+            conditions += (Order.store_id == store_id,)
+        return conditions
 
+    @staticmethod
+    def get_orders_in_range(db: Session, start_date: date, end_date: date,
+                            store_id: Optional[str] = None) -> List[Order]:
+        """Get all orders within date range"""
         return db.query(Order).filter(
-            Order.created_at >= start_datetime,
-            Order.created_at <= end_datetime
+            *AnalyticsService.range_filter(start_date, end_date, store_id)
         ).all()
 
     # ========== Revenue Analysis ==========
 
     @staticmethod
-    def get_daily_revenue(db: Session, start_date: date, end_date: date) -> Dict:
-        """Get daily revenue breakdown"""
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
+    def _floor_bucket(value: datetime, granularity: str) -> datetime:
+        """Truncate a local wall-clock time to the start of its bucket"""
+        value = value.replace(second=0, microsecond=0)
+        if granularity == '15m':
+            return value.replace(minute=value.minute // 15 * 15)
+        value = value.replace(minute=0)
+        if granularity == 'hour':
+            return value
+        value = value.replace(hour=0)
+        if granularity == 'week':
+            return value - timedelta(days=value.weekday())
+        if granularity == 'month':
+            return value.replace(day=1)
+        return value
+
+    @staticmethod
+    def _next_bucket(value: datetime, granularity: str) -> datetime:
+        """Start of the bucket following the given bucket start"""
+        if granularity == 'month':
+            if value.month == 12:
+                return value.replace(year=value.year + 1, month=1)
+            return value.replace(month=value.month + 1)
+        return value + REVENUE_GRANULARITIES[granularity]
+
+    @staticmethod
+    def _revenue_bucket_rows(db: Session, start_dt: datetime, end_dt: datetime,
+                             granularity: str, tzinfo,
+                             store_id: Optional[str] = None) -> List[Tuple[datetime, int, int]]:
+        """
+        Group orders into (local bucket start, revenue, order_count) in one query
+
+        In the store time zone, hour and coarser buckets group on the stored
+        local_date/local_hour columns. Otherwise PostgreSQL buckets in local time
+        with date_bin/date_trunc, and SQLite (no named time zones) groups by UTC
+        15-minute slots with strftime that are folded into local buckets here
+        (every UTC offset is a multiple of 15 minutes, so no slot straddles two
+        local buckets).
+        """
+        time_filter = (Order.created_at >= start_dt, Order.created_at < end_dt)
+        if store_id:
+            time_filter += (Order.store_id == store_id,)
+
+        if granularity != '15m' and timezone_name(tzinfo) == timezone_name(get_store_timezone()):
+            group_columns = [Order.local_date]
+            if granularity == 'hour':
+                group_columns.append(Order.local_hour)
+
+            results = db.query(
+                *group_columns,
+                func.sum(Order.total_amount).label('revenue'),
+                func.count(Order.id).label('order_count')
+            ).filter(*time_filter).group_by(*group_columns).all()
+
+            rows = []
+            for r in results:
+                hour = r.local_hour if granularity == 'hour' else 0
+                rows.append((
+                    AnalyticsService._floor_bucket(datetime.combine(r.local_date, time(hour)), granularity),
+                    r.revenue or 0,
+                    r.order_count
+                ))
+            return rows
+
+        if db.get_bind().dialect.name == 'postgresql':
+            local_ts = func.timezone(timezone_name(tzinfo), Order.created_at)
+            if granularity == '15m':
+                bucket = func.date_bin(
+                    literal_column("interval '15 minutes'"),
+                    local_ts,
+                    literal_column("timestamp '2000-01-01'")
+                )
+            else:
+                bucket = func.date_trunc(granularity, local_ts)
+            bucket = bucket.label('bucket')
+
+            results = db.query(
+                bucket,
+                func.sum(Order.total_amount).label('revenue'),
+                func.count(Order.id).label('order_count')
+            ).filter(*time_filter).group_by(bucket).order_by(bucket).all()
+
+            return [(r.bucket, r.revenue or 0, r.order_count) for r in results]
+
+        minute = cast(func.strftime('%M', Order.created_at), Integer)
+        slot = func.strftime('%Y-%m-%d %H:', Order.created_at).concat(
+            func.printf('%02d', minute / 15 * 15)
+        ).label('slot')
 
         results = db.query(
-            func.date(Order.created_at).label('date'),
+            slot,
             func.sum(Order.total_amount).label('revenue'),
             func.count(Order.id).label('order_count')
-        ).filter(
-            Order.created_at >= start_datetime,
-            Order.created_at <= end_datetime
-        ).group_by(
-            func.date(Order.created_at)
-        ).order_by(
-            func.date(Order.created_at)
-        ).all()
+        ).filter(*time_filter).group_by(slot).all()
+
+        rows = []
+        for r in results:
+            slot_start = datetime.strptime(r.slot, '%Y-%m-%d %H:%M')
+            local_start = to_local(slot_start, tzinfo).replace(tzinfo=None)
+            rows.append((
+                AnalyticsService._floor_bucket(local_start, granularity),
+                r.revenue or 0,
+                r.order_count
+            ))
+        return rows
 
-        data = [
-            {
-                'date': r.date,
-                'revenue': r.revenue or 0,
-                'order_count': r.order_count
-            }
-            for r in results
-        ]
-
-        total_revenue = sum(d['revenue'] for d in data)
-        total_orders = sum(d['order_count'] for d in data)
+    @staticmethod
+    def get_revenue(db: Session, start_date: date, end_date: date,
+                    granularity: str = 'day', tz: Optional[str] = None,
+                    store_id: Optional[str] = None) -> Dict:
+        """
+        Get revenue bucketed by 15m/hour/day/week/month in the given time zone
+        (defaults to the store time zone), for one store or all of them
+
+        Every bucket in the range is returned, including empty ones. Ranges too
+        long for the requested granularity are coarsened (see adapt_granularity);
+        day and coarser buckets in the store time zone are folded from the daily
+        revenue of an accelerator when one can serve the range.
+        """
+        if granularity not in REVENUE_GRANULARITIES:
+            raise ValueError(f"不支援的時間粒度：{granularity}")
+
+        requested_granularity = granularity
+        granularity = AnalyticsService.adapt_granularity(start_date, end_date, granularity)
+
+        tzinfo = resolve_timezone(tz) if tz else get_store_timezone()
+        start_dt, end_dt = local_day_bounds(start_date, end_date, tzinfo)
+
+        rows = None
+        if granularity in REVENUE_PERIODS and timezone_name(tzinfo) == timezone_name(get_store_timezone()):
+            backend = find_accelerator('get_daily_revenue', db, start_date, end_date)
+            if backend is not None:
+                daily = backend.get_daily_revenue(db, start_date, end_date, store_id=store_id)['data']
+                rows = [
+                    (
+                        AnalyticsService._floor_bucket(datetime.combine(d['date'], time()), granularity),
+                        d['revenue'],
+                        d['order_count']
+                    )
+                    for d in daily
+                ]
+        if rows is None:
+            rows = AnalyticsService._revenue_bucket_rows(db, start_dt, end_dt, granularity, tzinfo, store_id)
+
+        totals = {}
+        for bucket, revenue, order_count in rows:
+            revenue_sum, count_sum = totals.get(bucket, (0, 0))
+            totals[bucket] = (revenue_sum + revenue, count_sum + order_count)
+
+        # Gap filling: walk every bucket between the local bounds
+        data = []
+        bucket = AnalyticsService._floor_bucket(start_dt.astimezone(tzinfo).replace(tzinfo=None), granularity)
+        local_end = end_dt.astimezone(tzinfo).replace(tzinfo=None)
+        while bucket < local_end:
+            revenue, order_count = totals.get(bucket, (0, 0))
+            data.append({
+                'bucket_start': bucket.replace(tzinfo=tzinfo),
+                'revenue': revenue,
+                'order_count': order_count
+            })
+            bucket = AnalyticsService._next_bucket(bucket, granularity)
 
         return {
-            'period': 'daily',
+            'granularity': granularity,
+            'requested_granularity': requested_granularity,
+            'granularity_adapted': granularity != requested_granularity,
+            'timezone': timezone_name(tzinfo),
             'start_date': start_date,
             'end_date': end_date,
             'data': data,
-            'total_revenue': total_revenue,
-            'total_orders': total_orders
+            'total_revenue': sum(d['revenue'] for d in data),
+            'total_orders': sum(d['order_count'] for d in data)
         }
 
     @staticmethod
-    def get_weekly_revenue(db: Session, start_date: date, end_date: date) -> Dict:
-        """Get weekly revenue breakdown"""
-        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date)
-
-        if not orders:
-            return {
-                'period': 'weekly',
-                'start_date': start_date,
-                'end_date': end_date,
-                'data': [],
-                'total_revenue': 0,
-                'total_orders': 0
-            }
-
-        # Convert to DataFrame
-        df = pd.DataFrame([
-            {
-                'date': o.created_at.date(),
-                'revenue': o.total_amount,
-                'order_id': o.id
-            }
-            for o in orders
-        ])
-
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-
-        # Resample by week
-        weekly = df.resample('W').agg({
-            'revenue': 'sum',
-            'order_id': 'count'
-        }).reset_index()
-
-        data = [
-            {
-                'date': row['date'].date(),
-                'revenue': int(row['revenue']),
-                'order_count': int(row['order_id'])
-            }
-            for _, row in weekly.iterrows()
-        ]
+    def _period_revenue(db: Session, start_date: date, end_date: date, granularity: str,
+                        store_id: Optional[str] = None) -> Dict:
+        """Legacy daily/weekly/monthly response shape on top of get_revenue"""
+        result = AnalyticsService.get_revenue(db, start_date, end_date, granularity, store_id=store_id)
 
         return {
-            'period': 'weekly',
+            'period': REVENUE_PERIODS[result['granularity']],
             'start_date': start_date,
             'end_date': end_date,
-            'data': data,
-            'total_revenue': sum(d['revenue'] for d in data),
-            'total_orders': sum(d['order_count'] for d in data)
+            'data': [
+                {
+                    'date': d['bucket_start'].date(),
+                    'revenue': d['revenue'],
+                    'order_count': d['order_count']
+                }
+                for d in result['data']
+            ],
+            'total_revenue': result['total_revenue'],
+            'total_orders': result['total_orders']
         }
 
     @staticmethod
-    def get_monthly_revenue(db: Session, start_date: date, end_date: date) -> Dict:
-        """Get monthly revenue breakdown"""
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
+    def get_period_revenue(db: Session, start_date: date, end_date: date, granularity: str,
+                           store_id: Optional[str] = None) -> Dict:
+        """
+        Legacy daily/weekly/monthly revenue, coarsened when the range is too long
+
+        The response says which period was requested and whether it was adapted.
+        """
+        period = AnalyticsService.adapt_granularity(start_date, end_date, granularity)
+        method = {
+            'day': AnalyticsService.get_daily_revenue,
+            'week': AnalyticsService.get_weekly_revenue,
+            'month': AnalyticsService.get_monthly_revenue
+        }[period]
+
+        result = method(db, start_date, end_date, store_id=store_id)
+        result['requested_period'] = REVENUE_PERIODS[granularity]
+        result['granularity_adapted'] = period != granularity
+        return result
 
-        results = db.query(
-            extract('year', Order.created_at).label('year'),
-            extract('month', Order.created_at).label('month'),
-            func.sum(Order.total_amount).label('revenue'),
-            func.count(Order.id).label('order_count')
-        ).filter(
-            Order.created_at >= start_datetime,
-            Order.created_at <= end_datetime
-        ).group_by(
-            extract('year', Order.created_at),
-            extract('month', Order.created_at)
-        ).order_by(
-            extract('year', Order.created_at),
-            extract('month', Order.created_at)
-        ).all()
+    @staticmethod
+    @accelerated
+    def get_daily_revenue(db: Session, start_date: date, end_date: date,
+                          store_id: Optional[str] = None) -> Dict:
+        """Get daily revenue breakdown"""
+        return AnalyticsService._period_revenue(db, start_date, end_date, 'day', store_id)
 
-        data = [
-            {
-                'date': date(int(r.year), int(r.month), 1),
-                'revenue': r.revenue or 0,
-                'order_count': r.order_count
-            }
-            for r in results
-        ]
+    @staticmethod
+    def get_weekly_revenue(db: Session, start_date: date, end_date: date,
+                           store_id: Optional[str] = None) -> Dict:
+        """Get weekly revenue breakdown (weeks start on Monday)"""
+        return AnalyticsService._period_revenue(db, start_date, end_date, 'week', store_id)
 
-        return {
-            'period': 'monthly',
-            'start_date': start_date,
-            'end_date': end_date,
-            'data': data,
-            'total_revenue': sum(d['revenue'] for d in data),
-            'total_orders': sum(d['order_count'] for d in data)
-        }
+    @staticmethod
+    def get_monthly_revenue(db: Session, start_date: date, end_date: date,
+                            store_id: Optional[str] = None) -> Dict:
+        """Get monthly revenue breakdown"""
+        return AnalyticsService._period_revenue(db, start_date, end_date, 'month', store_id)
 
     @staticmethod
-    def get_average_order_value(db: Session, start_date: date, end_date: date) -> Dict:
+    @accelerated
+    def get_average_order_value(db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
         """Calculate average order value"""
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-
         result = db.query(
             func.avg(Order.total_amount).label('avg_value'),
             func.count(Order.id).label('order_count'),
             func.sum(Order.total_amount).label('total_revenue')
         ).filter(
-            Order.created_at >= start_datetime,
-            Order.created_at <= end_datetime
+            *AnalyticsService.range_filter(start_date, end_date, store_id)
         ).first()
 
         avg_value = float(result.avg_value) if result.avg_value else 0.0
@@ -207,12 +437,100 @@ class AnalyticsService:
             'total_revenue': total_revenue
         }
 
+    @staticmethod
+    def get_order_value_percentiles(db: Session, start_date: date, end_date: date,
+                                    store_id: Optional[str] = None) -> Dict:
+        """
+        Approximate p50/p90/p99 order value, merged from the daily DDSketches
+
+        Each percentile is within DDSKETCH_RELATIVE_ACCURACY (1%) of the exact value.
+        """
+        amounts = DDSketch()
+        for _, _, day_amounts in OrderSketchService.day_sketches(db, start_date, end_date, store_id).values():
+            amounts.merge(day_amounts)
+
+        def percentile(q: float) -> Optional[float]:
+            value = amounts.quantile(q)
+            return round(value, 2) if value is not None else None
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_orders': amounts.count,
+            'p50': percentile(0.5),
+            'p90': percentile(0.9),
+            'p99': percentile(0.99),
+            'relative_accuracy': DDSKETCH_RELATIVE_ACCURACY
+        }
+
+    @staticmethod
+    def get_unique_customers(db: Session, start_date: date, end_date: date,
+                             granularity: str = 'day', store_id: Optional[str] = None) -> Dict:
+        """
+        Approximate distinct customer names per day/week/month and for the whole range
+
+        Merges the daily HyperLogLog sketches; every bucket in the range is
+        returned, including empty ones. The relative standard error is
+        HLL_RELATIVE_ERROR (about 0.8%), and small counts are near exact.
+        """
+        if granularity not in REVENUE_PERIODS:
+            raise ValueError(f"不支援的時間粒度：{granularity}")
+
+        buckets = {}
+        customers = HyperLogLog()
+        for day, sketch in OrderSketchService.day_sketches(db, start_date, end_date, store_id).items():
+            bucket = AnalyticsService._floor_bucket(datetime.combine(day, time()), granularity)
+            order_count, bucket_customers = buckets.get(bucket, (0, HyperLogLog()))
+            buckets[bucket] = (order_count + sketch[0], bucket_customers.merge(sketch[1]))
+            customers.merge(sketch[1])
+
+        data = []
+        bucket = AnalyticsService._floor_bucket(datetime.combine(start_date, time()), granularity)
+        while bucket.date() <= end_date:
+            order_count, bucket_customers = buckets.get(bucket, (0, None))
+            data.append({
+                'bucket_start': bucket.date(),
+                'unique_customers': bucket_customers.estimate() if bucket_customers else 0,
+                'order_count': order_count
+            })
+            bucket = AnalyticsService._next_bucket(bucket, granularity)
+
+        return {
+            'granularity': granularity,
+            'start_date': start_date,
+            'end_date': end_date,
+            'data': data,
+            'unique_customers': customers.estimate(),
+            'total_orders': sum(d['order_count'] for d in data),
+            'relative_error': HLL_RELATIVE_ERROR
+        }
+
+    @staticmethod
+    @accelerated
+    def get_store_revenue(db: Session, start_date: date, end_date: date) -> Dict:
+        """Get revenue and order count per store"""
+        results = db.query(
+            Order.store_id,
+            func.sum(Order.total_amount).label('revenue'),
+            func.count(Order.id).label('order_count')
+        ).filter(
+            *AnalyticsService.range_filter(start_date, end_date)
+        ).group_by(
+            Order.store_id
+        ).all()
+
+        return store_revenue_result(start_date, end_date, {
+            r.store_id: (r.revenue or 0, r.order_count) for r in results
+        })
+
     # ========== Popular Items Analysis ==========
 
     @staticmethod
-    def get_popular_dishes(db: Session, start_date: date, end_date: date, limit: int = 10) -> Dict:
+    @accelerated
+    def get_popular_dishes(db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
         """Get most popular dishes (non-drinks)"""
-        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date)
+        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date, store_id)
 
         # Aggregate dish data
         dish_stats = {}
@@ -246,9 +564,11 @@ class AnalyticsService:
         }
 
     @staticmethod
-    def get_popular_drinks(db: Session, start_date: date, end_date: date, limit: int = 10) -> Dict:
+    @accelerated
+    def get_popular_drinks(db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
         """Get most popular drinks"""
-        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date)
+        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date, store_id)
 
         # Aggregate drink data
         drink_stats = {}
@@ -283,21 +603,83 @@ class AnalyticsService:
             'items': sorted_drinks
         }
 
+    @staticmethod
+    def get_item_pairs(db: Session, start_date: date, end_date: date, limit: int = 10,
+                       sort_by: str = 'support', min_orders: int = 1,
+                       store_id: Optional[str] = None) -> Dict:
+        """
+        Items bought together in one order, with support, confidence and lift
+
+        Reads the pair counts maintained as orders are created (see
+        ItemPairService), so the cost depends on the number of item pairs,
+        not orders; the order total comes from get_average_order_value
+        (rollups, views or the indexed orders count). Pairs seen in fewer than min_orders orders are skipped;
+        sort_by is 'support' (most frequent first) or 'lift'.
+        """
+        query = db.query(
+            ItemPairCount.item_a,
+            ItemPairCount.item_b,
+            func.sum(ItemPairCount.order_count)
+        ).filter(ItemPairCount.local_date.between(start_date, end_date))
+        if store_id:
+            query = query.filter(ItemPairCount.store_id == store_id)
+        counts = {(a, b): int(n) for a, b, n in query.group_by(ItemPairCount.item_a, ItemPairCount.item_b)}
+
+        item_orders = {a: n for (a, b), n in counts.items() if a == b}
+        # A view refreshed a moment ago can trail the pair counts; never let the total drop below an item's count
+        total_orders = max(
+            AnalyticsService.get_average_order_value(db, start_date, end_date, store_id=store_id)['total_orders'],
+            max(item_orders.values(), default=0)
+        )
+        menu = MenuService.get_snapshot()
+
+        def item_name(item_id: str) -> str:
+            item = menu.get_item(item_id, store_id or DEFAULT_STORE_ID)
+            # Items no longer on the menu (e.g. legacy:<name> from imports) keep their ID
+            return item['name'] if item else item_id.split(':', 1)[-1]
+
+        pairs = []
+        for (a, b), n in counts.items():
+            if a == b or n < min_orders:
+                continue
+            pairs.append({
+                'item_a_id': a,
+                'item_a_name': item_name(a),
+                'item_b_id': b,
+                'item_b_name': item_name(b),
+                'order_count': n,
+                'support': round(n / total_orders, 4),
+                'confidence_a_to_b': round(n / item_orders[a], 4),
+                'confidence_b_to_a': round(n / item_orders[b], 4),
+                'lift': round(n * total_orders / (item_orders[a] * item_orders[b]), 2)
+            })
+
+        if sort_by == 'lift':
+            pairs.sort(key=lambda p: (p['lift'], p['order_count']), reverse=True)
+        else:
+            pairs.sort(key=lambda p: (p['order_count'], p['lift']), reverse=True)
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_orders': total_orders,
+            'sort_by': sort_by,
+            'pairs': pairs[:limit]
+        }
+
     # ========== Customer Behavior Analysis ==========
 
     @staticmethod
-    def get_pickup_method_ratio(db: Session, start_date: date, end_date: date) -> Dict:
+    @accelerated
+    def get_pickup_method_ratio(db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
         """Analyze dine-in vs takeout ratio"""
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-
         results = db.query(
             Order.pickup_method,
             func.count(Order.id).label('count'),
             func.sum(Order.total_amount).label('revenue')
         ).filter(
-            Order.created_at >= start_datetime,
-            Order.created_at <= end_datetime
+            *AnalyticsService.range_filter(start_date, end_date, store_id)
         ).group_by(
             Order.pickup_method
         ).all()
@@ -322,22 +704,20 @@ class AnalyticsService:
         }
 
     @staticmethod
-    def get_peak_hours(db: Session, start_date: date, end_date: date) -> Dict:
+    @accelerated
+    def get_peak_hours(db: Session, start_date: date, end_date: date,
+                       store_id: Optional[str] = None) -> Dict:
         """Analyze peak hours of the day"""
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-
         results = db.query(
-            extract('hour', Order.created_at).label('hour'),
+            Order.local_hour.label('hour'),
             func.count(Order.id).label('order_count'),
             func.sum(Order.total_amount).label('revenue')
         ).filter(
-            Order.created_at >= start_datetime,
-            Order.created_at <= end_datetime
+            *AnalyticsService.range_filter(start_date, end_date, store_id)
         ).group_by(
-            extract('hour', Order.created_at)
+            Order.local_hour
         ).order_by(
-            extract('hour', Order.created_at)
+            Order.local_hour
         ).all()
 
         hourly_data = [
@@ -360,12 +740,41 @@ class AnalyticsService:
             'peak_hour_orders': peak_hour['order_count'] if peak_hour else 0
         }
 
+    @staticmethod
+    def weekday_expression(db: Session, local_date):
+        """Store-local weekday of a date column, 0 = Monday ... 6 = Sunday"""
+        if db.get_bind().dialect.name == 'postgresql':
+            return cast(func.extract('isodow', local_date), Integer) - 1
+        # SQLite %w counts from Sunday
+        return (cast(func.strftime('%w', local_date), Integer) + 6) % 7
+
+    @staticmethod
+    @accelerated
+    def get_weekday_hour_heatmap(db: Session, start_date: date, end_date: date,
+                                 store_id: Optional[str] = None) -> Dict:
+        """Order count, revenue and average basket per weekday x hour of day (7 x 24)"""
+        weekday = AnalyticsService.weekday_expression(db, Order.local_date).label('weekday')
+        results = db.query(
+            weekday,
+            Order.local_hour,
+            func.count(Order.id),
+            func.sum(Order.total_amount)
+        ).filter(
+            *AnalyticsService.range_filter(start_date, end_date, store_id)
+        ).group_by(
+            weekday, Order.local_hour
+        ).all()
+
+        return heatmap_result(start_date, end_date, results)
+
     # ========== Beverage Preference Analysis ==========
 
     @staticmethod
-    def get_ice_level_preferences(db: Session, start_date: date, end_date: date) -> Dict:
+    @accelerated
+    def get_ice_level_preferences(db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
         """Analyze ice level preferences"""
-        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date)
+        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date, store_id)
 
         # Count ice level preferences
         ice_counts = {}
@@ -401,9 +810,11 @@ class AnalyticsService:
         }
 
     @staticmethod
-    def get_sweetness_preferences(db: Session, start_date: date, end_date: date) -> Dict:
+    @accelerated
+    def get_sweetness_preferences(db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
         """Analyze sweetness preferences"""
-        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date)
+        orders = AnalyticsService.get_orders_in_range(db, start_date, end_date, store_id)
 
         # Count sweetness preferences
         sweetness_counts = {}
@@ -437,3 +848,12 @@ class AnalyticsService:
             'preferences': preferences,
             'most_popular': most_popular
         }
+
+
+# Historical ranges are answered from Parquet snapshots when enabled,
+# then from PostgreSQL materialized views when they are fresh enough;
+# ranges with archived orders otherwise merge the rollups with live queries
+register_accelerator(TodayAnalyticsBackend())
+register_accelerator(SnapshotAnalyticsBackend())
+register_accelerator(AnalyticsViewBackend())
+register_accelerator(RollupAnalyticsBackend())
@@ -0,0 +1,444 @@
+"""
+Analytics View Service - PostgreSQL materialized views for analytics
+
+每日營收、每小時分布、商品銷量、飲料選項四個物化檢視都以「分店 × 店家當地日期」為粒度，
+背景排程以 REFRESH MATERIALIZED VIEW CONCURRENTLY 定期更新（不會阻擋讀取）。
+AnalyticsService 在檢視夠新時改讀檢視，否則回到即時查詢；跨分店的彙總也由檢視回答，不必掃描訂單。
+已封存訂單的彙總（rollup_* 資料表，見 archive_service）也合併在檢視中，封存後分析結果不變。
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import engine
+from app.models.analytics import AnalyticsViewRefresh
+from app.utils.heatmap import heatmap_result
+from app.utils.stores import store_revenue_result
+from app.utils.timezone import local_day_bounds, get_store_timezone
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 只讓一個 worker 同時執行 refresh
+REFRESH_LOCK_ID = 20251230
+
+# 飲料明細可能是 SQL NULL 或 JSON null，統一轉成空陣列
+_DRINKS_ARRAY = "CASE WHEN json_typeof(o.drinks) = 'array' THEN o.drinks ELSE '[]'::json END"
+_ITEMS_ARRAY = "CASE WHEN json_typeof(o.items) = 'array' THEN o.items ELSE '[]'::json END"
+
+
+def _including_rollup(definition: str, key_columns: List[str], rollup_table: str,
+                      value_columns: Dict[str, str]) -> str:
+    """
+    在檢視定義（orders 的彙總）之外加上已封存訂單的彙總，再依相同欄位合併
+
+    value_columns 為 欄位 → 合併方式（sum / min），順序需與檢視定義的欄位相同
+    """
+    columns = ", ".join(key_columns + list(value_columns))
+    values = ", ".join(
+        f"sum({column})::bigint AS {column}" if how == "sum" else f"{how}({column}) AS {column}"
+        for column, how in value_columns.items()
+    )
+    keys = ", ".join(key_columns)
+    return f"""
+        SELECT {keys}, {values}
+        FROM ({definition} UNION ALL SELECT {columns} FROM {rollup_table}) combined
+        GROUP BY {keys}
+    """
+
+
+_VIEW_QUERIES = {
+    "mv_daily_revenue": (
+        """
+        SELECT store_id, local_date, pickup_method,
+               sum(total_amount)::bigint AS revenue,
+               count(*)::bigint AS order_count
+        FROM orders
+        WHERE local_date IS NOT NULL
+        GROUP BY store_id, local_date, pickup_method
+        """,
+        ["store_id", "local_date", "pickup_method"]
+    ),
+    "mv_hourly_orders": (
+        """
+        SELECT store_id, local_date, local_hour,
+               sum(total_amount)::bigint AS revenue,
+               count(*)::bigint AS order_count
+        FROM orders
+        WHERE local_date IS NOT NULL
+        GROUP BY store_id, local_date, local_hour
+        """,
+        ["store_id", "local_date", "local_hour"]
+    ),
+    "mv_item_sales": (
+        f"""
+        SELECT o.store_id, o.local_date, l.category, l.item->>'id' AS item_id,
+               min(l.item->>'name') AS item_name,
+               sum((l.item->>'quantity')::int)::bigint AS total_quantity,
+               sum((l.item->>'price')::int * (l.item->>'quantity')::int)::bigint AS total_revenue,
+               count(*)::bigint AS order_count
+        FROM orders o
+        CROSS JOIN LATERAL (
+            SELECT 'dish' AS category, e AS item FROM json_array_elements({_ITEMS_ARRAY}) e
+            UNION ALL
+            SELECT 'drink' AS category, e AS item FROM json_array_elements({_DRINKS_ARRAY}) e
+        ) l
+        WHERE o.local_date IS NOT NULL
+        GROUP BY o.store_id, o.local_date, l.category, l.item->>'id'
+        """,
+        ["store_id", "local_date", "category", "item_id"]
+    ),
+    "mv_beverage_options": (
+        f"""
+        SELECT o.store_id, o.local_date, opt.option_type, opt.option,
+               sum((e->>'quantity')::int)::bigint AS drink_count
+        FROM orders o
+        CROSS JOIN LATERAL json_array_elements({_DRINKS_ARRAY}) e
+        CROSS JOIN LATERAL (
+            VALUES ('ice_level', e->>'temperature'), ('sweetness', e->>'sweetness')
+        ) AS opt(option_type, option)
+        WHERE o.local_date IS NOT NULL AND opt.option IS NOT NULL AND opt.option <> ''
+        GROUP BY o.store_id, o.local_date, opt.option_type, opt.option
+        """,
+        ["store_id", "local_date", "option_type", "option"]
+    ),
+}
+
+# 檢視 → (rollup 資料表, 值欄位的合併方式)
+_VIEW_ROLLUPS = {
+    "mv_daily_revenue": ("rollup_daily_revenue", {"revenue": "sum", "order_count": "sum"}),
+    "mv_hourly_orders": ("rollup_hourly_orders", {"revenue": "sum", "order_count": "sum"}),
+    "mv_item_sales": ("rollup_item_sales", {
+        "item_name": "min", "total_quantity": "sum", "total_revenue": "sum", "order_count": "sum"
+    }),
+    "mv_beverage_options": ("rollup_beverage_options", {"drink_count": "sum"}),
+}
+
+VIEW_DEFINITIONS = {
+    view_name: (_including_rollup(definition, unique_columns, *_VIEW_ROLLUPS[view_name]), unique_columns)
+    for view_name, (definition, unique_columns) in _VIEW_QUERIES.items()
+}
+
+
+class AnalyticsViewService:
+    """物化檢視建立、更新與新鮮度查詢"""
+
+    @staticmethod
+    def is_supported(db: Session) -> bool:
+        """物化檢視只在 PostgreSQL 上使用"""
+        return db.get_bind().dialect.name == "postgresql"
+
+    @staticmethod
+    def create_views(conn: Connection) -> None:
+        """建立物化檢視與唯一索引（CONCURRENTLY 更新的必要條件）"""
+        for view_name, (definition, unique_columns) in VIEW_DEFINITIONS.items():
+            conn.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view_name} AS {definition}"))
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{view_name} "
+                f"ON {view_name} ({', '.join(unique_columns)})"
+            ))
+            AnalyticsViewService._mark_refreshed(conn, view_name, conn.execute(text("SELECT now()")).scalar())
+
+    @staticmethod
+    def drop_views(conn: Connection) -> None:
+        """移除所有物化檢視（變更檢視定義時先 drop 再 create）"""
+        for view_name in VIEW_DEFINITIONS:
+            conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {view_name}"))
+
+    @staticmethod
+    def _mark_refreshed(conn: Connection, view_name: str, refreshed_at: datetime) -> None:
+        """記錄檢視內容的資料時間點（refresh 開始前的時間）"""
+        conn.execute(
+            text(
+                "INSERT INTO analytics_view_refreshes (view_name, refreshed_at) VALUES (:name, :refreshed_at) "
+                "ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at"
+            ),
+            {"name": view_name, "refreshed_at": refreshed_at}
+        )
+
+    @staticmethod
+    def refresh_views() -> bool:
+        """
+        以 CONCURRENTLY 更新所有物化檢視
+
+        其他 worker 正在更新時直接略過，回傳是否有執行。
+        """
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": REFRESH_LOCK_ID}).scalar()
+            if not locked:
+                return False
+            try:
+                for view_name in VIEW_DEFINITIONS:
+                    started_at = conn.execute(text("SELECT now()")).scalar()
+                    conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}"))
+                    AnalyticsViewService._mark_refreshed(conn, view_name, started_at)
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": REFRESH_LOCK_ID})
+        return True
+
+    @staticmethod
+    def last_refreshed_at(db: Session) -> Optional[datetime]:
+        """所有檢視中最舊的更新時間（檢視不存在時為 None）"""
+        refreshed = dict(db.query(AnalyticsViewRefresh.view_name, AnalyticsViewRefresh.refreshed_at).all())
+        if any(view_name not in refreshed for view_name in VIEW_DEFINITIONS):
+            return None
+        return min(refreshed[view_name] for view_name in VIEW_DEFINITIONS)
+
+    @staticmethod
+    def get_staleness(db: Session) -> Dict[str, Optional[float]]:
+        """各檢視距離上次更新的秒數（/health 用）"""
+        now = datetime.now(timezone.utc)
+        refreshed = dict(db.query(AnalyticsViewRefresh.view_name, AnalyticsViewRefresh.refreshed_at).all())
+        return {
+            view_name: round((now - refreshed[view_name]).total_seconds(), 1) if view_name in refreshed else None
+            for view_name in VIEW_DEFINITIONS
+        }
+
+    @staticmethod
+    async def refresh_loop(interval_seconds: int) -> None:
+        """背景排程：每 interval_seconds 秒更新一次"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                if await asyncio.to_thread(AnalyticsViewService.refresh_views):
+                    logger.info("物化檢視已更新")
+            except Exception as e:
+                logger.error(f"更新物化檢視失敗：{e}", exc_info=True)
+
+
+class AnalyticsViewBackend:
+    """
+    以物化檢視回答分析查詢的後端
+
+    檢視的更新時間晚於查詢區間結束（資料已完整），或距今不超過
+    analytics_views_max_staleness_seconds 時才使用。
+    """
+
+    def can_serve(self, db: Session, start_date: date, end_date: date) -> bool:
+        settings = get_settings()
+        if not settings.analytics_views_enabled or not AnalyticsViewService.is_supported(db):
+            return False
+
+        refreshed_at = AnalyticsViewService.last_refreshed_at(db)
+        if refreshed_at is None:
+            return False
+
+        _, range_end = local_day_bounds(start_date, end_date, get_store_timezone())
+        if refreshed_at >= range_end:
+            return True
+        staleness = datetime.now(timezone.utc) - refreshed_at
+        return staleness <= timedelta(seconds=settings.analytics_views_max_staleness_seconds)
+
+    @staticmethod
+    def _query(db: Session, sql: str, start_date: date, end_date: date,
+               store_id: Optional[str] = None, **params) -> List:
+        """執行檢視查詢；SQL 中的 {store_filter} 在指定分店時換成分店條件"""
+        store_filter = "AND store_id = :store_id" if store_id else ""
+        return db.execute(
+            text(sql.format(store_filter=store_filter)),
+            {"start_date": start_date, "end_date": end_date, "store_id": store_id, **params}
+        ).fetchall()
+
+    def get_daily_revenue(self, db: Session, start_date: date, end_date: date,
+                          store_id: Optional[str] = None) -> Dict:
+        rows = self._query(db, """
+            SELECT local_date, sum(revenue) AS revenue, sum(order_count) AS order_count
+            FROM mv_daily_revenue
+            WHERE local_date BETWEEN :start_date AND :end_date {store_filter}
+            GROUP BY local_date
+        """, start_date, end_date, store_id)
+        by_date = {r.local_date: r for r in rows}
+
+        data = []
+        day = start_date
+        while day <= end_date:
+            r = by_date.get(day)
+            data.append({
+                'date': day,
+                'revenue': int(r.revenue) if r else 0,
+                'order_count': int(r.order_count) if r else 0
+            })
+            day += timedelta(days=1)
+
+        return {
+            'period': 'daily',
+            'start_date': start_date,
+            'end_date': end_date,
+            'data': data,
+            'total_revenue': sum(d['revenue'] for d in data),
+            'total_orders': sum(d['order_count'] for d in data)
+        }
+
+    def get_average_order_value(self, db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
+        r = self._query(db, """
+            SELECT coalesce(sum(revenue), 0) AS revenue, coalesce(sum(order_count), 0) AS order_count
+            FROM mv_daily_revenue
+            WHERE local_date BETWEEN :start_date AND :end_date {store_filter}
+        """, start_date, end_date, store_id)[0]
+        total_revenue, order_count = int(r.revenue), int(r.order_count)
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'average_order_value': round(total_revenue / order_count, 2) if order_count else 0.0,
+            'total_orders': order_count,
+            'total_revenue': total_revenue
+        }
+
+    def get_store_revenue(self, db: Session, start_date: date, end_date: date) -> Dict:
+        rows = self._query(db, """
+            SELECT store_id, sum(revenue) AS revenue, sum(order_count) AS order_count
+            FROM mv_daily_revenue
+            WHERE local_date BETWEEN :start_date AND :end_date
+            GROUP BY store_id
+        """, start_date, end_date)
+        return store_revenue_result(
+            start_date, end_date,
+            {r.store_id: (int(r.revenue), int(r.order_count)) for r in rows}
+        )
+
+    def _popular_items(self, db: Session, start_date: date, end_date: date,
+                       category: str, limit: int, store_id: Optional[str] = None) -> List[Dict]:
+        rows = self._query(db, """
+            SELECT item_id, min(item_name) AS item_name,
+                   sum(total_quantity) AS total_quantity,
+                   sum(total_revenue) AS total_revenue,
+                   sum(order_count) AS order_count
+            FROM mv_item_sales
+            WHERE local_date BETWEEN :start_date AND :end_date AND category = :category {store_filter}
+            GROUP BY item_id
+            ORDER BY total_quantity DESC
+            LIMIT :limit
+        """, start_date, end_date, store_id, category=category, limit=limit)
+
+        return [
+            {
+                'item_id': r.item_id,
+                'item_name': r.item_name,
+                'total_quantity': int(r.total_quantity),
+                'total_revenue': int(r.total_revenue),
+                'order_count': int(r.order_count)
+            }
+            for r in rows
+        ]
+
+    def get_popular_dishes(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'dishes',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, start_date, end_date, 'dish', limit, store_id)
+        }
+
+    def get_popular_drinks(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'drinks',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, start_date, end_date, 'drink', limit, store_id)
+        }
+
+    def get_pickup_method_ratio(self, db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
+        rows = self._query(db, """
+            SELECT pickup_method, sum(order_count) AS count, sum(revenue) AS revenue
+            FROM mv_daily_revenue
+            WHERE local_date BETWEEN :start_date AND :end_date {store_filter}
+            GROUP BY pickup_method
+        """, start_date, end_date, store_id)
+        total_orders = sum(int(r.count) for r in rows)
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_orders': total_orders,
+            'stats': [
+                {
+                    'pickup_method': r.pickup_method,
+                    'count': int(r.count),
+                    'percentage': round((int(r.count) / total_orders * 100), 2) if total_orders > 0 else 0,
+                    'revenue': int(r.revenue)
+                }
+                for r in rows
+            ]
+        }
+
+    def get_peak_hours(self, db: Session, start_date: date, end_date: date,
+                       store_id: Optional[str] = None) -> Dict:
+        rows = self._query(db, """
+            SELECT local_hour AS hour, sum(order_count) AS order_count, sum(revenue) AS revenue
+            FROM mv_hourly_orders
+            WHERE local_date BETWEEN :start_date AND :end_date {store_filter}
+            GROUP BY local_hour
+            ORDER BY local_hour
+        """, start_date, end_date, store_id)
+
+        hourly_data = [
+            {'hour': int(r.hour), 'order_count': int(r.order_count), 'revenue': int(r.revenue)}
+            for r in rows
+        ]
+        peak_hour = max(hourly_data, key=lambda x: x['order_count']) if hourly_data else None
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'hourly_data': hourly_data,
+            'peak_hour': peak_hour['hour'] if peak_hour else 0,
+            'peak_hour_orders': peak_hour['order_count'] if peak_hour else 0
+        }
+
+    def get_weekday_hour_heatmap(self, db: Session, start_date: date, end_date: date,
+                                 store_id: Optional[str] = None) -> Dict:
+        rows = self._query(db, """
+            SELECT extract(isodow FROM local_date)::int - 1 AS weekday, local_hour,
+                   sum(order_count) AS order_count, sum(revenue) AS revenue
+            FROM mv_hourly_orders
+            WHERE local_date BETWEEN :start_date AND :end_date {store_filter}
+            GROUP BY 1, local_hour
+        """, start_date, end_date, store_id)
+
+        return heatmap_result(start_date, end_date, rows)
+
+    def _beverage_preferences(self, db: Session, start_date: date, end_date: date,
+                              preference_type: str, store_id: Optional[str] = None) -> Dict:
+        rows = self._query(db, """
+            SELECT option, sum(drink_count) AS count
+            FROM mv_beverage_options
+            WHERE local_date BETWEEN :start_date AND :end_date AND option_type = :option_type {store_filter}
+            GROUP BY option
+            ORDER BY count DESC
+        """, start_date, end_date, store_id, option_type=preference_type)
+        total_drinks = sum(int(r.count) for r in rows)
+
+        preferences = [
+            {
+                'option': r.option,
+                'count': int(r.count),
+                'percentage': round((int(r.count) / total_drinks * 100), 2) if total_drinks > 0 else 0
+            }
+            for r in rows
+        ]
+
+        return {
+            'preference_type': preference_type,
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_drinks': total_drinks,
+            'preferences': preferences,
+            'most_popular': preferences[0]['option'] if preferences else 'N/A'
+        }
+
+    def get_ice_level_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, start_date, end_date, 'ice_level', store_id)
+
+    def get_sweetness_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, start_date, end_date, 'sweetness', store_id)
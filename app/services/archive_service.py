@@ -0,0 +1,431 @@
+"""
+Archive Service - Retention and archival of old orders
+
+超過保留期限（ORDER_RETENTION_DAYS）的訂單分批從 orders 移到 orders_archive：
+每批在同一個交易中先彙總到 rollup_* 資料表、寫入封存表，再從 orders 刪除，
+任何時間點「orders + rollup」的彙總都等於全部訂單，歷史分析不受封存影響：
+- 物化檢視的定義已合併 rollup 資料表
+- 快照匯出同時讀取 orders 與 orders_archive
+- 其他情況由 RollupAnalyticsBackend 合併 rollup 與即時查詢的結果
+
+已封存的訂單仍可依訂單編號查詢（OrderService.get_order_by_number）。
+"""
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.archive import (
+    ArchivedOrder, DailyRevenueRollup, HourlyOrdersRollup, ItemSalesRollup, BeverageOptionsRollup
+)
+from app.models.order import Order
+from app.utils.heatmap import heatmap_result
+from app.utils.stores import store_revenue_result
+from app.utils.timezone import local_date_hour, local_day_bounds, get_store_timezone, store_today
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 封存表保留 orders 的所有欄位
+ARCHIVE_COLUMNS = [
+    "id", "order_number", "store_id", "customer_name", "pickup_method", "items", "drinks",
+    "total_amount", "notes", "created_at", "local_date", "local_hour",
+]
+
+# rollup 模型 → 累加的欄位（其餘欄位為主鍵，item_name 取第一次出現的名稱）
+ROLLUP_SUM_COLUMNS = {
+    DailyRevenueRollup: ["revenue", "order_count"],
+    HourlyOrdersRollup: ["revenue", "order_count"],
+    ItemSalesRollup: ["total_quantity", "total_revenue", "order_count"],
+    BeverageOptionsRollup: ["drink_count"],
+}
+
+
+def _add(totals: dict, key: tuple, **values) -> None:
+    row = totals.setdefault(key, dict.fromkeys(values, 0))
+    for column, value in values.items():
+        row[column] += value
+
+
+class ArchiveService:
+    """訂單封存：彙總、搬移與查詢"""
+
+    @staticmethod
+    def retention_cutoff(retention_days: Optional[int] = None) -> Optional[date]:
+        """此日期（店家當地）之前的訂單可封存；保留天數為 0 時不封存，回傳 None"""
+        if retention_days is None:
+            retention_days = get_settings().order_retention_days
+        if retention_days <= 0:
+            return None
+        return store_today() - timedelta(days=retention_days)
+
+    @staticmethod
+    def fold_orders(orders: List[Order]) -> Dict[type, List[dict]]:
+        """
+        將訂單彙總成各 rollup 資料表的資料列
+
+        計算方式與即時查詢 / 物化檢視相同：明細依分類逐項累加，飲料選項只計有值的杯數
+        """
+        daily, hourly, items, options = {}, {}, {}, {}
+        item_names = {}
+
+        for order in orders:
+            day, hour = order.local_date, order.local_hour
+            if day is None or hour is None:
+                day, hour = local_date_hour(order.created_at)
+            store_id = order.store_id
+
+            _add(daily, (day, store_id, order.pickup_method), revenue=order.total_amount, order_count=1)
+            _add(hourly, (day, store_id, hour), revenue=order.total_amount, order_count=1)
+
+            for category, lines in (('dish', order.items), ('drink', order.drinks)):
+                for item in lines or []:
+                    key = (day, store_id, category, item['id'])
+                    item_names.setdefault(key, item['name'])
+                    _add(items, key, total_quantity=item['quantity'],
+                         total_revenue=item['price'] * item['quantity'], order_count=1)
+
+            for drink in order.drinks or []:
+                for option_type, field in (('ice_level', 'temperature'), ('sweetness', 'sweetness')):
+                    if drink.get(field):
+                        _add(options, (day, store_id, option_type, drink[field]), drink_count=drink['quantity'])
+
+        return {
+            DailyRevenueRollup: [
+                {"local_date": d, "store_id": s, "pickup_method": p, **v} for (d, s, p), v in daily.items()
+            ],
+            HourlyOrdersRollup: [
+                {"local_date": d, "store_id": s, "local_hour": h, **v} for (d, s, h), v in hourly.items()
+            ],
+            ItemSalesRollup: [
+                {"local_date": d, "store_id": s, "category": c, "item_id": i, "item_name": item_names[(d, s, c, i)], **v}
+                for (d, s, c, i), v in items.items()
+            ],
+            BeverageOptionsRollup: [
+                {"local_date": d, "store_id": s, "option_type": t, "option": o, **v}
+                for (d, s, t, o), v in options.items()
+            ],
+        }
+
+    @staticmethod
+    def _add_rollup_rows(db: Session, model, rows: List[dict]) -> None:
+        """累加到 rollup 資料表（INSERT ... ON CONFLICT DO UPDATE SET 欄位 = 欄位 + 新值）"""
+        if not rows:
+            return
+        table = model.__table__
+        dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={column: table.c[column] + statement.excluded[column] for column in ROLLUP_SUM_COLUMNS[model]}
+        )
+        db.execute(statement, rows)
+
+    @staticmethod
+    def archive_batch(db: Session, cutoff: date, batch_size: int) -> int:
+        """
+        封存一批 local_date 早於 cutoff 的訂單（單一交易），回傳處理筆數
+
+        已在封存表中的訂單編號（封存後又被重新匯入）只從 orders 刪除，不重複彙總
+        """
+        orders = db.query(Order).filter(
+            Order.local_date < cutoff
+        ).order_by(Order.id).limit(batch_size).all()
+        if not orders:
+            return 0
+
+        archived = set(db.execute(
+            select(ArchivedOrder.order_number).where(
+                ArchivedOrder.order_number.in_([order.order_number for order in orders])
+            )
+        ).scalars())
+        new_orders = [order for order in orders if order.order_number not in archived]
+
+        for model, rows in ArchiveService.fold_orders(new_orders).items():
+            ArchiveService._add_rollup_rows(db, model, rows)
+        if new_orders:
+            db.execute(ArchivedOrder.__table__.insert(), [
+                {column: getattr(order, column) for column in ARCHIVE_COLUMNS} for order in new_orders
+            ])
+        db.query(Order).filter(
+            Order.id.in_([order.id for order in orders])
+        ).delete(synchronize_session=False)
+
+        db.commit()
+        db.expunge_all()
+        return len(orders)
+
+    @staticmethod
+    def count_archivable(db: Session, cutoff: date) -> int:
+        """可封存的訂單數"""
+        return db.query(func.count(Order.id)).filter(Order.local_date < cutoff).scalar()
+
+    @staticmethod
+    def archive_orders(cutoff: date, batch_size: int = 1000, max_batches: Optional[int] = None) -> int:
+        """分批封存 cutoff 之前的訂單，回傳封存筆數"""
+        db = SessionLocal()
+        total = 0
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                archived = ArchiveService.archive_batch(db, cutoff, batch_size)
+                if not archived:
+                    break
+                total += archived
+                batches += 1
+                logger.info(f"已封存 {total:,} 筆訂單（{cutoff} 之前）")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return total
+
+    @staticmethod
+    def get_archived_order(db: Session, order_number: str) -> Optional[ArchivedOrder]:
+        """根據訂單編號查詢已封存的訂單"""
+        return db.query(ArchivedOrder).filter(ArchivedOrder.order_number == order_number).first()
+
+    @staticmethod
+    def fetch_archived_orders(db: Session, start_date: date, end_date: date) -> List[ArchivedOrder]:
+        """店家當地日期區間內的封存訂單（快照匯出用）"""
+        start_datetime, end_datetime = local_day_bounds(start_date, end_date, get_store_timezone())
+        return db.query(ArchivedOrder).filter(
+            ArchivedOrder.created_at >= start_datetime,
+            ArchivedOrder.created_at < end_datetime
+        ).all()
+
+
+class RollupAnalyticsBackend:
+    """
+    合併已封存訂單的彙總（rollup）與 orders 即時查詢的分析後端
+
+    查詢區間內有封存資料，且快照與物化檢視都無法回答時使用。
+    即時查詢的部分同樣受 ANALYTICS_MAX_LIVE_RANGE_DAYS 限制；
+    15 分鐘 / 每小時的營收時間序列不含已封存的訂單。
+    """
+
+    def can_serve(self, db: Session, start_date: date, end_date: date) -> bool:
+        return db.query(DailyRevenueRollup.local_date).filter(
+            DailyRevenueRollup.local_date.between(start_date, end_date)
+        ).first() is not None
+
+    @staticmethod
+    def _rollup(db: Session, model, start_date: date, end_date: date,
+                store_id: Optional[str] = None, **filters):
+        query = db.query(model).filter(model.local_date.between(start_date, end_date))
+        if store_id:
+            query = query.filter(model.store_id == store_id)
+        for column, value in filters.items():
+            query = query.filter(getattr(model, column) == value)
+        return query.all()
+
+    @staticmethod
+    def _live(name: str, db: Session, start_date: date, end_date: date, *args, **kwargs) -> Dict:
+        """orders 的即時查詢（AnalyticsService 中未經加速後端的原始實作）"""
+        from app.services.analytics_service import AnalyticsService, check_live_range
+
+        check_live_range(name, start_date, end_date)
+        return getattr(AnalyticsService, name).__wrapped__(db, start_date, end_date, *args, **kwargs)
+
+    def get_daily_revenue(self, db: Session, start_date: date, end_date: date,
+                          store_id: Optional[str] = None) -> Dict:
+        from app.services.analytics_service import AnalyticsService, check_live_range
+
+        totals = {}
+        for r in self._rollup(db, DailyRevenueRollup, start_date, end_date, store_id):
+            _add(totals, (r.local_date,), revenue=r.revenue, order_count=r.order_count)
+
+        # 直接取每日分組（get_daily_revenue 的即時實作會再找加速後端）
+        check_live_range('get_daily_revenue', start_date, end_date)
+        start_dt, end_dt = local_day_bounds(start_date, end_date, get_store_timezone())
+        for bucket, revenue, order_count in AnalyticsService._revenue_bucket_rows(
+            db, start_dt, end_dt, 'day', get_store_timezone(), store_id
+        ):
+            _add(totals, (bucket.date(),), revenue=revenue, order_count=order_count)
+
+        data = []
+        day = start_date
+        while day <= end_date:
+            t = totals.get((day,), {'revenue': 0, 'order_count': 0})
+            data.append({'date': day, 'revenue': int(t['revenue']), 'order_count': int(t['order_count'])})
+            day += timedelta(days=1)
+
+        return {
+            'period': 'daily',
+            'start_date': start_date,
+            'end_date': end_date,
+            'data': data,
+            'total_revenue': sum(d['revenue'] for d in data),
+            'total_orders': sum(d['order_count'] for d in data)
+        }
+
+    def get_average_order_value(self, db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
+        live = self._live('get_average_order_value', db, start_date, end_date, store_id)
+        rows = self._rollup(db, DailyRevenueRollup, start_date, end_date, store_id)
+        total_revenue = int(live['total_revenue']) + sum(r.revenue for r in rows)
+        order_count = int(live['total_orders']) + sum(r.order_count for r in rows)
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'average_order_value': round(total_revenue / order_count, 2) if order_count else 0.0,
+            'total_orders': order_count,
+            'total_revenue': total_revenue
+        }
+
+    def get_store_revenue(self, db: Session, start_date: date, end_date: date) -> Dict:
+        totals = {}
+        for s in self._live('get_store_revenue', db, start_date, end_date)['stores']:
+            _add(totals, s['store_id'], revenue=s['revenue'], order_count=s['order_count'])
+        for r in self._rollup(db, DailyRevenueRollup, start_date, end_date):
+            _add(totals, r.store_id, revenue=r.revenue, order_count=r.order_count)
+
+        return store_revenue_result(start_date, end_date, {
+            store_id: (int(t['revenue']), int(t['order_count'])) for store_id, t in totals.items()
+        })
+
+    def _popular_items(self, db: Session, name: str, category: str, start_date: date, end_date: date,
+                       limit: int, store_id: Optional[str] = None) -> List[Dict]:
+        stats = {}
+        # limit=None 取得全部品項再合併
+        for item in self._live(name, db, start_date, end_date, None, store_id)['items']:
+            stats[item['item_id']] = dict(item)
+        for r in self._rollup(db, ItemSalesRollup, start_date, end_date, store_id, category=category):
+            item = stats.setdefault(r.item_id, {
+                'item_id': r.item_id, 'item_name': r.item_name,
+                'total_quantity': 0, 'total_revenue': 0, 'order_count': 0
+            })
+            item['total_quantity'] += int(r.total_quantity)
+            item['total_revenue'] += int(r.total_revenue)
+            item['order_count'] += int(r.order_count)
+
+        return sorted(stats.values(), key=lambda x: x['total_quantity'], reverse=True)[:limit]
+
+    def get_popular_dishes(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'dishes',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, 'get_popular_dishes', 'dish', start_date, end_date, limit, store_id)
+        }
+
+    def get_popular_drinks(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'drinks',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, 'get_popular_drinks', 'drink', start_date, end_date, limit, store_id)
+        }
+
+    def get_pickup_method_ratio(self, db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
+        totals = {}
+        for s in self._live('get_pickup_method_ratio', db, start_date, end_date, store_id)['stats']:
+            _add(totals, s['pickup_method'], count=s['count'], revenue=s['revenue'])
+        for r in self._rollup(db, DailyRevenueRollup, start_date, end_date, store_id):
+            _add(totals, r.pickup_method, count=r.order_count, revenue=r.revenue)
+        total_orders = sum(int(t['count']) for t in totals.values())
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_orders': total_orders,
+            'stats': [
+                {
+                    'pickup_method': pickup_method,
+                    'count': int(t['count']),
+                    'percentage': round((int(t['count']) / total_orders * 100), 2) if total_orders > 0 else 0,
+                    'revenue': int(t['revenue'])
+                }
+                for pickup_method, t in totals.items()
+            ]
+        }
+
+    def get_peak_hours(self, db: Session, start_date: date, end_date: date,
+                       store_id: Optional[str] = None) -> Dict:
+        totals = {}
+        for h in self._live('get_peak_hours', db, start_date, end_date, store_id)['hourly_data']:
+            _add(totals, h['hour'], order_count=h['order_count'], revenue=h['revenue'])
+        for r in self._rollup(db, HourlyOrdersRollup, start_date, end_date, store_id):
+            _add(totals, int(r.local_hour), order_count=r.order_count, revenue=r.revenue)
+
+        hourly_data = [
+            {'hour': hour, 'order_count': int(t['order_count']), 'revenue': int(t['revenue'])}
+            for hour, t in sorted(totals.items())
+        ]
+        peak_hour = max(hourly_data, key=lambda x: x['order_count']) if hourly_data else None
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'hourly_data': hourly_data,
+            'peak_hour': peak_hour['hour'] if peak_hour else 0,
+            'peak_hour_orders': peak_hour['order_count'] if peak_hour else 0
+        }
+
+    def get_weekday_hour_heatmap(self, db: Session, start_date: date, end_date: date,
+                                 store_id: Optional[str] = None) -> Dict:
+        from app.services.analytics_service import AnalyticsService
+
+        live = self._live('get_weekday_hour_heatmap', db, start_date, end_date, store_id)
+        rows = [
+            (weekday, hour, live['order_counts'][weekday][hour], live['revenue'][weekday][hour])
+            for weekday in range(7) for hour in range(24)
+        ]
+        weekday = AnalyticsService.weekday_expression(db, HourlyOrdersRollup.local_date).label('weekday')
+        query = db.query(
+            weekday,
+            HourlyOrdersRollup.local_hour,
+            func.sum(HourlyOrdersRollup.order_count),
+            func.sum(HourlyOrdersRollup.revenue)
+        ).filter(HourlyOrdersRollup.local_date.between(start_date, end_date))
+        if store_id:
+            query = query.filter(HourlyOrdersRollup.store_id == store_id)
+        rows += query.group_by(weekday, HourlyOrdersRollup.local_hour).all()
+
+        return heatmap_result(start_date, end_date, rows)
+
+    def _beverage_preferences(self, db: Session, name: str, preference_type: str, start_date: date,
+                              end_date: date, store_id: Optional[str] = None) -> Dict:
+        counts = {}
+        for p in self._live(name, db, start_date, end_date, store_id)['preferences']:
+            counts[p['option']] = counts.get(p['option'], 0) + p['count']
+        for r in self._rollup(db, BeverageOptionsRollup, start_date, end_date, store_id,
+                              option_type=preference_type):
+            counts[r.option] = counts.get(r.option, 0) + int(r.drink_count)
+        total_drinks = sum(counts.values())
+
+        preferences = [
+            {
+                'option': option,
+                'count': count,
+                'percentage': round((count / total_drinks * 100), 2) if total_drinks > 0 else 0
+            }
+            for option, count in sorted(counts.items(), key=lambda x: x[1], reverse=True)
+        ]
+
+        return {
+            'preference_type': preference_type,
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_drinks': total_drinks,
+            'preferences': preferences,
+            'most_popular': preferences[0]['option'] if preferences else 'N/A'
+        }
+
+    def get_ice_level_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, 'get_ice_level_preferences', 'ice_level',
+                                          start_date, end_date, store_id)
+
+    def get_sweetness_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, 'get_sweetness_preferences', 'sweetness',
+                                          start_date, end_date, store_id)
@@ -0,0 +1,246 @@
+"""
+銷售預測服務
+預測未來每天的訂單數、營收與各品項數量（備料用），模型見 app/utils/smoothing.py
+
+- 以已結束日期（不含今天）每天的彙總擬合，歷史長度為 FORECAST_HISTORY_DAYS，
+  同時讀取 orders 與已封存訂單的 rollup 資料表
+- 擬合結果快取在行程內（每個 worker、每個分店一份）；新的一天結束後只讀取新日期的彙總遞增更新，
+  出現新品項或距上次完整擬合超過 FORECAST_REFIT_DAYS 天時才重新擬合
+- 預測準確度與擬合時間以 scripts/backtest_forecast.py 回測
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.models.archive import DailyRevenueRollup, ItemSalesRollup
+from app.models.order import Order
+from app.services.archive_service import ArchiveService
+from app.utils.heatmap import WEEKDAY_LABELS
+from app.utils.smoothing import SeasonalSmoothing
+from app.utils.timezone import local_day_bounds, get_store_timezone, store_today
+from datetime import date, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 最近這幾天有賣出的品項才列入預測（已下架的品項不列出）
+ACTIVE_ITEM_DAYS = 28
+
+# 品項鍵：(分類 dish/drink, 餐點 ID)
+ItemKey = Tuple[str, str]
+
+
+class DailySales:
+    """連續日期區間每天的訂單數、營收與各品項數量（沒有訂單的日期為 0）"""
+
+    def __init__(self, start_date: date, end_date: date):
+        self.start_date = start_date
+        self.end_date = end_date
+        days = (end_date - start_date).days + 1
+        self.orders = [0] * days
+        self.revenue = [0] * days
+        self.items: Dict[ItemKey, List[int]] = {}
+        self.item_names: Dict[ItemKey, str] = {}
+
+    def add_revenue(self, day: date, revenue: int, order_count: int) -> None:
+        i = (day - self.start_date).days
+        self.revenue[i] += revenue
+        self.orders[i] += order_count
+
+    def add_item(self, day: date, key: ItemKey, name: str, quantity: int) -> None:
+        quantities = self.items.setdefault(key, [0] * len(self.orders))
+        quantities[(day - self.start_date).days] += quantity
+        self.item_names.setdefault(key, name)
+
+    def matrix(self, items: List[ItemKey]):
+        """(天數, 2 + 品項數) 陣列：訂單數、營收、各品項數量"""
+        import numpy as np
+
+        zeros = [0] * len(self.orders)
+        return np.array([self.orders, self.revenue] + [self.items.get(key, zeros) for key in items],
+                        dtype=np.float64).T
+
+    def slice(self, start_date: date, end_date: date) -> "DailySales":
+        """區間內的一段（回測用）"""
+        part = DailySales(start_date, end_date)
+        begin, end = (start_date - self.start_date).days, (end_date - self.start_date).days + 1
+        part.orders, part.revenue = self.orders[begin:end], self.revenue[begin:end]
+        part.items = {key: quantities[begin:end] for key, quantities in self.items.items()
+                      if any(quantities[begin:end])}
+        part.item_names = {key: self.item_names[key] for key in part.items}
+        return part
+
+    def last_sold(self) -> Dict[ItemKey, date]:
+        """各品項在區間內最後賣出的日期"""
+        return {
+            key: self.start_date + timedelta(days=max(i for i, q in enumerate(quantities) if q))
+            for key, quantities in self.items.items() if any(quantities)
+        }
+
+
+class StoreForecast:
+    """一個分店（或所有分店合計）的擬合結果"""
+
+    def __init__(self, model: SeasonalSmoothing, history_start: date, items: List[ItemKey],
+                 item_names: Dict[ItemKey, str], last_sold: Dict[ItemKey, date]):
+        self.model = model
+        self.history_start = history_start
+        self.fitted_through = model.last_day
+        self.items = items
+        self.item_names = item_names
+        self.last_sold = last_sold
+
+    @classmethod
+    def fit(cls, sales: DailySales) -> "StoreForecast":
+        items = sorted(sales.items)
+        model = SeasonalSmoothing.fit(sales.matrix(items), sales.start_date)
+        return cls(model, sales.start_date, items, dict(sales.item_names), sales.last_sold())
+
+    def update(self, sales: DailySales) -> bool:
+        """套用新日期的彙總；有模型中沒有的品項時不更新，回傳 False（需重新擬合）"""
+        if not set(sales.items) <= set(self.items):
+            return False
+        self.model.update(sales.matrix(self.items), sales.start_date)
+        self.last_sold.update(sales.last_sold())
+        return True
+
+    def active_items(self) -> List[int]:
+        """最近 ACTIVE_ITEM_DAYS 天有賣出的品項（在 items 中的位置）"""
+        since = self.model.last_day - timedelta(days=ACTIVE_ITEM_DAYS - 1)
+        return [i for i, key in enumerate(self.items) if self.last_sold.get(key, date.min) >= since]
+
+
+# 分店代碼（None 為所有分店合計）→ 擬合結果
+_forecasts: Dict[Optional[str], StoreForecast] = {}
+_lock = Lock()
+
+
+class ForecastService:
+    """每日銷售預測"""
+
+    @staticmethod
+    def daily_sales(db: Session, start_date: date, end_date: date,
+                    store_id: Optional[str] = None) -> DailySales:
+        """讀取日期區間每天的彙總（orders 依明細累加，已封存的訂單讀 rollup 資料表）"""
+        sales = DailySales(start_date, end_date)
+
+        start_dt, end_dt = local_day_bounds(start_date, end_date, get_store_timezone())
+        query = db.query(
+            Order.store_id, Order.pickup_method, Order.items, Order.drinks, Order.total_amount,
+            Order.created_at, Order.local_date, Order.local_hour
+        ).filter(Order.created_at >= start_dt, Order.created_at < end_dt)
+        if store_id:
+            query = query.filter(Order.store_id == store_id)
+        folded = ArchiveService.fold_orders(query.all())
+
+        for model in (DailyRevenueRollup, ItemSalesRollup):
+            query = db.query(model).filter(model.local_date.between(start_date, end_date))
+            if store_id:
+                query = query.filter(model.store_id == store_id)
+            folded[model] += [
+                {column: getattr(row, column) for column in model.__table__.columns.keys()} for row in query
+            ]
+
+        for row in folded[DailyRevenueRollup]:
+            sales.add_revenue(row['local_date'], row['revenue'], row['order_count'])
+        for row in folded[ItemSalesRollup]:
+            sales.add_item(row['local_date'], (row['category'], row['item_id']),
+                           row['item_name'], row['total_quantity'])
+        return sales
+
+    @staticmethod
+    def _history_start(db: Session, end_date: date, store_id: Optional[str] = None) -> Optional[date]:
+        """擬合的第一天：FORECAST_HISTORY_DAYS 天前與最早訂單日期中較晚者"""
+        starts = []
+        for model in (Order, DailyRevenueRollup):
+            query = db.query(func.min(model.local_date))
+            if store_id:
+                query = query.filter(model.store_id == store_id)
+            starts.append(query.scalar())
+        starts = [start for start in starts if start]
+        if not starts:
+            return None
+        return max(min(starts), end_date - timedelta(days=get_settings().forecast_history_days - 1))
+
+    @staticmethod
+    def fit(db: Session, end_date: date, store_id: Optional[str] = None) -> StoreForecast:
+        """以 end_date 為止的歷史完整擬合"""
+        start_date = ForecastService._history_start(db, end_date, store_id)
+        if start_date is None or start_date > end_date:
+            raise ValueError("沒有可用於預測的歷史訂單")
+        return StoreForecast.fit(ForecastService.daily_sales(db, start_date, end_date, store_id))
+
+    @staticmethod
+    def get_model(db: Session, store_id: Optional[str] = None) -> StoreForecast:
+        """
+        擬合到昨天為止的模型
+
+        快取中的模型落後時只讀取新日期的彙總遞增更新；沒有快取、出現新品項，
+        或距上次完整擬合超過 FORECAST_REFIT_DAYS 天時重新擬合
+        """
+        last_closed_day = store_today() - timedelta(days=1)
+        with _lock:
+            forecast = _forecasts.get(store_id)
+            if forecast is not None and forecast.model.last_day < last_closed_day:
+                refit_due = forecast.fitted_through + timedelta(days=get_settings().forecast_refit_days)
+                if last_closed_day >= refit_due or not forecast.update(ForecastService.daily_sales(
+                    db, forecast.model.last_day + timedelta(days=1), last_closed_day, store_id
+                )):
+                    forecast = None
+                else:
+                    logger.info(f"預測模型已更新至 {last_closed_day}（分店 {store_id or '全部'}）")
+
+            if forecast is None or forecast.model.last_day != last_closed_day:
+                forecast = ForecastService.fit(db, last_closed_day, store_id)
+                _forecasts[store_id] = forecast
+                logger.info(f"預測模型已擬合：{forecast.history_start} ~ {last_closed_day}（分店 {store_id or '全部'}）")
+            return forecast
+
+    @staticmethod
+    def clear() -> None:
+        """
+        清除本行程快取的模型
+
+        離線腳本匯入或修改歷史訂單不會通知各 worker，模型在下次完整擬合時（最慢 FORECAST_REFIT_DAYS 天）反映
+        """
+        with _lock:
+            _forecasts.clear()
+
+    @staticmethod
+    def forecast_result(forecast: StoreForecast, horizon: int, store_id: Optional[str] = None) -> Dict:
+        """組成未來 horizon 天的預測回應"""
+        days, values = forecast.model.forecast(horizon)
+        active = forecast.active_items()
+
+        data = []
+        for day, row in zip(days, values):
+            items = [
+                {
+                    'item_id': forecast.items[i][1],
+                    'item_name': forecast.item_names[forecast.items[i]],
+                    'category': forecast.items[i][0],
+                    'quantity': round(float(row[2 + i]), 1)
+                }
+                for i in active
+            ]
+            data.append({
+                'date': day,
+                'weekday': WEEKDAY_LABELS[day.weekday()],
+                'orders': round(float(row[0]), 1),
+                'revenue': int(round(float(row[1]))),
+                'items': sorted(items, key=lambda item: item['quantity'], reverse=True)
+            })
+
+        return {
+            'store_id': store_id,
+            'horizon': horizon,
+            'history_start': forecast.history_start,
+            'fitted_through': forecast.model.last_day,
+            'data': data
+        }
+
+    @staticmethod
+    def get_forecast(db: Session, horizon: int = 7, store_id: Optional[str] = None) -> Dict:
+        """從今天起 horizon 天每天的訂單數、營收與各品項數量預測"""
+        return ForecastService.forecast_result(ForecastService.get_model(db, store_id), horizon, store_id)
@@ -0,0 +1,122 @@
+"""
+品項組合服務
+統計同一筆訂單中一起購買的品項（設計套餐用），彙總在 item_pair_counts 資料表
+
+- 建立訂單時在同一個交易中遞增累加，查詢只讀取彙總表，不必重新讀取訂單明細
+- 每筆訂單的品項數很少，逐筆列舉品項對的成本可忽略
+- 不累加當天的總訂單數：每筆訂單都會更新同一列，同分店同時下單的交易會在該列的鎖上排隊；
+  總訂單數改從每日營收（rollup / 物化檢視 / orders）讀取
+- 批次匯入（scripts/migrate_from_sheets.py、generate_test_orders.py）不經過 create_order，
+  匯入後以 scripts/rebuild_item_pairs.py 重算（同時讀取 orders 與 orders_archive，封存不影響統計）
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models.analytics import ItemPairCount
+from app.models.archive import ArchivedOrder
+from app.models.order import Order
+from app.utils.timezone import local_date_hour, local_day_bounds, get_store_timezone
+from datetime import date, timedelta
+from itertools import combinations
+from typing import Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ItemPairService:
+    """品項組合次數的累加與重算"""
+
+    @staticmethod
+    def fold_orders(orders: Iterable) -> List[dict]:
+        """
+        將訂單彙總成 item_pair_counts 的資料列（依主鍵排序）
+
+        orders 需有 store_id、items、drinks、local_date（缺少時依 created_at 計算）；
+        同一品項在一筆訂單中出現多次只計一次
+        """
+        counts = {}
+        for order in orders:
+            day = order.local_date or local_date_hour(order.created_at)[0]
+            item_ids = sorted({item['id'] for item in (order.items or []) + (order.drinks or [])})
+
+            keys = [(item_id, item_id) for item_id in item_ids]
+            keys += combinations(item_ids, 2)
+            for item_a, item_b in keys:
+                key = (day, order.store_id, item_a, item_b)
+                counts[key] = counts.get(key, 0) + 1
+
+        # 固定的更新順序，同時建立的訂單不會互相等待成死結
+        return [
+            {"local_date": d, "store_id": s, "item_a": a, "item_b": b, "order_count": n}
+            for (d, s, a, b), n in sorted(counts.items())
+        ]
+
+    @staticmethod
+    def add_orders(db: Session, orders: Iterable) -> None:
+        """累加訂單的品項組合（INSERT ... ON CONFLICT DO UPDATE），不 commit"""
+        rows = ItemPairService.fold_orders(orders)
+        if not rows:
+            return
+        table = ItemPairCount.__table__
+        dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={"order_count": table.c.order_count + statement.excluded.order_count}
+        )
+        db.execute(statement, rows)
+
+    @staticmethod
+    def _order_date_range(db: Session) -> Optional[tuple]:
+        """orders 與 orders_archive 的最早、最晚日期"""
+        bounds = [
+            db.query(func.min(model.local_date), func.max(model.local_date)).one()
+            for model in (Order, ArchivedOrder)
+        ]
+        starts = [start for start, _ in bounds if start]
+        ends = [end for _, end in bounds if end]
+        if not starts:
+            return None
+        return min(starts), max(ends)
+
+    @staticmethod
+    def rebuild(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                days_per_batch: int = 31) -> int:
+        """
+        重算日期區間（店家當地，預設為全部訂單）的品項組合，回傳讀取的訂單數
+
+        每批 days_per_batch 天一個交易：刪除該區間的彙總後，從 orders 與 orders_archive 重新累加
+        """
+        if start_date is None or end_date is None:
+            date_range = ItemPairService._order_date_range(db)
+            if date_range is None:
+                return 0
+            start_date = start_date or date_range[0]
+            end_date = end_date or date_range[1]
+
+        tzinfo = get_store_timezone()
+        total = 0
+        batch_start = start_date
+        while batch_start <= end_date:
+            batch_end = min(batch_start + timedelta(days=days_per_batch - 1), end_date)
+            start_dt, end_dt = local_day_bounds(batch_start, batch_end, tzinfo)
+
+            db.query(ItemPairCount).filter(
+                ItemPairCount.local_date.between(batch_start, batch_end)
+            ).delete(synchronize_session=False)
+
+            orders = []
+            for model in (Order, ArchivedOrder):
+                orders += db.query(
+                    model.store_id, model.items, model.drinks, model.local_date, model.created_at
+                ).filter(model.created_at >= start_dt, model.created_at < end_dt).all()
+            ItemPairService.add_orders(db, orders)
+            db.commit()
+
+            total += len(orders)
+            logger.info(f"品項組合已重算：{batch_start} ~ {batch_end}（{len(orders):,} 筆訂單）")
+            batch_start = batch_end + timedelta(days=1)
+
+        return total
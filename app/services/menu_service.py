@@ -1,57 +1,264 @@
 """
 選單服務
 對應 Code.gs getMenuData (line 299-326)
+
+選單存在 menu_items 資料表，每個 worker 在記憶體中保留一份不可變的選單快照，
+背景定期比對 menu_versions 的版本號，有變動才重新載入並整份替換；
+請求處理時只讀記憶體中的快照，不會查詢資料庫
 """
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.menu import MenuItem, MenuVersion
+from app.utils.http_cache import encode_json, make_etag
+from app.utils.stores import DEFAULT_STORE_ID
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 選單分類（API 回應依此順序）
+MENU_CATEGORIES = ("mains", "soups", "desserts", "drinks")
+
+# 初始選單（對應 Code.gs getMenuData()，遷移時寫入預設分店）
+DEFAULT_MENU = {
+    "mains": [
+        {"id": "m1", "name": "貓爪咖哩飯", "price": 120},
+        {"id": "m2", "name": "鮭魚親子丼", "price": 150},
+        {"id": "m3", "name": "喵喵義大利麵", "price": 130},
+        {"id": "m4", "name": "貓掌漢堡排", "price": 140}
+    ],
+    "soups": [
+        {"id": "s1", "name": "貓咪味噌湯", "price": 30},
+        {"id": "s2", "name": "奶油南瓜濃湯", "price": 40},
+        {"id": "s3", "name": "海鮮巧達湯", "price": 50}
+    ],
+    "desserts": [
+        {"id": "d1", "name": "貓掌布丁", "price": 60},
+        {"id": "d2", "name": "鮮奶雪花冰", "price": 70},
+        {"id": "d3", "name": "焦糖烤布蕾", "price": 65},
+        {"id": "d4", "name": "貓咪銅鑼燒", "price": 55}
+    ],
+    "drinks": [
+        {"id": "dr1", "name": "貓爪拿鐵", "price": 80},
+        {"id": "dr2", "name": "焦糖瑪奇朵", "price": 90},
+        {"id": "dr3", "name": "抹茶拿鐵", "price": 85},
+        {"id": "dr4", "name": "水果茶", "price": 70},
+        {"id": "dr5", "name": "檸檬冰茶", "price": 60}
+    ]
+}
+
+
+def default_menu_rows(store_id: str = DEFAULT_STORE_ID) -> List[dict]:
+    """初始選單轉成 menu_items 的資料列"""
+    return [
+        {
+            "store_id": store_id,
+            "item_id": item["id"],
+            "category": category,
+            "name": item["name"],
+            "price": item["price"],
+            "sort_order": position,
+            "is_available": True
+        }
+        for category in MENU_CATEGORIES
+        for position, item in enumerate(DEFAULT_MENU[category])
+    ]
+
+
+class MenuSnapshot:
+    """
+    某個版本的所有分店選單
+
+    建立後不再修改，更新選單時以新的快照整份替換；
+    同一個請求從頭到尾使用同一份快照，驗證與建立訂單看到的選單一致
+    """
+
+    def __init__(self, versions: Dict[str, int], rows: List[MenuItem]):
+        self.versions = versions
+        self._menus = {}
+        self._indexes = {}
+        self._categories = {}
+        self._payloads = {}
+
+        for row in rows:
+            menu = self._menus.setdefault(row.store_id, {category: [] for category in MENU_CATEGORIES})
+            item = {"id": row.item_id, "name": row.name, "price": row.price}
+            menu.setdefault(row.category, []).append(item)
+            self._indexes.setdefault(row.store_id, {})[row.item_id] = item
+            self._categories.setdefault(row.store_id, {})[row.item_id] = row.category
+
+        for store_id, menu in self._menus.items():
+            body = encode_json(menu)
+            self._payloads[store_id] = (body, make_etag(body))
+
+    def _store(self, store_id: str) -> str:
+        """分店還沒有自己的選單時沿用預設分店的選單"""
+        return store_id if store_id in self._menus else DEFAULT_STORE_ID
+
+    def menu(self, store_id: str = DEFAULT_STORE_ID) -> dict:
+        return self._menus.get(self._store(store_id), {category: [] for category in MENU_CATEGORIES})
+
+    def payload(self, store_id: str = DEFAULT_STORE_ID) -> Tuple[bytes, str]:
+        store_id = self._store(store_id)
+        if store_id not in self._payloads:
+            body = encode_json(self.menu(store_id))
+            return body, make_etag(body)
+        return self._payloads[store_id]
+
+    def index(self, store_id: str = DEFAULT_STORE_ID) -> Dict[str, dict]:
+        return self._indexes.get(self._store(store_id), {})
+
+    def get_item(self, item_id: str, store_id: str = DEFAULT_STORE_ID) -> Optional[dict]:
+        return self.index(store_id).get(item_id)
+
+    def is_drink(self, item_id: str, store_id: str = DEFAULT_STORE_ID) -> bool:
+        return self._categories.get(self._store(store_id), {}).get(item_id) == "drinks"
 
 
 class MenuService:
     """選單管理服務"""
 
+    _snapshot: Optional[MenuSnapshot] = None
+    _lock = Lock()
+
+    # ========== 記憶體快照 ==========
+
     @staticmethod
-    def get_menu_data() -> dict:
+    def _read_versions(db: Session) -> Dict[str, int]:
+        return dict(db.query(MenuVersion.store_id, MenuVersion.version).all())
+
+    @staticmethod
+    def load_snapshot(db: Session) -> MenuSnapshot:
+        """
+        從資料庫載入所有分店的選單
+
+        先讀版本號再讀餐點：讀取期間選單被修改時，快照的版本號只會比內容舊，
+        下一次檢查就會重新載入
         """
-        取得完整選單資料
+        versions = MenuService._read_versions(db)
+        rows = db.query(MenuItem).filter(
+            MenuItem.is_available.is_(True)
+        ).order_by(
+            MenuItem.store_id, MenuItem.sort_order, MenuItem.id
+        ).all()
+        return MenuSnapshot(versions, rows)
+
+    @staticmethod
+    def get_snapshot() -> MenuSnapshot:
+        """取得目前的選單快照（尚未載入時先從資料庫載入）"""
+        snapshot = MenuService._snapshot
+        if snapshot is None:
+            MenuService.refresh()
+            snapshot = MenuService._snapshot
+        return snapshot
+
+    @staticmethod
+    def refresh(force: bool = False) -> bool:
+        """
+        版本號有變動時重新載入選單快照
+
+        只查詢 menu_versions（每家分店一列），沒有變動時不讀取選單內容；
+        有重新載入時回傳 True
+        """
+        with MenuService._lock:
+            db = SessionLocal()
+            try:
+                current = MenuService._snapshot
+                if not force and current is not None and MenuService._read_versions(db) == current.versions:
+                    return False
+                snapshot = MenuService.load_snapshot(db)
+            finally:
+                db.close()
+
+            MenuService._snapshot = snapshot
+        logger.info(f"已載入選單（版本 {snapshot.versions}）")
+        return True
+
+    @staticmethod
+    async def refresh_loop(interval_seconds: int) -> None:
+        """背景排程：每 interval_seconds 秒檢查一次選單版本"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(MenuService.refresh)
+            except Exception as e:
+                logger.error(f"重新載入選單失敗：{e}", exc_info=True)
+
+    # ========== 查詢（只讀記憶體快照） ==========
+
+    @staticmethod
+    def get_menu_data(store_id: str = DEFAULT_STORE_ID) -> dict:
+        """
+        取得指定店家的完整選單資料
         對應 Code.gs getMenuData()
         """
-        return {
-            "mains": [
-                {"id": "m1", "name": "貓爪咖哩飯", "price": 120},
-                {"id": "m2", "name": "鮭魚親子丼", "price": 150},
-                {"id": "m3", "name": "喵喵義大利麵", "price": 130},
-                {"id": "m4", "name": "貓掌漢堡排", "price": 140}
-            ],
-            "soups": [
-                {"id": "s1", "name": "貓咪味噌湯", "price": 30},
-                {"id": "s2", "name": "奶油南瓜濃湯", "price": 40},
-                {"id": "s3", "name": "海鮮巧達湯", "price": 50}
-            ],
-            "desserts": [
-                {"id": "d1", "name": "貓掌布丁", "price": 60},
-                {"id": "d2", "name": "鮮奶雪花冰", "price": 70},
-                {"id": "d3", "name": "焦糖烤布蕾", "price": 65},
-                {"id": "d4", "name": "貓咪銅鑼燒", "price": 55}
-            ],
-            "drinks": [
-                {"id": "dr1", "name": "貓爪拿鐵", "price": 80},
-                {"id": "dr2", "name": "焦糖瑪奇朵", "price": 90},
-                {"id": "dr3", "name": "抹茶拿鐵", "price": 85},
-                {"id": "dr4", "name": "水果茶", "price": 70},
-                {"id": "dr5", "name": "檸檬冰茶", "price": 60}
-            ]
-        }
+        return MenuService.get_snapshot().menu(store_id)
 
     @staticmethod
-    def get_item_by_id(item_id: str) -> dict:
-        """根據 ID 取得單一餐點資料"""
-        menu = MenuService.get_menu_data()
-        all_items = []
-        all_items.extend(menu['mains'])
-        all_items.extend(menu['soups'])
-        all_items.extend(menu['desserts'])
-        all_items.extend(menu['drinks'])
+    def get_menu_payload(store_id: str = DEFAULT_STORE_ID) -> Tuple[bytes, str]:
+        """
+        取得指定店家序列化後的選單 JSON 與 ETag
+
+        快照建立時就已序列化，請求直接重用 bytes 與 ETag
+        """
+        return MenuService.get_snapshot().payload(store_id)
+
+    @staticmethod
+    def get_menu_index(store_id: str = DEFAULT_STORE_ID) -> Dict[str, dict]:
+        """指定店家的餐點 ID → 餐點資料對照表"""
+        return MenuService.get_snapshot().index(store_id)
+
+    @staticmethod
+    def get_item_by_id(item_id: str, store_id: str = DEFAULT_STORE_ID) -> dict:
+        """根據 ID 取得指定店家的單一餐點資料"""
+        return MenuService.get_snapshot().get_item(item_id, store_id)
+
+    # ========== 管理 ==========
+
+    @staticmethod
+    def upsert_item(db: Session, store_id: str, item_id: str, category: str, name: str,
+                    price: int, sort_order: int = 0, is_available: bool = True) -> MenuItem:
+        """
+        新增或修改一項餐點，並將該分店的選單版本號加一
+
+        分店第一次修改選單時，先複製一份預設分店的選單作為起點。
+        其他 worker 會在下一次版本檢查時載入新選單，本 worker 立即重新載入
+        """
+        if category not in MENU_CATEGORIES:
+            raise ValueError(f"無效的選單分類：{category}")
+
+        has_menu = db.query(MenuItem.id).filter(MenuItem.store_id == store_id).first() is not None
+        if not has_menu and store_id != DEFAULT_STORE_ID:
+            for row in db.query(MenuItem).filter(MenuItem.store_id == DEFAULT_STORE_ID).all():
+                db.add(MenuItem(
+                    store_id=store_id, item_id=row.item_id, category=row.category, name=row.name,
+                    price=row.price, sort_order=row.sort_order, is_available=row.is_available
+                ))
+            db.flush()
+
+        item = db.query(MenuItem).filter(
+            MenuItem.store_id == store_id,
+            MenuItem.item_id == item_id
+        ).first()
+        if item is None:
+            item = MenuItem(store_id=store_id, item_id=item_id)
+            db.add(item)
+        item.category = category
+        item.name = name
+        item.price = price
+        item.sort_order = sort_order
+        item.is_available = is_available
 
-        for item in all_items:
-            if item['id'] == item_id:
-                return item
+        # 版本號與選單內容在同一個交易中提交
+        updated = db.query(MenuVersion).filter(
+            MenuVersion.store_id == store_id
+        ).update({MenuVersion.version: MenuVersion.version + 1})
+        if not updated:
+            db.add(MenuVersion(store_id=store_id, version=1))
 
-        return None
+        db.commit()
+        db.refresh(item)
+        MenuService.refresh()
+        return item
@@ -2,29 +2,45 @@
 訂單服務
 對應 OrderService.gs 的功能
 """
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.models.order import Order
-from app.schemas.order import OrderCreate
+from app.schemas.order import OrderCreate, TEMPERATURE_OPTIONS, SWEETNESS_OPTIONS
+from app.utils.http_cache import encode_json
+from app.utils.order_cache import order_cache
 from app.utils.order_number import generate_order_number
 from app.utils.validation import validate_price
-from app.services.menu_service import MenuService
-from typing import List, Tuple
+from app.services.menu_service import MenuService, MenuSnapshot
+from app.services.archive_service import ArchiveService
+from app.services.item_pair_service import ItemPairService
+from app.services.today_service import TodayService
+from app.utils.stores import DEFAULT_STORE_ID
+from typing import List, Optional, Tuple
+import re
+import secrets
+
+# 訂單編號只精確到秒，同一秒內的訂單編號衝突時加上隨機後綴重試
+ORDER_NUMBER_RETRIES = 5
+
+# format_items 的單一品項：「名稱 x數量」，飲料再加上「 (溫度, 甜度)」，品項間以「, 」分隔
+ITEM_DETAIL_PATTERN = re.compile(r"\s*(?P<name>[^,()]+?) x(?P<quantity>\d+)(?: \((?P<options>[^()]*)\))?\s*(?:,|$)")
 
 
 class OrderService:
     """訂單處理服務"""
 
     @staticmethod
-    def validate_order_items(items: list) -> Tuple[bool, str]:
+    def validate_order_items(items: list, store_id: str = DEFAULT_STORE_ID,
+                             menu: Optional[MenuSnapshot] = None) -> Tuple[bool, str]:
         """
-        驗證訂單項目的價格是否正確
-        對應 Code.gs line 105-113 的價格驗證
+        驗證訂單項目是否存在於該店家的選單且價格相符
+        對應 Code.gs line 82-94、105-113 的餐點與價格驗證
         """
-        menu_service = MenuService()
+        menu = menu or MenuService.get_snapshot()
 
         for item in items:
             # 取得正確的餐點資料
-            menu_item = menu_service.get_item_by_id(item.id)
+            menu_item = menu.get_item(item.id, store_id)
 
             if not menu_item:
                 return False, f"無效的餐點項目：{item.id}"
@@ -72,13 +88,52 @@ class OrderService:
         return ", ".join(formatted)
 
     @staticmethod
-    def create_order(db: Session, order_data: OrderCreate) -> Order:
+    def parse_items(text: str) -> List[dict]:
+        """
+        解析 format_items 產生的餐點明細（反向操作，匯入 Google Sheets 舊訂單用）
+
+        例如「貓爪拿鐵 x1 (少冰, 半糖), 貓掌布丁 x2」→
+        [{'name': '貓爪拿鐵', 'quantity': 1, 'temperature': '少冰', 'sweetness': '半糖'},
+         {'name': '貓掌布丁', 'quantity': 2}]
+        無法解析時拋出 ValueError
+        """
+        text = (text or "").strip()
+        if not text or text == "-":
+            return []
+
+        items = []
+        position = 0
+        for match in ITEM_DETAIL_PATTERN.finditer(text):
+            if match.start() != position:
+                break
+            item = {'name': match.group('name').strip(), 'quantity': int(match.group('quantity'))}
+            for option in (match.group('options') or "").split(","):
+                option = option.strip()
+                if option in TEMPERATURE_OPTIONS:
+                    item['temperature'] = option
+                elif option in SWEETNESS_OPTIONS:
+                    item['sweetness'] = option
+                elif option:
+                    raise ValueError(f"無法辨識的飲料選項：{option}")
+            items.append(item)
+            position = match.end()
+
+        if position != len(text):
+            raise ValueError(f"無法解析的餐點明細：{text}")
+        return items
+
+    @staticmethod
+    def create_order(db: Session, order_data: OrderCreate, menu: Optional[MenuSnapshot] = None) -> Order:
         """
         建立訂單
         對應 OrderService.gs saveOrder (line 108-159)
+
+        menu 為驗證時使用的選單快照，依其分類分離餐點與飲料
         """
+        menu = menu or MenuService.get_snapshot()
+
         # 產生訂單編號
-        order_number = generate_order_number()
+        base_order_number = generate_order_number()
 
         # 分離餐點與飲料
         meals = []
@@ -86,27 +141,81 @@ class OrderService:
 
         for item in order_data.items:
             item_dict = item.model_dump()
-            if item.id.startswith('dr'):
+            if menu.is_drink(item.id, order_data.storeId):
                 drinks.append(item_dict)
             else:
                 meals.append(item_dict)
 
-        # 建立訂單記錄
-        db_order = Order(
-            order_number=order_number,
-            customer_name=order_data.customerName,
-            pickup_method=order_data.diningOption,
-            items=meals,
-            drinks=drinks,
-            total_amount=order_data.totalAmount,
-            notes=order_data.note or ""
-        )
+        for attempt in range(ORDER_NUMBER_RETRIES):
+            order_number = base_order_number
+            if attempt:
+                order_number += f"{secrets.randbelow(10000):04d}"
+
+            # 建立訂單記錄
+            db_order = Order(
+                order_number=order_number,
+                store_id=order_data.storeId,
+                customer_name=order_data.customerName,
+                pickup_method=order_data.diningOption,
+                items=meals,
+                drinks=drinks,
+                total_amount=order_data.totalAmount,
+                notes=order_data.note or ""
+            )
+
+            db.add(db_order)
+            try:
+                # 先寫入訂單取得店家當地日期，品項組合統計與訂單在同一個交易中累加
+                db.flush()
+                ItemPairService.add_orders(db, [db_order])
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                if attempt == ORDER_NUMBER_RETRIES - 1:
+                    raise
+                continue
+
+            db.refresh(db_order)
+            # 寫入訂單快取，顧客隨即查詢訂單時不必再讀資料庫
+            OrderService.cache_order(db_order)
+            TodayService.add_order(db_order)
+            return db_order
+
+    @staticmethod
+    def serialize_order(order: Order) -> dict:
+        """將訂單轉成可直接序列化成 JSON 的 dict"""
+        return {
+            "id": order.id,
+            "order_number": order.order_number,
+            "store_id": order.store_id,
+            "customer_name": order.customer_name,
+            "pickup_method": order.pickup_method,
+            "items": order.items,
+            "drinks": order.drinks,
+            "total_amount": order.total_amount,
+            "notes": order.notes,
+            "created_at": order.created_at,
+            "local_date": order.local_date,
+            "local_hour": order.local_hour
+        }
 
-        db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
+    @staticmethod
+    def cache_order(order: Order) -> bytes:
+        """序列化訂單並寫入訂單快取，回傳 JSON bytes"""
+        body = encode_json(OrderService.serialize_order(order))
+        order_cache.set(order.order_number, body)
+        return body
 
-        return db_order
+    @staticmethod
+    def get_order_json(db: Session, order_number: str) -> Optional[bytes]:
+        """查詢訂單的 JSON（優先讀取訂單快取），找不到時回傳 None"""
+        body = order_cache.get(order_number)
+        if body is None:
+            order = OrderService.get_order_by_number(db, order_number)
+            if order is None:
+                return None
+            body = OrderService.cache_order(order)
+        return body
 
     @staticmethod
     def get_orders(db: Session, skip: int = 0, limit: int = 100) -> List[Order]:
@@ -114,6 +223,9 @@ class OrderService:
         return db.query(Order).order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
 
     @staticmethod
-    def get_order_by_number(db: Session, order_number: str) -> Order:
-        """根據訂單編號查詢訂單"""
-        return db.query(Order).filter(Order.order_number == order_number).first()
+    def get_order_by_number(db: Session, order_number: str) -> Optional[Order]:
+        """根據訂單編號查詢訂單（找不到時再查已封存的訂單）"""
+        order = db.query(Order).filter(Order.order_number == order_number).first()
+        if order is None:
+            order = ArchiveService.get_archived_order(db, order_number)
+        return order
@@ -0,0 +1,179 @@
+"""
+訂單近似統計服務
+每個已結束的日期（分店 × 日期）建立一份顧客數 HyperLogLog 與金額 DDSketch，存在 daily_order_sketches；
+查詢任意區間時合併每天的摘要，不必對整個區間做 COUNT(DISTINCT) 或排序
+
+- 摘要由 scripts/build_order_sketches.py 建立（建議每天營業結束後執行），同時讀取 orders 與 orders_archive
+- 沒有任何訂單的已結束日期也會寫入一列 order_count=0 的空摘要，表示該日已建立
+- 今天或尚未建立摘要的日期，查詢時從訂單即時建立（不儲存）；最早一筆訂單之前的日期不需讀取
+- 誤差範圍見 app/utils/sketches.py
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.analytics import DailyOrderSketch
+from app.models.archive import ArchivedOrder
+from app.models.order import Order
+from app.utils.sketches import DDSketch, HyperLogLog
+from app.utils.stores import DEFAULT_STORE_ID
+from app.utils.timezone import local_date_hour, local_day_bounds, get_store_timezone, store_today
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (訂單數, 顧客 HyperLogLog, 金額 DDSketch)
+DaySketch = Tuple[int, HyperLogLog, DDSketch]
+
+
+def _merge(sketches: dict, key, sketch: DaySketch) -> None:
+    if key not in sketches:
+        sketches[key] = sketch
+        return
+    count, customers, amounts = sketches[key]
+    sketches[key] = (count + sketch[0], customers.merge(sketch[1]), amounts.merge(sketch[2]))
+
+
+class OrderSketchService:
+    """每日訂單近似統計摘要的建立與合併"""
+
+    @staticmethod
+    def _fetch(db: Session, start_date: date, end_date: date, store_id: Optional[str] = None) -> List:
+        """日期區間內（含已封存）訂單的分店、日期、顧客姓名與金額"""
+        start_dt, end_dt = local_day_bounds(start_date, end_date, get_store_timezone())
+        rows = []
+        for model in (Order, ArchivedOrder):
+            query = db.query(
+                model.store_id, model.local_date, model.created_at, model.customer_name, model.total_amount
+            ).filter(model.created_at >= start_dt, model.created_at < end_dt)
+            if store_id:
+                query = query.filter(model.store_id == store_id)
+            rows += query.all()
+        return rows
+
+    @staticmethod
+    def build(rows: List) -> Dict[Tuple[date, str], DaySketch]:
+        """將訂單依（日期, 分店）建立摘要"""
+        groups = {}
+        for r in rows:
+            day = r.local_date or local_date_hour(r.created_at)[0]
+            names, amounts = groups.setdefault((day, r.store_id), ([], []))
+            names.append(r.customer_name.strip())
+            amounts.append(r.total_amount)
+
+        return {
+            key: (len(amounts), HyperLogLog().add_all(names), DDSketch().add_all(amounts))
+            for key, (names, amounts) in groups.items()
+        }
+
+    @staticmethod
+    def _first_order_day(db: Session) -> Optional[date]:
+        """最早一筆訂單（含已封存）的店家當地日期，沒有訂單時回傳 None"""
+        firsts = [db.query(func.min(model.created_at)).scalar() for model in (Order, ArchivedOrder)]
+        firsts = [first for first in firsts if first]
+        return local_date_hour(min(firsts))[0] if firsts else None
+
+    @staticmethod
+    def build_closed_days(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          force: bool = False, days_per_batch: int = 31) -> int:
+        """
+        建立已結束日期（不含今天）的摘要，回傳建立的日期數
+
+        未指定開始日期時從最早的訂單開始；已有摘要的日期預設跳過，force=True 時重建。
+        沒有訂單的日期寫入一列 order_count=0 的空摘要（分店為 DEFAULT_STORE_ID），查詢時就不必再即時讀取
+        """
+        last_closed_day = store_today() - timedelta(days=1)
+        end_date = min(end_date or last_closed_day, last_closed_day)
+        if start_date is None:
+            start_date = OrderSketchService._first_order_day(db)
+            if start_date is None:
+                return 0
+
+        built_days = 0
+        batch_start = start_date
+        while batch_start <= end_date:
+            batch_end = min(batch_start + timedelta(days=days_per_batch - 1), end_date)
+            batch_days = {batch_start + timedelta(days=i) for i in range((batch_end - batch_start).days + 1)}
+            existing = set() if force else {
+                day for day, in db.query(DailyOrderSketch.local_date).filter(
+                    DailyOrderSketch.local_date.between(batch_start, batch_end)
+                ).distinct()
+            }
+            if existing >= batch_days:
+                batch_start = batch_end + timedelta(days=1)
+                continue
+
+            sketches = {
+                (day, store_id): sketch
+                for (day, store_id), sketch in OrderSketchService.build(
+                    OrderSketchService._fetch(db, batch_start, batch_end)
+                ).items()
+                if day not in existing
+            }
+            for day in batch_days - existing - {day for day, _ in sketches}:
+                sketches[(day, DEFAULT_STORE_ID)] = (0, HyperLogLog(), DDSketch())
+            if force:
+                db.query(DailyOrderSketch).filter(
+                    DailyOrderSketch.local_date.between(batch_start, batch_end)
+                ).delete(synchronize_session=False)
+            db.add_all([
+                DailyOrderSketch(
+                    local_date=day, store_id=store_id, order_count=count,
+                    customer_hll=customers.to_bytes(), amount_sketch=amounts.to_dict()
+                )
+                for (day, store_id), (count, customers, amounts) in sketches.items()
+            ])
+            db.commit()
+
+            days = {day for day, _ in sketches}
+            built_days += len(days)
+            if days:
+                logger.info(f"訂單近似統計摘要已建立：{batch_start} ~ {batch_end}（{len(days)} 天）")
+            batch_start = batch_end + timedelta(days=1)
+
+        return built_days
+
+    @staticmethod
+    def day_sketches(db: Session, start_date: date, end_date: date,
+                     store_id: Optional[str] = None) -> Dict[date, DaySketch]:
+        """
+        區間內每天的摘要（未指定分店時合併所有分店），沒有訂單的日期不列出
+
+        任一分店有摘要列的日期即視為已建立（該分店沒有列表示當天沒有訂單）；
+        缺少摘要的日期依連續區段即時建立，區段長度受 ANALYTICS_MAX_LIVE_RANGE_DAYS 限制
+        """
+        from app.services.analytics_service import check_live_range
+
+        built = set()
+        sketches = {}
+        for row in db.query(DailyOrderSketch).filter(DailyOrderSketch.local_date.between(start_date, end_date)):
+            built.add(row.local_date)
+            if store_id and row.store_id != store_id:
+                continue
+            _merge(sketches, row.local_date, (
+                row.order_count, HyperLogLog.from_bytes(row.customer_hll), DDSketch.from_dict(row.amount_sketch)
+            ))
+
+        # 今天與尚未建立摘要的日期（最早一筆訂單之前的日期沒有資料，不必讀取）
+        if len(built) < (end_date - start_date).days + 1:
+            first_day = OrderSketchService._first_order_day(db)
+            start_date = max(start_date, first_day) if first_day else end_date + timedelta(days=1)
+
+        runs = []
+        day = start_date
+        while day <= end_date:
+            if day not in built:
+                if runs and runs[-1][1] == day - timedelta(days=1):
+                    runs[-1][1] = day
+                else:
+                    runs.append([day, day])
+            day += timedelta(days=1)
+
+        for run_start, run_end in runs:
+            check_live_range('order_sketches', run_start, run_end)
+            for (day, _), sketch in OrderSketchService.build(
+                OrderSketchService._fetch(db, run_start, run_end, store_id)
+            ).items():
+                _merge(sketches, day, sketch)
+
+        return {day: sketch for day, sketch in sketches.items() if sketch[0]}
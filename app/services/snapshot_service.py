@@ -0,0 +1,420 @@
+"""
+Snapshot Service - Columnar (Parquet) snapshots for historical analytics
+
+已結束的日期會匯出成依日期分割的 Parquet 檔：
+    {snapshot_dir}/orders/day=YYYY-MM-DD/part-0.parquet       訂單
+    {snapshot_dir}/order_lines/day=YYYY-MM-DD/part-0.parquet  攤平後的餐點/飲料明細
+
+歷史區間的分析直接以 pandas 向量化運算讀檔，只有「今天」需要即時查詢資料庫。
+pandas 只在實際讀寫快照時才載入，未啟用快照時不影響啟動時間。
+"""
+from __future__ import annotations
+
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.models.order import Order
+from app.utils.heatmap import heatmap_result
+from app.utils.stores import DEFAULT_STORE_ID, store_revenue_result
+from app.utils.timezone import local_day_bounds, get_store_timezone, store_today, local_date_hour
+from datetime import date, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import logging
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ORDER_COLUMNS = [
+    'order_id', 'order_number', 'store_id', 'day', 'hour',
+    'customer_name', 'pickup_method', 'total_amount'
+]
+LINE_COLUMNS = [
+    'order_id', 'store_id', 'day', 'hour', 'category', 'item_id', 'item_name',
+    'price', 'quantity', 'temperature', 'sweetness'
+]
+
+
+def _concat(frames: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    """合併多個 DataFrame（略過空表，全空時回傳只有欄位的空表）"""
+    import pandas as pd
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+class SnapshotStore:
+    """Parquet 快照檔案的讀寫"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _partition(self, table: str, day: date) -> Path:
+        return self.root / table / f"day={day.isoformat()}"
+
+    def has_day(self, day: date) -> bool:
+        """該日期是否已匯出（訂單與明細都存在才算）"""
+        return all(
+            (self._partition(table, day) / "part-0.parquet").exists()
+            for table in ('orders', 'order_lines')
+        )
+
+    def covers(self, start_date: date, end_date: date) -> bool:
+        """區間內每一天都已有快照"""
+        day = start_date
+        while day <= end_date:
+            if not self.has_day(day):
+                return False
+            day += timedelta(days=1)
+        return True
+
+    def write_day(self, day: date, orders_df: pd.DataFrame, lines_df: pd.DataFrame) -> None:
+        """寫入單日快照（先寫暫存檔再 rename，避免讀到半份檔案）"""
+        for table, df in (('orders', orders_df), ('order_lines', lines_df)):
+            partition = self._partition(table, day)
+            partition.mkdir(parents=True, exist_ok=True)
+            tmp_path = partition / "part-0.parquet.tmp"
+            df.to_parquet(tmp_path, engine='pyarrow', index=False)
+            tmp_path.replace(partition / "part-0.parquet")
+
+    def read(self, table: str, start_date: date, end_date: date) -> pd.DataFrame:
+        """讀取區間內的快照並合併成單一 DataFrame"""
+        import pandas as pd
+
+        columns = ORDER_COLUMNS if table == 'orders' else LINE_COLUMNS
+        frames = []
+        day = start_date
+        while day <= end_date:
+            path = self._partition(table, day) / "part-0.parquet"
+            if path.exists():
+                frames.append(pd.read_parquet(path, engine='pyarrow'))
+            day += timedelta(days=1)
+
+        return _concat(frames, columns)
+
+
+class SnapshotService:
+    """快照匯出與查詢服務"""
+
+    @staticmethod
+    def get_store() -> Optional[SnapshotStore]:
+        """取得快照儲存區（未啟用時回傳 None）"""
+        settings = get_settings()
+        if not settings.snapshot_enabled:
+            return None
+        return SnapshotStore(settings.snapshot_dir)
+
+    @staticmethod
+    def orders_to_frames(orders: List[Order]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """將訂單轉成（訂單、明細）兩張扁平表"""
+        import pandas as pd
+
+        order_rows = []
+        line_rows = []
+
+        for order in orders:
+            day, hour = order.local_date, order.local_hour
+            if day is None or hour is None:
+                day, hour = local_date_hour(order.created_at)
+            order_rows.append({
+                'order_id': order.id,
+                'order_number': order.order_number,
+                'store_id': order.store_id,
+                'day': day,
+                'hour': hour,
+                'customer_name': order.customer_name,
+                'pickup_method': order.pickup_method,
+                'total_amount': order.total_amount
+            })
+
+            for category, items in (('dish', order.items), ('drink', order.drinks)):
+                for item in items or []:
+                    line_rows.append({
+                        'order_id': order.id,
+                        'store_id': order.store_id,
+                        'day': day,
+                        'hour': hour,
+                        'category': category,
+                        'item_id': item['id'],
+                        'item_name': item['name'],
+                        'price': item['price'],
+                        'quantity': item['quantity'],
+                        'temperature': item.get('temperature') or None,
+                        'sweetness': item.get('sweetness') or None
+                    })
+
+        orders_df = pd.DataFrame(order_rows, columns=ORDER_COLUMNS)
+        lines_df = pd.DataFrame(line_rows, columns=LINE_COLUMNS)
+        return SnapshotService._normalize(orders_df, lines_df)
+
+    @staticmethod
+    def _normalize(orders_df: pd.DataFrame, lines_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        固定欄位型別，讓空的日期也能寫出相同 schema 的檔案
+
+        區分分店前匯出的快照沒有 store_id，視為預設分店
+        """
+        for df in (orders_df, lines_df):
+            if 'store_id' not in df:
+                df['store_id'] = DEFAULT_STORE_ID
+            df['store_id'] = df['store_id'].fillna(DEFAULT_STORE_ID)
+        orders_df = orders_df.astype({
+            'order_id': 'int64', 'hour': 'int64', 'total_amount': 'int64',
+            'order_number': 'string', 'store_id': 'string', 'customer_name': 'string',
+            'pickup_method': 'string'
+        })
+        lines_df = lines_df.astype({
+            'order_id': 'int64', 'hour': 'int64', 'price': 'int64', 'quantity': 'int64',
+            'store_id': 'string', 'category': 'string', 'item_id': 'string', 'item_name': 'string',
+            'temperature': 'string', 'sweetness': 'string'
+        })
+        return orders_df, lines_df
+
+    @staticmethod
+    def _fetch_orders(db: Session, start_date: date, end_date: date) -> List[Order]:
+        """區間內的訂單（含已封存的訂單，封存後重新匯出的快照內容不變）"""
+        from app.services.archive_service import ArchiveService
+
+        start_datetime, end_datetime = local_day_bounds(start_date, end_date, get_store_timezone())
+
+        orders = db.query(Order).filter(
+            Order.created_at >= start_datetime,
+            Order.created_at < end_datetime
+        ).all()
+        return orders + ArchiveService.fetch_archived_orders(db, start_date, end_date)
+
+    @staticmethod
+    def export_day(db: Session, day: date) -> int:
+        """匯出單日快照，回傳訂單數"""
+        store = SnapshotStore(get_settings().snapshot_dir)
+        orders = SnapshotService._fetch_orders(db, day, day)
+        orders_df, lines_df = SnapshotService.orders_to_frames(orders)
+        store.write_day(day, orders_df, lines_df)
+        return len(orders_df)
+
+    @staticmethod
+    def export_closed_days(db: Session, start_date: date, end_date: Optional[date] = None,
+                           force: bool = False) -> Dict[date, int]:
+        """
+        匯出已結束的日期（不含今天）
+
+        已存在的快照預設跳過，force=True 時重新匯出。
+        """
+        store = SnapshotStore(get_settings().snapshot_dir)
+        last_closed_day = store_today() - timedelta(days=1)
+        end_date = min(end_date or last_closed_day, last_closed_day)
+
+        exported = {}
+        day = start_date
+        while day <= end_date:
+            if force or not store.has_day(day):
+                exported[day] = SnapshotService.export_day(db, day)
+                logger.info(f"快照已匯出：{day}（{exported[day]} 筆訂單）")
+            day += timedelta(days=1)
+
+        return exported
+
+    @staticmethod
+    def load_frames(db: Session, store: SnapshotStore, start_date: date,
+                    end_date: date) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """歷史日期讀快照，今天的部分即時查詢後合併"""
+        today = store_today()
+        orders_frames = []
+        lines_frames = []
+
+        history_end = min(end_date, today - timedelta(days=1))
+        if start_date <= history_end:
+            orders_frames.append(store.read('orders', start_date, history_end))
+            lines_frames.append(store.read('order_lines', start_date, history_end))
+
+        if end_date >= today:
+            live_orders, live_lines = SnapshotService.orders_to_frames(
+                SnapshotService._fetch_orders(db, today, today)
+            )
+            orders_frames.append(live_orders)
+            lines_frames.append(live_lines)
+
+        return SnapshotService._normalize(
+            _concat(orders_frames, ORDER_COLUMNS),
+            _concat(lines_frames, LINE_COLUMNS)
+        )
+
+
+class SnapshotAnalyticsBackend:
+    """
+    以 Parquet 快照回答分析查詢的後端
+
+    方法名稱與參數與 AnalyticsService 相同，回傳格式也一致。
+    """
+
+    def can_serve(self, db: Session, start_date: date, end_date: date) -> bool:
+        store = SnapshotService.get_store()
+        if store is None:
+            return False
+
+        history_end = min(end_date, store_today() - timedelta(days=1))
+        if start_date > history_end:
+            # 只查今天時直接走即時查詢
+            return False
+        return store.covers(start_date, history_end)
+
+    def _frames(self, db: Session, start_date: date, end_date: date,
+                store_id: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        orders_df, lines_df = SnapshotService.load_frames(
+            db, SnapshotService.get_store(), start_date, end_date
+        )
+        if store_id:
+            orders_df = orders_df[orders_df['store_id'] == store_id]
+            lines_df = lines_df[lines_df['store_id'] == store_id]
+        return orders_df, lines_df
+
+    def get_daily_revenue(self, db: Session, start_date: date, end_date: date,
+                          store_id: Optional[str] = None) -> Dict:
+        orders_df, _ = self._frames(db, start_date, end_date, store_id)
+        daily = orders_df.groupby('day', sort=True).agg(
+            revenue=('total_amount', 'sum'),
+            order_count=('order_id', 'count')
+        )
+
+        # 與即時查詢一致：沒有訂單的日期也回傳 0
+        data = []
+        day = start_date
+        while day <= end_date:
+            revenue, order_count = daily.loc[day] if day in daily.index else (0, 0)
+            data.append({'date': day, 'revenue': int(revenue), 'order_count': int(order_count)})
+            day += timedelta(days=1)
+
+        return {
+            'period': 'daily',
+            'start_date': start_date,
+            'end_date': end_date,
+            'data': data,
+            'total_revenue': sum(d['revenue'] for d in data),
+            'total_orders': sum(d['order_count'] for d in data)
+        }
+
+    def get_store_revenue(self, db: Session, start_date: date, end_date: date) -> Dict:
+        orders_df, _ = self._frames(db, start_date, end_date)
+        totals = orders_df.groupby('store_id').agg(
+            revenue=('total_amount', 'sum'),
+            order_count=('order_id', 'count')
+        )
+        return store_revenue_result(start_date, end_date, {
+            store_id: (int(row.revenue), int(row.order_count))
+            for store_id, row in totals.iterrows()
+        })
+
+    def _popular_items(self, db: Session, start_date: date, end_date: date,
+                       category: str, limit: int, store_id: Optional[str] = None) -> List[Dict]:
+        _, lines_df = self._frames(db, start_date, end_date, store_id)
+        lines_df = lines_df[lines_df['category'] == category]
+        lines_df = lines_df.assign(line_revenue=lines_df['price'] * lines_df['quantity'])
+
+        stats = lines_df.groupby('item_id', sort=False).agg(
+            item_name=('item_name', 'first'),
+            total_quantity=('quantity', 'sum'),
+            total_revenue=('line_revenue', 'sum'),
+            order_count=('order_id', 'size')
+        ).sort_values('total_quantity', ascending=False, kind='stable').head(limit)
+
+        return [
+            {
+                'item_id': item_id,
+                'item_name': row.item_name,
+                'total_quantity': int(row.total_quantity),
+                'total_revenue': int(row.total_revenue),
+                'order_count': int(row.order_count)
+            }
+            for item_id, row in stats.iterrows()
+        ]
+
+    def get_popular_dishes(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'dishes',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, start_date, end_date, 'dish', limit, store_id)
+        }
+
+    def get_popular_drinks(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'drinks',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, start_date, end_date, 'drink', limit, store_id)
+        }
+
+    def get_peak_hours(self, db: Session, start_date: date, end_date: date,
+                       store_id: Optional[str] = None) -> Dict:
+        orders_df, _ = self._frames(db, start_date, end_date, store_id)
+        hourly = orders_df.groupby('hour', sort=True).agg(
+            order_count=('order_id', 'count'),
+            revenue=('total_amount', 'sum')
+        )
+
+        hourly_data = [
+            {'hour': int(hour), 'order_count': int(row.order_count), 'revenue': int(row.revenue)}
+            for hour, row in hourly.iterrows()
+        ]
+        peak_hour = max(hourly_data, key=lambda x: x['order_count']) if hourly_data else None
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'hourly_data': hourly_data,
+            'peak_hour': peak_hour['hour'] if peak_hour else 0,
+            'peak_hour_orders': peak_hour['order_count'] if peak_hour else 0
+        }
+
+    def get_weekday_hour_heatmap(self, db: Session, start_date: date, end_date: date,
+                                 store_id: Optional[str] = None) -> Dict:
+        import pandas as pd
+
+        orders_df, _ = self._frames(db, start_date, end_date, store_id)
+        weekdays = pd.to_datetime(orders_df['day']).dt.weekday.rename('weekday')
+        cells = orders_df.groupby([weekdays, orders_df['hour']]).agg(
+            order_count=('order_id', 'count'),
+            revenue=('total_amount', 'sum')
+        )
+
+        return heatmap_result(start_date, end_date, (
+            (weekday, hour, row.order_count, row.revenue) for (weekday, hour), row in cells.iterrows()
+        ))
+
+    def _beverage_preferences(self, db: Session, start_date: date, end_date: date,
+                              column: str, preference_type: str, store_id: Optional[str] = None) -> Dict:
+        _, lines_df = self._frames(db, start_date, end_date, store_id)
+        drinks = lines_df[(lines_df['category'] == 'drink') & lines_df[column].notna()]
+        counts = drinks.groupby(column)['quantity'].sum().sort_values(ascending=False, kind='stable')
+        total_drinks = int(counts.sum())
+
+        preferences = [
+            {
+                'option': option,
+                'count': int(count),
+                'percentage': round((count / total_drinks * 100), 2) if total_drinks > 0 else 0
+            }
+            for option, count in counts.items()
+        ]
+
+        return {
+            'preference_type': preference_type,
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_drinks': total_drinks,
+            'preferences': preferences,
+            'most_popular': preferences[0]['option'] if preferences else 'N/A'
+        }
+
+    def get_ice_level_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, start_date, end_date, 'temperature', 'ice_level', store_id)
+
+    def get_sweetness_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, start_date, end_date, 'sweetness', 'sweetness', store_id)
@@ -0,0 +1,341 @@
+"""
+今天的即時彙總
+後台最常查看的區間是「今天」，每個圖表各自重新讀取今天所有訂單；改由每個 worker 在記憶體中
+維護今天的彙總（與 rollup 資料表相同的資料列：營收/訂單數、每小時、各品項數量、飲料選項杯數），
+只查今天的分析直接由記憶體回答
+
+- 啟動時以一次查詢建立；本 worker 建立的訂單在 OrderService.create_order 中直接累加
+- 背景排程每 TODAY_SYNC_SECONDS 秒讀取 id 大於已讀取最大值的新訂單（其他 worker 建立的訂單），
+  每 TODAY_RECONCILE_SECONDS 秒重新查詢今天的全部訂單校正（較晚 commit 的較小 id、離線腳本修改的訂單）
+- 店家當地日期改變時（午夜）重新建立新的一天
+"""
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.archive import DailyRevenueRollup, HourlyOrdersRollup, ItemSalesRollup, BeverageOptionsRollup
+from app.models.order import Order
+from app.services.archive_service import ArchiveService, ROLLUP_SUM_COLUMNS, _add
+from app.utils.heatmap import heatmap_result
+from app.utils.stores import store_revenue_result
+from app.utils.timezone import local_date_hour, local_day_bounds, get_store_timezone, store_today
+from datetime import date
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TodayAggregate:
+    """一天的彙總：rollup 模型 → 主鍵 → 資料列"""
+
+    def __init__(self, day: date):
+        self.day = day
+        self.rows = {model: {} for model in ROLLUP_SUM_COLUMNS}
+        self.order_ids = set()
+        # 從資料庫讀取過的最大訂單 id（本 worker 直接累加的訂單不計入，避免略過其他 worker 較小的 id）
+        self.max_fetched_id = 0
+
+    def add(self, orders: Iterable) -> int:
+        """累加尚未計入且屬於這一天的訂單，回傳新增筆數"""
+        new_orders = [
+            order for order in orders
+            if order.id not in self.order_ids
+            and (order.local_date or local_date_hour(order.created_at)[0]) == self.day
+        ]
+        for model, rows in ArchiveService.fold_orders(new_orders).items():
+            table = self.rows[model]
+            for row in rows:
+                key = tuple(row[column.name] for column in model.__table__.primary_key)
+                if key in table:
+                    for column in ROLLUP_SUM_COLUMNS[model]:
+                        table[key][column] += row[column]
+                else:
+                    table[key] = row
+        self.order_ids.update(order.id for order in new_orders)
+        return len(new_orders)
+
+    def select(self, model, store_id: Optional[str] = None, **filters) -> List[dict]:
+        """符合條件的資料列（複本，之後累加的訂單不影響）"""
+        return [
+            dict(row) for row in self.rows[model].values()
+            if (not store_id or row['store_id'] == store_id)
+            and all(row[column] == value for column, value in filters.items())
+        ]
+
+
+_today: Optional[TodayAggregate] = None
+_lock = Lock()
+_synced_at = 0.0
+_reconciled_at = 0.0
+
+
+class TodayService:
+    """今天彙總的建立、累加與同步"""
+
+    @staticmethod
+    def _fetch(db: Session, day: date, after_id: int = 0) -> List:
+        """今天（店家當地）id 大於 after_id 的訂單（彙總所需的欄位）"""
+        start_dt, end_dt = local_day_bounds(day, day, get_store_timezone())
+        return db.query(
+            Order.id, Order.store_id, Order.pickup_method, Order.items, Order.drinks, Order.total_amount,
+            Order.created_at, Order.local_date, Order.local_hour
+        ).filter(Order.created_at >= start_dt, Order.created_at < end_dt, Order.id > after_id).all()
+
+    @staticmethod
+    def _fetch_into(db: Session, aggregate: TodayAggregate) -> int:
+        orders = TodayService._fetch(db, aggregate.day, aggregate.max_fetched_id)
+        if orders:
+            aggregate.max_fetched_id = max(order.id for order in orders)
+        return aggregate.add(orders)
+
+    @staticmethod
+    def reconcile(db: Session) -> TodayAggregate:
+        """以一次查詢重新建立今天的彙總（啟動、午夜換日與定期校正）"""
+        global _today, _synced_at, _reconciled_at
+
+        with _lock:
+            aggregate = TodayAggregate(store_today())
+            TodayService._fetch_into(db, aggregate)
+            if _today is not None and _today.day == aggregate.day and _today.order_ids != aggregate.order_ids:
+                logger.info(f"今天的彙總已校正：{len(_today.order_ids)} → {len(aggregate.order_ids)} 筆訂單")
+            _today = aggregate
+            _synced_at = _reconciled_at = time.monotonic()
+            return aggregate
+
+    @staticmethod
+    def sync(db: Session) -> int:
+        """讀取其他 worker 建立的新訂單，回傳新增筆數；換日或到了校正時間時改為 reconcile"""
+        global _synced_at
+
+        settings = get_settings()
+        if _today is None or _today.day != store_today() \
+                or time.monotonic() - _reconciled_at >= settings.today_reconcile_seconds:
+            TodayService.reconcile(db)
+            return 0
+        with _lock:
+            added = TodayService._fetch_into(db, _today)
+            _synced_at = time.monotonic()
+            return added
+
+    @staticmethod
+    def add_order(order: Order) -> None:
+        """累加本 worker 剛建立的訂單（訂單已 commit；尚未建立或已換日時略過，由同步補上）"""
+        if not get_settings().today_aggregate_enabled:
+            return
+        with _lock:
+            if _today is not None:
+                _today.add([order])
+
+    @staticmethod
+    def current(db: Session) -> Optional[TodayAggregate]:
+        """今天的彙總；停用時回傳 None，尚未建立或已換日時先建立"""
+        if not get_settings().today_aggregate_enabled:
+            return None
+        if _today is None or _today.day != store_today():
+            return TodayService.reconcile(db)
+        return _today
+
+    @staticmethod
+    def stats() -> Dict:
+        """目前的日期、訂單數與距上次同步/校正的秒數"""
+        if _today is None:
+            return {"enabled": get_settings().today_aggregate_enabled, "day": None}
+        now = time.monotonic()
+        return {
+            "enabled": get_settings().today_aggregate_enabled,
+            "day": _today.day.isoformat(),
+            "orders": len(_today.order_ids),
+            "synced_seconds_ago": round(now - _synced_at, 1),
+            "reconciled_seconds_ago": round(now - _reconciled_at, 1)
+        }
+
+    @staticmethod
+    def sync_now() -> int:
+        """以新的 Session 立即同步一次（啟動時預熱與背景排程使用），回傳新增的訂單數"""
+        db = SessionLocal()
+        try:
+            return TodayService.sync(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    async def sync_loop(interval_seconds: int) -> None:
+        """背景排程：每 interval_seconds 秒同步一次（含換日與定期校正）"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(TodayService.sync_now)
+            except Exception as e:
+                logger.error(f"同步今天的彙總失敗：{e}", exc_info=True)
+
+
+class TodayAnalyticsBackend:
+    """
+    以記憶體中今天的彙總回答只查今天的分析
+
+    其他 worker 建立的訂單最慢在 TODAY_SYNC_SECONDS 秒內反映。
+    """
+
+    def can_serve(self, db: Session, start_date: date, end_date: date) -> bool:
+        return start_date == end_date == store_today() and TodayService.current(db) is not None
+
+    @staticmethod
+    def _rows(db: Session, model, store_id: Optional[str] = None, **filters) -> List[dict]:
+        aggregate = TodayService.current(db)
+        with _lock:
+            return aggregate.select(model, store_id, **filters)
+
+    def get_daily_revenue(self, db: Session, start_date: date, end_date: date,
+                          store_id: Optional[str] = None) -> Dict:
+        rows = self._rows(db, DailyRevenueRollup, store_id)
+        revenue = sum(r['revenue'] for r in rows)
+        order_count = sum(r['order_count'] for r in rows)
+
+        return {
+            'period': 'daily',
+            'start_date': start_date,
+            'end_date': end_date,
+            'data': [{'date': start_date, 'revenue': revenue, 'order_count': order_count}],
+            'total_revenue': revenue,
+            'total_orders': order_count
+        }
+
+    def get_average_order_value(self, db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
+        rows = self._rows(db, DailyRevenueRollup, store_id)
+        total_revenue = sum(r['revenue'] for r in rows)
+        order_count = sum(r['order_count'] for r in rows)
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'average_order_value': round(total_revenue / order_count, 2) if order_count else 0.0,
+            'total_orders': order_count,
+            'total_revenue': total_revenue
+        }
+
+    def get_store_revenue(self, db: Session, start_date: date, end_date: date) -> Dict:
+        totals = {}
+        for r in self._rows(db, DailyRevenueRollup):
+            _add(totals, r['store_id'], revenue=r['revenue'], order_count=r['order_count'])
+
+        return store_revenue_result(start_date, end_date, {
+            store_id: (t['revenue'], t['order_count']) for store_id, t in totals.items()
+        })
+
+    def _popular_items(self, db: Session, category: str, limit: Optional[int],
+                       store_id: Optional[str] = None) -> List[Dict]:
+        stats = {}
+        for r in self._rows(db, ItemSalesRollup, store_id, category=category):
+            item = stats.setdefault(r['item_id'], {
+                'item_id': r['item_id'], 'item_name': r['item_name'],
+                'total_quantity': 0, 'total_revenue': 0, 'order_count': 0
+            })
+            item['total_quantity'] += r['total_quantity']
+            item['total_revenue'] += r['total_revenue']
+            item['order_count'] += r['order_count']
+
+        return sorted(stats.values(), key=lambda x: x['total_quantity'], reverse=True)[:limit]
+
+    def get_popular_dishes(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'dishes',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, 'dish', limit, store_id)
+        }
+
+    def get_popular_drinks(self, db: Session, start_date: date, end_date: date, limit: int = 10,
+                           store_id: Optional[str] = None) -> Dict:
+        return {
+            'category': 'drinks',
+            'start_date': start_date,
+            'end_date': end_date,
+            'items': self._popular_items(db, 'drink', limit, store_id)
+        }
+
+    def get_pickup_method_ratio(self, db: Session, start_date: date, end_date: date,
+                                store_id: Optional[str] = None) -> Dict:
+        totals = {}
+        for r in self._rows(db, DailyRevenueRollup, store_id):
+            _add(totals, r['pickup_method'], count=r['order_count'], revenue=r['revenue'])
+        total_orders = sum(t['count'] for t in totals.values())
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_orders': total_orders,
+            'stats': [
+                {
+                    'pickup_method': pickup_method,
+                    'count': t['count'],
+                    'percentage': round((t['count'] / total_orders * 100), 2) if total_orders > 0 else 0,
+                    'revenue': t['revenue']
+                }
+                for pickup_method, t in totals.items()
+            ]
+        }
+
+    def get_peak_hours(self, db: Session, start_date: date, end_date: date,
+                       store_id: Optional[str] = None) -> Dict:
+        totals = {}
+        for r in self._rows(db, HourlyOrdersRollup, store_id):
+            _add(totals, r['local_hour'], order_count=r['order_count'], revenue=r['revenue'])
+
+        hourly_data = [
+            {'hour': hour, 'order_count': t['order_count'], 'revenue': t['revenue']}
+            for hour, t in sorted(totals.items())
+        ]
+        peak_hour = max(hourly_data, key=lambda x: x['order_count']) if hourly_data else None
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'hourly_data': hourly_data,
+            'peak_hour': peak_hour['hour'] if peak_hour else 0,
+            'peak_hour_orders': peak_hour['order_count'] if peak_hour else 0
+        }
+
+    def get_weekday_hour_heatmap(self, db: Session, start_date: date, end_date: date,
+                                 store_id: Optional[str] = None) -> Dict:
+        return heatmap_result(start_date, end_date, [
+            (start_date.weekday(), r['local_hour'], r['order_count'], r['revenue'])
+            for r in self._rows(db, HourlyOrdersRollup, store_id)
+        ])
+
+    def _beverage_preferences(self, db: Session, preference_type: str, start_date: date, end_date: date,
+                              store_id: Optional[str] = None) -> Dict:
+        counts = {}
+        for r in self._rows(db, BeverageOptionsRollup, store_id, option_type=preference_type):
+            counts[r['option']] = counts.get(r['option'], 0) + r['drink_count']
+        total_drinks = sum(counts.values())
+
+        preferences = [
+            {
+                'option': option,
+                'count': count,
+                'percentage': round((count / total_drinks * 100), 2) if total_drinks > 0 else 0
+            }
+            for option, count in sorted(counts.items(), key=lambda x: x[1], reverse=True)
+        ]
+
+        return {
+            'preference_type': preference_type,
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_drinks': total_drinks,
+            'preferences': preferences,
+            'most_popular': preferences[0]['option'] if preferences else 'N/A'
+        }
+
+    def get_ice_level_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, 'ice_level', start_date, end_date, store_id)
+
+    def get_sweetness_preferences(self, db: Session, start_date: date, end_date: date,
+                                  store_id: Optional[str] = None) -> Dict:
+        return self._beverage_preferences(db, 'sweetness', start_date, end_date, store_id)
@@ -0,0 +1,110 @@
+"""
+靜態資源工具
+讀取 scripts/build_assets.py 產生的 manifest，並提供預先壓縮檔案的靜態檔案處理
+"""
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from functools import lru_cache
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import json
+import os
+
+STATIC_DIR = Path("static")
+BUILD_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = BUILD_DIR / "manifest.json"
+
+# 檔名含內容雜湊，內容變動時網址也會變，可永久快取
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 未經 build 的原始檔案，每次都向伺服器確認（仍可回 304）
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 依偏好順序嘗試的預先壓縮格式（編碼, 副檔名）
+PRECOMPRESSED_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+@lru_cache(maxsize=1)
+def load_manifest() -> Dict[str, str]:
+    """讀取原始路徑 → 雜湊檔名的對照表（尚未 build 時為空）"""
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(path: str) -> str:
+    """
+    取得靜態資源網址（Jinja 模板使用）
+
+    有 build 過時回傳含內容雜湊的網址，否則回傳原始檔案網址
+    """
+    hashed = load_manifest().get(path)
+    if hashed:
+        return f"/static/dist/{hashed}"
+    return f"/static/{path}"
+
+
+def accepted_encodings(headers: Headers) -> set:
+    """解析 Accept-Encoding（忽略 q=0 的編碼）"""
+    encodings = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    靜態檔案處理
+
+    build 輸出目錄內的檔案依 Accept-Encoding 回傳預先壓縮的 .br / .gz，
+    並設定 immutable 快取；其他檔案維持原本行為但要求重新驗證
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.build_root = (Path(self.directory) / BUILD_DIR.relative_to(STATIC_DIR)).resolve()
+
+    def _compressed_variant(self, full_path: str,
+                            request_headers: Headers) -> Optional[Tuple[str, os.stat_result, str]]:
+        """尋找用戶端可接受的預先壓縮檔案"""
+        accepted = accepted_encodings(request_headers)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            variant = str(full_path) + suffix
+            try:
+                return variant, os.stat(variant), encoding
+            except FileNotFoundError:
+                continue
+        return None
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope,
+                      status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": REVALIDATE_CACHE_CONTROL}
+        media_type = None
+
+        if Path(full_path).resolve().is_relative_to(self.build_root):
+            headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            headers["Vary"] = "Accept-Encoding"
+            variant = self._compressed_variant(full_path, request_headers)
+            if variant:
+                media_type = guess_type(str(full_path))[0]
+                full_path, stat_result, headers["Content-Encoding"] = variant
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+            method=scope["method"]
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,194 @@
+"""
+訂單資料批次回填（維護腳本共用）
+
+依主鍵範圍分批處理 orders，每批一個交易並立即提交：
+- 記憶體用量與鎖定時間只與批次大小有關，不會一次載入整張表
+- 每批提交後記錄進度到檢查點檔，中斷後重新執行會從上次的位置繼續
+- 可限制每秒處理列數，避免影響線上服務
+- dry run 模式照常執行但每批都回滾，只回報會修改的筆數
+
+使用方式：繼承 OrderBackfill，實作 fix_order（逐筆以 Python 修改），
+需要時再實作 sql_update（在資料庫端整批更新，例如 PostgreSQL 的 jsonb 運算）
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.order import Order
+from app.utils.http_cache import analytics_cache_notice
+from typing import Optional
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 檢查點檔預設目錄
+CHECKPOINT_DIR = "data/backfills"
+
+
+class BackfillProgress:
+    """回填進度（已處理到的主鍵與統計），每批提交後寫入檢查點檔"""
+
+    def __init__(self, name: str, checkpoint_dir: str = CHECKPOINT_DIR):
+        self.path = os.path.join(checkpoint_dir, f"{name}.json")
+        self.next_id = None
+        self.scanned = 0
+        self.updated = 0
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        self.next_id, self.scanned, self.updated = state["next_id"], state["scanned"], state["updated"]
+        return True
+
+    def save(self) -> None:
+        """先寫暫存檔再取代，寫到一半中斷也不會損毀檢查點"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"next_id": self.next_id, "scanned": self.scanned, "updated": self.updated}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class OrderBackfill:
+    """
+    訂單批次回填的基底類別
+
+    子類別設定 name（檢查點檔名）並實作 fix_order；
+    sql_update 回傳 None（預設）時改用 fix_order 逐筆處理
+    """
+
+    name = ""
+
+    def __init__(self, batch_size: int = 1000, max_rows_per_second: float = 0,
+                 dry_run: bool = False, checkpoint_dir: str = CHECKPOINT_DIR):
+        self.batch_size = batch_size
+        self.max_rows_per_second = max_rows_per_second
+        self.dry_run = dry_run
+        self.progress = BackfillProgress(self.name, checkpoint_dir)
+
+    def fix_order(self, order: Order) -> bool:
+        """
+        修改一筆訂單，回傳是否有修改
+
+        修改 JSON 欄位內容後需呼叫 flag_modified，SQLAlchemy 才會寫回
+        """
+        raise NotImplementedError
+
+    def sql_update(self, db: Session, start_id: int, end_id: int) -> Optional[int]:
+        """在資料庫端更新 start_id <= id < end_id 的訂單，回傳更新筆數；不支援時回傳 None"""
+        return None
+
+    def _fix_batch(self, db: Session, start_id: int, end_id: int) -> int:
+        """逐筆以 fix_order 處理一個批次（yield_per 分段載入）"""
+        orders = db.execute(
+            select(Order)
+            .where(Order.id >= start_id, Order.id < end_id)
+            .order_by(Order.id)
+            .execution_options(yield_per=200)
+        ).scalars()
+        return sum(1 for order in orders if self.fix_order(order))
+
+    def _batch_end(self, db: Session, start_id: int) -> Optional[int]:
+        """從 start_id 起第 batch_size 筆的主鍵（批次上界，不含）；剩餘不足一批時回傳 None"""
+        return db.execute(
+            select(Order.id)
+            .where(Order.id >= start_id)
+            .order_by(Order.id)
+            .offset(self.batch_size)
+            .limit(1)
+        ).scalar()
+
+    def _throttle(self, scanned: int, started: float) -> None:
+        """依 max_rows_per_second 在批次之間等待"""
+        if self.max_rows_per_second > 0:
+            wait = scanned / self.max_rows_per_second - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+
+    def run(self, restart: bool = False) -> dict:
+        """
+        執行回填，回傳統計（掃描筆數、更新筆數）
+
+        dry run 不寫入檢查點，每次都從頭掃描
+        """
+        progress = self.progress
+        if restart:
+            progress.clear()
+        if not self.dry_run and progress.load():
+            logger.info(f"從檢查點繼續：訂單 ID {progress.next_id} 起（已更新 {progress.updated:,} 筆）")
+
+        db = SessionLocal()
+        started = time.perf_counter()
+        scanned_at_start = progress.scanned
+        use_sql = None
+
+        try:
+            if progress.next_id is None:
+                progress.next_id = db.execute(select(func.min(Order.id))).scalar()
+                if progress.next_id is None:
+                    logger.info("沒有訂單需要處理")
+                    return {"scanned": 0, "updated": 0}
+
+            while progress.next_id is not None:
+                start_id = progress.next_id
+                end_id = self._batch_end(db, start_id)
+                if end_id is not None:
+                    batch_end, scanned = end_id, self.batch_size
+                else:
+                    # 最後一批以目前最大主鍵為上界（執行期間新增的訂單也會處理到）
+                    batch_end = db.execute(select(func.max(Order.id))).scalar() + 1
+                    scanned = db.execute(
+                        select(func.count()).where(Order.id >= start_id, Order.id < batch_end)
+                    ).scalar()
+
+                updated = self.sql_update(db, start_id, batch_end) if use_sql is not False else None
+                if use_sql is None:
+                    use_sql = updated is not None
+                    logger.info(f"回填 {self.name}：{'資料庫端整批更新' if use_sql else '逐筆更新'}"
+                                f"，每批 {self.batch_size} 筆{'（dry run）' if self.dry_run else ''}")
+                if updated is None:
+                    updated = self._fix_batch(db, start_id, batch_end)
+
+                if self.dry_run:
+                    db.rollback()
+                else:
+                    db.commit()
+                db.expunge_all()
+
+                progress.next_id = end_id
+                progress.scanned += scanned
+                progress.updated += updated
+                if not self.dry_run and end_id is not None:
+                    progress.save()
+
+                processed = progress.scanned - scanned_at_start
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"訂單 ID {start_id}–{batch_end - 1}：{'將更新' if self.dry_run else '更新'} {updated} 筆"
+                    f"（累計 {progress.scanned:,} / {progress.updated:,}，{processed / max(elapsed, 1e-9):,.0f} 筆/秒）"
+                )
+                self._throttle(processed, started)
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if not self.dry_run:
+            progress.clear()
+        logger.info(
+            f"回填 {self.name} 完成：掃描 {progress.scanned:,} 筆，"
+            f"{'將更新' if self.dry_run else '更新'} {progress.updated:,} 筆"
+        )
+        if not self.dry_run and progress.updated:
+            logger.info(analytics_cache_notice())
+        return {"scanned": progress.scanned, "updated": progress.updated}
@@ -0,0 +1,110 @@
+"""
+訂單批次寫入（歷史資料匯入、測試資料產生等大量寫入共用）
+
+- PostgreSQL：COPY 到暫存表，再 INSERT ... ON CONFLICT DO NOTHING 到 orders
+- 其他資料庫：executemany，已存在的 order_number 略過
+
+已封存（orders_archive）的訂單編號也會略過：封存後重新匯入時不會把舊訂單寫回 orders，
+否則在下次封存前會同時計入 rollup 與即時查詢（重複計算）。
+每批在同一個交易中寫入，回傳實際新增的筆數（重複的訂單編號不計）
+"""
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from app.database import engine
+from app.models.archive import ArchivedOrder
+from app.models.order import Order
+from typing import List
+import csv
+import io
+import orjson
+
+# 寫入的欄位（不含 id）；每筆資料需包含全部欄位，created_at 為 UTC 時間
+ORDER_COLUMNS = [
+    "order_number", "store_id", "customer_name", "pickup_method", "items", "drinks",
+    "total_amount", "notes", "created_at", "local_date", "local_hour",
+]
+JSON_COLUMNS = ("items", "drinks")
+
+# 查詢已封存訂單編號時每次帶入的數量（SQLite 的參數數量有上限）
+ARCHIVE_LOOKUP_CHUNK = 500
+
+
+def resolve_method(method: str) -> str:
+    """auto → PostgreSQL 用 copy，其他用 insert"""
+    dialect = engine.dialect.name
+    if method == "auto":
+        return "copy" if dialect == "postgresql" else "insert"
+    if method == "copy" and dialect != "postgresql":
+        raise ValueError("COPY 只支援 PostgreSQL")
+    return method
+
+
+def copy_orders(conn: Connection, rows: List[dict]) -> int:
+    """PostgreSQL：COPY 到暫存表，再 INSERT ... ON CONFLICT DO NOTHING 到 orders"""
+    conn.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS orders_import "
+        "(LIKE orders INCLUDING DEFAULTS EXCLUDING IDENTITY) ON COMMIT DELETE ROWS"
+    ))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            orjson.dumps(row[column]).decode() if column in JSON_COLUMNS
+            else row[column].isoformat() if column == "created_at"
+            else row[column]
+            for column in ORDER_COLUMNS
+        ])
+    buffer.seek(0)
+
+    column_list = ", ".join(ORDER_COLUMNS)
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(f"COPY orders_import ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    result = conn.execute(text(
+        f"INSERT INTO orders ({column_list}) SELECT {column_list} FROM orders_import "
+        "WHERE NOT EXISTS (SELECT 1 FROM orders_archive a WHERE a.order_number = orders_import.order_number) "
+        "ON CONFLICT (order_number) DO NOTHING"
+    ))
+    return result.rowcount
+
+
+def archived_order_numbers(conn: Connection, order_numbers: List[str]) -> set:
+    """其中已在 orders_archive 的訂單編號"""
+    archived = set()
+    for i in range(0, len(order_numbers), ARCHIVE_LOOKUP_CHUNK):
+        chunk = order_numbers[i:i + ARCHIVE_LOOKUP_CHUNK]
+        archived.update(conn.execute(
+            ArchivedOrder.__table__.select().with_only_columns(ArchivedOrder.order_number)
+            .where(ArchivedOrder.order_number.in_(chunk))
+        ).scalars())
+    return archived
+
+
+def insert_orders(conn: Connection, rows: List[dict]) -> int:
+    """executemany，已存在（含已封存）的 order_number 略過"""
+    archived = archived_order_numbers(conn, [row["order_number"] for row in rows])
+    rows = [row for row in rows if row["order_number"] not in archived]
+    if not rows:
+        return 0
+
+    table = Order.__table__
+    if conn.dialect.name == "postgresql":
+        statement = pg_insert(table).on_conflict_do_nothing(index_elements=["order_number"])
+    elif conn.dialect.name == "sqlite":
+        statement = sqlite_insert(table).on_conflict_do_nothing(index_elements=["order_number"])
+    else:
+        statement = insert(table).prefix_with("IGNORE")
+
+    result = conn.execute(statement, rows)
+    return max(result.rowcount, 0)
+
+
+def write_orders(rows: List[dict], method: str) -> int:
+    """在同一個交易中寫入一批訂單（method 為 resolve_method 的結果），回傳新增筆數"""
+    with engine.begin() as conn:
+        if method == "copy":
+            return copy_orders(conn, rows)
+        return insert_orders(conn, rows)
@@ -0,0 +1,105 @@
+"""
+回應壓縮中介軟體
+用戶端支援且已安裝 brotli 時使用 Brotli，否則使用 GZip；小於門檻的回應不壓縮
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件，沒有時只使用 gzip
+    brotli = None
+
+# 動態回應以速度優先（預先壓縮的靜態檔案才用最高壓縮等級）
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+
+class CompressionMiddleware:
+    """依 Accept-Encoding 選擇 br / gzip 壓縮回應"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            accepted = accepted_encodings(Headers(scope=scope))
+            if brotli is not None and "br" in accepted:
+                await BrotliResponder(self.app, self.minimum_size)(scope, receive, send)
+                return
+            if "gzip" in accepted:
+                await GZipResponder(self.app, self.minimum_size, compresslevel=GZIP_LEVEL)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class BrotliResponder:
+    """Brotli 版的 GZipResponder（已帶 Content-Encoding 的回應原樣送出）"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message = {}
+        self.started = False
+        self.content_encoding_set = False
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_brotli)
+
+    def _set_headers(self, content_length: int = None) -> None:
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers["Content-Encoding"] = "br"
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def send_with_brotli(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # 等確定是否壓縮後再送出 headers
+            self.initial_message = message
+            self.content_encoding_set = "content-encoding" in Headers(raw=message["headers"])
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.content_encoding_set:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+
+        elif not self.started:
+            self.started = True
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(self.initial_message)
+                await self.send(message)
+            elif not more_body:
+                message["body"] = self.compressor.process(body) + self.compressor.finish()
+                self._set_headers(len(message["body"]))
+                await self.send(self.initial_message)
+                await self.send(message)
+            else:
+                # 串流回應：逐段壓縮並 flush
+                message["body"] = self.compressor.process(body) + self.compressor.flush()
+                self._set_headers()
+                await self.send(self.initial_message)
+                await self.send(message)
+
+        else:
+            chunk = self.compressor.process(body)
+            chunk += self.compressor.flush() if more_body else self.compressor.finish()
+            message["body"] = chunk
+            await self.send(message)
@@ -0,0 +1,37 @@
+"""
+星期 × 小時熱度圖
+即時查詢與各加速後端共用的回應組成
+"""
+from datetime import date
+from typing import Dict, Iterable, Tuple
+
+# 矩陣的列順序（與每週營收相同，週一開始）
+WEEKDAY_LABELS = ["週一", "週二", "週三", "週四", "週五", "週六", "週日"]
+
+
+def heatmap_result(start_date: date, end_date: date, rows: Iterable[Tuple[int, int, int, int]]) -> Dict:
+    """
+    組成 7 × 24 熱度圖的回應
+
+    rows 為 (星期 0=週一…6=週日, 小時, 訂單數, 營收)，同一格出現多次時累加；
+    回傳陣列的陣列（[星期][小時]），沒有訂單的格子為 0
+    """
+    order_counts = [[0] * 24 for _ in range(7)]
+    revenue = [[0] * 24 for _ in range(7)]
+    for weekday, hour, order_count, amount in rows:
+        order_counts[int(weekday)][int(hour)] += int(order_count)
+        revenue[int(weekday)][int(hour)] += int(amount or 0)
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'weekdays': WEEKDAY_LABELS,
+        'order_counts': order_counts,
+        'revenue': revenue,
+        'average_basket': [
+            [round(r / c, 2) if c else 0.0 for r, c in zip(revenue_row, count_row)]
+            for revenue_row, count_row in zip(revenue, order_counts)
+        ],
+        'total_orders': sum(map(sum, order_counts)),
+        'total_revenue': sum(map(sum, revenue))
+    }
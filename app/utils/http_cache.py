@@ -0,0 +1,125 @@
+"""
+HTTP 快取工具
+ETag / If-None-Match（304）/ Cache-Control，以及已結束區間的回應快取
+"""
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from app.config import get_settings
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Optional, Tuple
+import hashlib
+import orjson
+import time
+
+# 包含今天的分析結果會持續變動，每次都要向伺服器確認（仍可回 304）
+OPEN_RANGE_CACHE_CONTROL = "no-cache"
+
+
+def make_etag(body: bytes) -> str:
+    """以內容雜湊產生強 ETag"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否包含此 ETag（弱比對，忽略 W/ 前綴）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def encode_json(content: Any) -> bytes:
+    """
+    以 orjson 序列化成 JSON bytes
+
+    dict / list / datetime 等直接由 orjson 處理，只有 orjson 不支援的型別（例如 Decimal）
+    才交給 jsonable_encoder
+    """
+    return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+def cached_response(request: Request, body: bytes, etag: str, cache_control: str,
+                    media_type: str = "application/json") -> Response:
+    """帶 ETag 的回應；ETag 相符時回 304 且不帶 body"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    歷史區間回應（body, ETag）的 LRU 快取
+
+    歷史訂單仍可能被匯入或回填腳本修改（scripts/migrate_from_sheets.py、fix_drink_preferences.py），
+    項目超過 ttl_seconds 秒即失效，不會一直回傳舊的結果
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _ttl(self) -> float:
+        return self.ttl_seconds if self.ttl_seconds is not None else get_settings().analytics_cache_seconds
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, etag, stored_at = entry
+            if time.monotonic() - stored_at >= self._ttl():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def set(self, key: str, body: bytes, etag: str) -> None:
+        with self._lock:
+            self._entries[key] = (body, etag, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+closed_range_cache = ResponseCache()
+
+
+def analytics_cache_notice() -> str:
+    """修改歷史訂單的腳本結束時提示操作者：執行中的服務仍會短暫回傳快取的舊結果"""
+    seconds = get_settings().analytics_cache_seconds
+    return f"執行中的服務已快取的歷史區間分析結果最慢 {seconds} 秒後更新（瀏覽器快取相同），需立即生效請重新啟動服務"
+
+
+def json_response(request: Request, compute: Callable[[], Any], closed: bool) -> Response:
+    """
+    以內容雜湊 ETag 回傳 JSON
+
+    closed=True（區間已結束）時，結果依完整 URL 快取在記憶體 ANALYTICS_CACHE_SECONDS 秒，
+    之後相同請求不必重新查詢與序列化，ETag 相符時直接回 304。
+    分析結果只讓瀏覽器快取（private），不經 CDN 等共用快取保存。
+    """
+    if not closed:
+        body = encode_json(compute())
+        return cached_response(request, body, make_etag(body), OPEN_RANGE_CACHE_CONTROL)
+
+    key = str(request.url)
+    entry = closed_range_cache.get(key)
+    if entry is None:
+        body = encode_json(compute())
+        entry = (body, make_etag(body))
+        closed_range_cache.set(key, *entry)
+
+    body, etag = entry
+    return cached_response(request, body, etag, f"private, max-age={get_settings().analytics_cache_seconds}")
@@ -0,0 +1,105 @@
+"""
+訂單查詢快取
+GET /api/orders/{order_number} 的回應（序列化後的 JSON bytes），以訂單編號為鍵
+
+訂單建立後不再變動：建立訂單時寫入（write-through），查詢未命中時讀資料庫後寫入。
+找不到的訂單編號不快取（可能稍後才由其他 worker 建立）。
+以離線腳本修改既有訂單（例如 scripts/fix_drink_preferences.py）後需重新啟動服務，
+或呼叫 order_cache.clear()。
+"""
+from app.config import get_settings
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+
+class MemoryOrderCacheBackend:
+    """行程內的 LRU 快取，每個 worker 各自一份"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OrderCache:
+    """
+    訂單回應快取與命中率統計
+
+    後端需提供 get(key) -> Optional[bytes]、set(key, body) 與 clear()；
+    預設為行程內 LRU（ORDER_CACHE_SIZE 筆，0 表示停用），可用 set_backend 改用共用快取（例如 Redis）
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._configured = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        if not self._configured:
+            size = get_settings().order_cache_size
+            self._backend = MemoryOrderCacheBackend(size) if size > 0 else None
+            self._configured = True
+        return self._backend
+
+    def set_backend(self, backend) -> None:
+        """改用其他快取後端；None 表示停用"""
+        self._backend = backend
+        self._configured = True
+
+    def get(self, order_number: str) -> Optional[bytes]:
+        if self.backend is None:
+            return None
+        body = self.backend.get(order_number)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, order_number: str, body: bytes) -> None:
+        if self.backend is not None:
+            self.backend.set(order_number, body)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        """命中次數、未命中次數、命中率與目前筆數（/health 回報）"""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.backend is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+        if isinstance(self.backend, MemoryOrderCacheBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+order_cache = OrderCache()
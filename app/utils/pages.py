@@ -0,0 +1,70 @@
+"""
+預先渲染的頁面
+模板只在啟動時（或內容變動時）渲染一次，之後直接回傳 bytes 並帶 ETag
+"""
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+from app.utils.http_cache import cached_response, make_etag
+from markupsafe import Markup
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 頁面內容可能隨選單或部署變動，每次都向伺服器確認（ETag 相符時回 304）
+PAGE_CACHE_CONTROL = "no-cache"
+
+
+def inline_json(body: bytes) -> Markup:
+    """
+    將 JSON bytes 轉成可直接放進 <script> 的字串
+
+    跳脫 < 避免內容中的 </script> 提早結束標籤，
+    並跳脫 U+2028 / U+2029（JSON 合法但舊版 JavaScript 視為換行）
+    """
+    text = body.decode("utf-8")
+    text = text.replace("<", "\\u003c").replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+    return Markup(text)
+
+
+class RenderedPage:
+    """單一頁面的渲染結果"""
+
+    def __init__(self, templates: Jinja2Templates, template_name: str,
+                 context: Callable[[], Dict[str, Any]],
+                 version: Optional[Callable[[], Hashable]] = None, auto_reload: bool = False):
+        self.templates = templates
+        self.template_name = template_name
+        self.context = context
+        self.version = version or (lambda: None)
+        self.auto_reload = auto_reload
+        self._lock = Lock()
+        self._template = None
+        self._rendered_version = None
+        self.body = b""
+        self.etag = ""
+
+    def _is_stale(self) -> bool:
+        if self._template is None:
+            return True
+        if self.auto_reload and not self._template.is_up_to_date:
+            return True
+        return self.version() != self._rendered_version
+
+    def render(self) -> None:
+        """重新渲染模板"""
+        with self._lock:
+            version = self.version()
+            template = self.templates.get_template(self.template_name)
+            body = template.render(self.context()).encode("utf-8")
+            self.body, self.etag = body, make_etag(body)
+            self._template, self._rendered_version = template, version
+        logger.info(f"已渲染頁面 {self.template_name}（{len(self.body):,} bytes）")
+
+    def response(self, request: Request) -> Response:
+        """回傳頁面（內容有變動時先重新渲染）"""
+        if self._is_stale():
+            self.render()
+        return cached_response(request, self.body, self.etag, PAGE_CACHE_CONTROL, media_type="text/html")
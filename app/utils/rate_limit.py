@@ -0,0 +1,253 @@
+"""
+請求頻率限制與負載卸除
+- RateLimiter：依用戶端 IP 的 token bucket 頻率限制，超過時回 429 + Retry-After
+- ConcurrencyLimiter：限制同時處理的請求數，等待過久或排隊過長時回 503 + Retry-After
+
+兩者都以 FastAPI 依賴的方式掛在路由上
+"""
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.config import get_settings
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Optional, Tuple
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRateLimitBackend:
+    """
+    行程內的頻率限制狀態
+
+    多個 worker 時每個 worker 各自計算，實際上限約為設定值 × worker 數
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._lock = Lock()
+
+    def hit(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        """
+        記錄一次請求，允許時回傳 0，否則回傳需等待的秒數
+
+        以 GCRA（等同 token bucket）計算：每個請求讓理論到達時間往後 interval 秒，
+        理論到達時間超前現在不到 tolerance 秒（即還有剩餘的 burst）時允許
+        """
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            if tat - now > tolerance:
+                return tat - now - tolerance
+            self._tats[key] = tat + interval
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            return 0.0
+
+
+class DatabaseRateLimitBackend:
+    """
+    以資料庫（rate_limit_buckets 資料表）共用頻率限制狀態，所有 worker 共用同一份限制
+
+    每次檢查只有一個 upsert；超過限制時才多查一次等待時間
+    """
+
+    # 每處理這麼多次請求清一次已過期的列
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._hits = 0
+
+    def hit(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        params = {"key": key, "now": now, "interval": interval, "tolerance": tolerance}
+        with self.engine.begin() as conn:
+            allowed = conn.execute(text(
+                "INSERT INTO rate_limit_buckets (key, tat) VALUES (:key, :now + :interval) "
+                "ON CONFLICT (key) DO UPDATE SET tat = "
+                "(CASE WHEN rate_limit_buckets.tat > :now THEN rate_limit_buckets.tat ELSE :now END) + :interval "
+                "WHERE rate_limit_buckets.tat - :now <= :tolerance "
+                "RETURNING tat"
+            ), params).first() is not None
+
+            self._hits += 1
+            if self._hits % self.CLEANUP_EVERY == 0:
+                conn.execute(text("DELETE FROM rate_limit_buckets WHERE tat < :now"), params)
+
+            if allowed:
+                return 0.0
+            tat = conn.execute(text("SELECT tat FROM rate_limit_buckets WHERE key = :key"), params).scalar()
+            return max(tat - now - tolerance, 0.0)
+
+
+_backend = None
+
+
+def get_rate_limit_backend():
+    """依 RATE_LIMIT_BACKEND 建立（或取得已設定的）頻率限制後端"""
+    global _backend
+    if _backend is None:
+        if get_settings().rate_limit_backend == "database":
+            from app.database import engine
+            _backend = DatabaseRateLimitBackend(engine)
+        else:
+            _backend = MemoryRateLimitBackend()
+    return _backend
+
+
+def set_rate_limit_backend(backend) -> None:
+    """
+    改用其他頻率限制後端（例如 Redis）
+
+    後端需提供 hit(key, interval, tolerance, now)，允許時回傳 0，否則回傳需等待的秒數
+    """
+    global _backend
+    _backend = backend
+
+
+@lru_cache(maxsize=4)
+def _trusted_networks(proxies: Tuple[str, ...]) -> tuple:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def is_trusted_proxy(host: str) -> bool:
+    """host 是否屬於 TRUSTED_PROXIES"""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(tuple(get_settings().trusted_proxies)))
+
+
+_proxy_warning_logged = False
+
+
+def _warn_untrusted_proxy(request: Request, host: str) -> None:
+    """
+    來源是私有/本機位址卻仍帶 X-Forwarded-For 時（代理不在 TRUSTED_PROXIES 中），警告一次：
+    此時所有顧客都會被當成代理的 IP，共用同一份頻率限制
+    """
+    global _proxy_warning_logged
+    if _proxy_warning_logged or "x-forwarded-for" not in request.headers:
+        return
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return
+    if address.is_private or address.is_loopback:
+        _proxy_warning_logged = True
+        logger.warning(
+            f"請求來自代理位址 {host} 且帶有 X-Forwarded-For，但此代理不在 TRUSTED_PROXIES 中："
+            "所有用戶端會共用同一份頻率限制。請將代理的 IP 或網段加入 TRUSTED_PROXIES"
+        )
+
+
+def client_key(request: Request) -> str:
+    """
+    用戶端識別（IP）
+
+    直接連線的來源屬於 TRUSTED_PROXIES 時，由右往左略過 X-Forwarded-For 中的代理位址，
+    取第一個不屬於代理的位址：那是最外層代理看到的連線來源。更左邊的值由用戶端自行填寫，不予採用
+    """
+    if not request.client:
+        return "unknown"
+    host = request.client.host
+    if not is_trusted_proxy(host):
+        _warn_untrusted_proxy(request, host)
+        return host
+
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else host
+
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class RateLimiter:
+    """
+    依用戶端 IP 限制請求頻率（FastAPI 依賴）
+
+    每分鐘 per_minute 次，可短時間連續送出 burst 次；超過時回 429
+    """
+
+    def __init__(self, name: str, per_minute: int, burst: int):
+        self.name = name
+        self.interval = 60.0 / per_minute
+        self.tolerance = self.interval * (burst - 1)
+
+    def __call__(self, request: Request) -> None:
+        if not get_settings().rate_limit_enabled:
+            return
+
+        key = f"{self.name}:{client_key(request)}"
+        try:
+            wait = get_rate_limit_backend().hit(key, self.interval, self.tolerance, time.time())
+        except Exception as e:
+            # 限制狀態無法讀寫時放行，不讓頻率限制本身造成服務中斷
+            logger.error(f"頻率限制檢查失敗：{e}", exc_info=True)
+            return
+
+        if wait > 0:
+            logger.warning(f"請求過於頻繁：{key}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="請求過於頻繁，請稍後再試",
+                headers=retry_after_header(wait)
+            )
+
+
+class ConcurrencyLimiter:
+    """
+    限制同時處理的請求數（FastAPI 依賴，每個 worker 各自計算）
+
+    超過 max_concurrency 的請求排隊等待（不佔用執行緒）；
+    排隊超過 max_waiting 個或等待超過 timeout 秒時回 503，讓較重的請求不會拖慢其他 API
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_waiting: int, timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _shed(self) -> HTTPException:
+        logger.warning(f"{self.name} 忙碌中，拒絕請求（排隊 {self.waiting} 個）")
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="伺服器忙碌中，請稍後再試",
+            headers=retry_after_header(self.timeout)
+        )
+
+    async def __call__(self):
+        # 在事件迴圈內建立（Python 3.9 的 Semaphore 建立時就會綁定事件迴圈）
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            raise self._shed()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._shed()
+        finally:
+            self.waiting -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,150 @@
+"""
+可合併的近似統計摘要（sketch）
+每日各建一份，任意區間合併當天的摘要即可回答，不必重新讀取訂單
+
+- HyperLogLog：不重複數量（顧客數）。2^14 個暫存器，相對標準誤差約 1.04 / √16384 ≈ 0.81%
+  （約 95% 的結果在 ±1.6% 內），數量少時改用線性計數，幾乎等於精確值
+- DDSketch：分位數（訂單金額 p50 / p90 / p99）。相對誤差上限 1%：
+  回傳值與真實分位數（rank = q × (n - 1) 取整）的差距不超過真實值的 1%
+
+numpy 只在建立/合併摘要時載入
+"""
+from typing import Iterable, List, Optional
+import hashlib
+import math
+import zlib
+
+HLL_PRECISION = 14
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_RELATIVE_ERROR = round(1.04 / math.sqrt(HLL_REGISTERS), 4)
+
+DDSKETCH_RELATIVE_ACCURACY = 0.01
+
+
+class HyperLogLog:
+    """不重複數量的 HyperLogLog（64 位元 blake2b 雜湊）"""
+
+    def __init__(self, registers=None):
+        import numpy as np
+
+        self.registers = np.zeros(HLL_REGISTERS, dtype=np.uint8) if registers is None else registers
+
+    @staticmethod
+    def _hashes(values: Iterable[str]):
+        import numpy as np
+
+        digests = b"".join(hashlib.blake2b(value.encode(), digest_size=8).digest() for value in values)
+        return np.frombuffer(digests, dtype="<u8")
+
+    def add_all(self, values: Iterable[str]) -> "HyperLogLog":
+        import numpy as np
+
+        hashes = self._hashes(values)
+        if not len(hashes):
+            return self
+        index = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - HLL_PRECISION)) - 1)
+        # 剩餘位元的前導零個數 + 1（frexp 的指數即位元長度，值小於 2^53 時轉 float 不失真）
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, 64 - HLL_PRECISION + 1, 64 - HLL_PRECISION - bit_length + 1)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        import numpy as np
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        import numpy as np
+
+        m = HLL_REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.exp2(-self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        """壓縮後的暫存器（每天的顧客不多，大部分暫存器為 0，壓縮後通常不到 1 KB）"""
+        return zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        import numpy as np
+
+        return cls(np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy())
+
+
+class DDSketch:
+    """
+    正值的分位數摘要（DDSketch），以對數間距的區間計數
+
+    區間 i 涵蓋 (γ^(i-1), γ^i]，γ = (1 + α) / (1 - α)；0 另外計數
+    """
+
+    gamma = (1 + DDSKETCH_RELATIVE_ACCURACY) / (1 - DDSKETCH_RELATIVE_ACCURACY)
+
+    def __init__(self, offset: int = 0, counts: Optional[List[int]] = None, zero_count: int = 0):
+        self.offset = offset
+        self.counts = counts or []
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.counts)
+
+    def _add_bins(self, offset: int, counts: List[int]) -> None:
+        if not counts:
+            return
+        if not self.counts:
+            self.offset, self.counts = offset, list(counts)
+            return
+        start = min(self.offset, offset)
+        end = max(self.offset + len(self.counts), offset + len(counts))
+        merged = [0] * (end - start)
+        for base, values in ((self.offset, self.counts), (offset, counts)):
+            for i, value in enumerate(values):
+                merged[base - start + i] += value
+        self.offset, self.counts = start, merged
+
+    def add_all(self, values: Iterable[float]) -> "DDSketch":
+        import numpy as np
+
+        values = np.asarray(list(values), dtype=np.float64)
+        positive = values[values > 0]
+        self.zero_count += int(len(values) - len(positive))
+        if len(positive):
+            index = np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64)
+            low = int(index.min())
+            self._add_bins(low, np.bincount(index - low).tolist())
+        return self
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        self.zero_count += other.zero_count
+        self._add_bins(other.offset, other.counts)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """第 q 分位數（0 ≤ q ≤ 1），沒有資料時回傳 None"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for i, value in enumerate(self.counts):
+            seen += value
+            if seen > rank:
+                return 2 * self.gamma ** (self.offset + i) / (self.gamma + 1)
+        return 2 * self.gamma ** (self.offset + len(self.counts) - 1) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        return {"offset": self.offset, "counts": self.counts, "zero_count": self.zero_count}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        return cls(data["offset"], list(data["counts"]), data["zero_count"])
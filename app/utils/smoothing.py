@@ -0,0 +1,109 @@
+"""
+每週季節性的指數平滑（加法模型：水準 + 星期效果），一次處理多條序列（訂單數、營收、各品項數量）
+
+    預測值      ŷ = level + season[星期]
+    水準        level ← level + α × (y - ŷ)
+    星期效果    season[星期] ← season[星期] + γ × (y - level - season[星期])
+
+α、γ 在網格中逐條序列挑選一步預測誤差平方和最小的組合（所有組合一起以 numpy 向量運算）。
+擬合後只需保存 α、γ、水準與 7 個星期效果；新的一天結束後以 update() 套用當天的值即可，
+不必重新讀取整段歷史。numpy 只在擬合/更新時載入
+"""
+from datetime import date, timedelta
+from typing import List, Sequence, Tuple
+
+SMOOTHING_ALPHAS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5)
+SMOOTHING_GAMMAS = (0.02, 0.05, 0.1, 0.2, 0.3)
+
+# 以前兩週的平均初始化水準與星期效果，也是擬合所需的最少天數
+INIT_DAYS = 14
+
+
+def _weekdays(first_day: date, days: int) -> List[int]:
+    return [(first_day + timedelta(days=i)).weekday() for i in range(days)]
+
+
+def _smooth(values, weekdays: Sequence[int], alpha, gamma, level, season, skip: int = 0):
+    """
+    依序套用每天的值（就地更新 season），回傳 (level, season, 一步預測誤差平方和)
+
+    values 為 (天數, 序列數)；season 為 (7,) + level.shape；alpha、gamma 可廣播到 level 的形狀
+    """
+    import numpy as np
+
+    sse = np.zeros(level.shape)
+    for i, (row, weekday) in enumerate(zip(values, weekdays)):
+        error = row - level - season[weekday]
+        if i >= skip:
+            sse += error * error
+        level = level + alpha * error
+        season[weekday] += gamma * (row - level - season[weekday])
+    return level, season, sse
+
+
+class SeasonalSmoothing:
+    """多條序列的季節性指數平滑模型（每條序列各自的 α、γ）"""
+
+    def __init__(self, alpha, gamma, level, season, last_day: date):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.level = level
+        self.season = season
+        self.last_day = last_day
+
+    @classmethod
+    def fit(cls, values, first_day: date) -> "SeasonalSmoothing":
+        """
+        以每天的值擬合模型
+
+        values 為 (天數, 序列數)，從 first_day 起連續、沒有資料的日期需補 0；至少 INIT_DAYS 天
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        days, series = values.shape
+        if days < INIT_DAYS:
+            raise ValueError(f"歷史資料不足：至少需要 {INIT_DAYS} 天（目前 {days} 天）")
+        weekdays = _weekdays(first_day, days)
+
+        init = values[:INIT_DAYS]
+        init_weekdays = np.array(weekdays[:INIT_DAYS])
+        level = init.mean(axis=0)
+        season = np.stack([init[init_weekdays == w].mean(axis=0) - level for w in range(7)])
+
+        # 所有 (α, γ) 組合一起計算：形狀 (組合數, 序列數)
+        alphas, gammas = (grid.ravel()[:, None] for grid in np.meshgrid(SMOOTHING_ALPHAS, SMOOTHING_GAMMAS))
+        combos = len(alphas)
+        levels, seasons, sse = _smooth(
+            values, weekdays, alphas, gammas,
+            np.repeat(level[None, :], combos, axis=0),
+            np.repeat(season[:, None, :], combos, axis=1),
+            skip=INIT_DAYS
+        )
+
+        best = sse.argmin(axis=0)
+        columns = np.arange(series)
+        return cls(
+            alphas[best, 0], gammas[best, 0], levels[best, columns], seasons[:, best, columns],
+            first_day + timedelta(days=days - 1)
+        )
+
+    def update(self, values, first_day: date) -> None:
+        """套用 first_day（需為 last_day 的隔天）起連續每天的值"""
+        import numpy as np
+
+        if first_day != self.last_day + timedelta(days=1):
+            raise ValueError(f"更新需從 {self.last_day + timedelta(days=1)} 開始（收到 {first_day}）")
+        values = np.asarray(values, dtype=np.float64)
+        self.level, self.season, _ = _smooth(
+            values, _weekdays(first_day, len(values)), self.alpha, self.gamma, self.level, self.season
+        )
+        self.last_day = first_day + timedelta(days=len(values) - 1)
+
+    def forecast(self, horizon: int) -> Tuple[List[date], object]:
+        """last_day 之後 horizon 天的預測值（不小於 0），回傳 (日期, (horizon, 序列數) 陣列)"""
+        import numpy as np
+
+        days = [self.last_day + timedelta(days=i + 1) for i in range(horizon)]
+        values = np.stack([self.level + self.season[day.weekday()] for day in days])
+        return days, np.clip(values, 0, None)
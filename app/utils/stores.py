@@ -0,0 +1,48 @@
+"""
+店家（分店）工具
+同一個部署服務多家分店，訂單、選單與分析都以 store_id 區分
+"""
+from app.config import get_settings
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# 既有資料（尚未區分分店前）與未指定分店的請求都屬於此店家
+DEFAULT_STORE_ID = "main"
+
+
+def get_store_ids() -> List[str]:
+    """取得所有分店代碼"""
+    return list(get_settings().store_ids)
+
+
+def validate_store_id(store_id: Optional[str]) -> Optional[str]:
+    """確認分店代碼存在（未指定時回傳 None，代表所有分店）"""
+    if store_id is not None and store_id not in get_store_ids():
+        raise ValueError(f"無效的店家：{store_id}")
+    return store_id
+
+
+def store_revenue_result(start_date: date, end_date: date, totals: Dict[str, Tuple[int, int]]) -> Dict:
+    """
+    組成跨分店營收彙總的回應（即時查詢與各加速後端共用）
+
+    totals 為 分店代碼 → (營收, 訂單數)；沒有訂單的分店也會列出
+    """
+    store_ids = get_store_ids() + sorted(set(totals) - set(get_store_ids()))
+    stores = []
+    for store_id in store_ids:
+        revenue, order_count = totals.get(store_id, (0, 0))
+        stores.append({
+            'store_id': store_id,
+            'revenue': revenue,
+            'order_count': order_count,
+            'average_order_value': round(revenue / order_count, 2) if order_count else 0.0
+        })
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'stores': stores,
+        'total_revenue': sum(s['revenue'] for s in stores),
+        'total_orders': sum(s['order_count'] for s in stores)
+    }
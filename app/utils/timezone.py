@@ -0,0 +1,57 @@
+"""
+時區工具
+分析查詢以「店家當地日期」為單位，資料庫內的時間一律視為 UTC
+"""
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.config import get_settings
+
+
+def resolve_timezone(tz: Optional[str]) -> tzinfo:
+    """將時區名稱轉成 tzinfo（未指定時為 UTC）"""
+    if not tz or tz.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"無效的時區：{tz}")
+
+
+def get_store_timezone() -> tzinfo:
+    """取得店家時區"""
+    return resolve_timezone(get_settings().store_timezone)
+
+
+def store_today() -> date:
+    """店家當地的今天"""
+    return datetime.now(get_store_timezone()).date()
+
+
+def timezone_name(tzinfo: tzinfo) -> str:
+    """取得時區名稱（用於 SQL 與回應）"""
+    return getattr(tzinfo, "key", None) or "UTC"
+
+
+def local_day_bounds(start_date: date, end_date: date, tzinfo: tzinfo) -> Tuple[datetime, datetime]:
+    """
+    將當地日期區間轉成半開區間 [start, end) 的 UTC 時間
+
+    end_date 當天整天都包含在內（上界為隔天當地午夜）。
+    """
+    start = datetime.combine(start_date, time.min, tzinfo=tzinfo)
+    end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tzinfo)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def to_local(value: datetime, tzinfo: tzinfo) -> datetime:
+    """將資料庫時間轉成當地時間（無時區資訊的值視為 UTC）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(tzinfo)
+
+
+def local_date_hour(value: datetime, tzinfo: Optional[tzinfo] = None) -> Tuple[date, int]:
+    """取得店家當地的日期與小時（對應 orders.local_date / local_hour）"""
+    local = to_local(value, tzinfo or get_store_timezone())
+    return local.date(), local.hour
@@ -43,17 +43,4 @@ def get_menu_item_by_id(item_id: str) -> dict:
     對應 Code.gs getMenuItemById (line 272-278)
     """
     from app.services.menu_service import MenuService
-    menu = MenuService.get_menu_data()
-
-    # 搜尋所有分類
-    all_items = []
-    all_items.extend(menu['mains'])
-    all_items.extend(menu['soups'])
-    all_items.extend(menu['desserts'])
-    all_items.extend(menu['drinks'])
-
-    for item in all_items:
-        if item['id'] == item_id:
-            return item
-
-    return None
+    return MenuService.get_item_by_id(item_id)
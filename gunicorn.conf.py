@@ -0,0 +1,45 @@
+"""
+Gunicorn 設定（正式環境）
+以 Uvicorn worker 執行多個行程，worker 數可用 WEB_CONCURRENCY 指定；
+未指定時依可用的 CPU 核心數決定，但最多 MAX_DEFAULT_WORKERS 個，且所有 worker 的連線池合計
+不超過 DB_CONNECTION_BUDGET（容器中 os.cpu_count() 回傳的是主機的核心數，每個 worker 也各自執行背景排程）
+
+使用方式：
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+import os
+from app.config import get_settings
+
+settings = get_settings()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# 未指定 WEB_CONCURRENCY 時的 worker 數上限
+MAX_DEFAULT_WORKERS = 4
+
+
+def default_workers() -> int:
+    """可用核心數（優先採用行程可使用的 CPU）、MAX_DEFAULT_WORKERS 與連線預算三者的最小值"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    connections_per_worker = settings.db_pool_size + settings.db_max_overflow
+    return max(1, min(cpus, MAX_DEFAULT_WORKERS, settings.db_connection_budget // connections_per_worker))
+
+
+workers = settings.web_concurrency or default_workers()
+
+# 信任哪些代理送來的 X-Forwarded-For / X-Forwarded-Proto（逗號分隔的完整 IP，預設只有本機）。
+# 不可設為 *：此時 uvicorn 採用 X-Forwarded-For 最左邊的值，而那是用戶端自行填寫的，可任意偽造 IP。
+# 頻率限制的用戶端 IP 改由 TRUSTED_PROXIES（可用 CIDR）判斷，見 app/utils/rate_limit.py
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# 不預先載入 app：每個 worker 各自建立資料庫連線池，避免 fork 後共用連線
+preload_app = False
+
+# 關閉時先停止接受新連線，等待處理中的請求完成（最多 graceful_timeout 秒）
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
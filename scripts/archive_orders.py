@@ -0,0 +1,62 @@
+"""
+封存超過保留期限的訂單
+建議每天執行一次（例如排程於 03:00），每批一個交易，可隨時中斷、重新執行
+
+超過 ORDER_RETENTION_DAYS 的訂單先彙總到 rollup_* 資料表，再從 orders 移到 orders_archive；
+封存後歷史分析結果不變，已封存的訂單仍可用 GET /api/orders/{order_number} 查詢
+
+使用方式：
+    python scripts/archive_orders.py                      # 依 ORDER_RETENTION_DAYS
+    python scripts/archive_orders.py --dry-run            # 只回報可封存的訂單數
+    python scripts/archive_orders.py --before 2025-01-01 --batch-size 5000
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.archive_service import ArchiveService
+from datetime import date
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def archive_orders(before: date = None, retention_days: int = None, batch_size: int = 1000,
+                   max_batches: int = None, dry_run: bool = False):
+    """封存 before（未指定時依保留天數計算）之前的訂單"""
+    cutoff = before or ArchiveService.retention_cutoff(retention_days)
+    if cutoff is None:
+        logger.info("未設定保留天數（ORDER_RETENTION_DAYS=0），不封存")
+        return
+
+    db = SessionLocal()
+    try:
+        archivable = ArchiveService.count_archivable(db, cutoff)
+    finally:
+        db.close()
+    logger.info(f"{cutoff} 之前的訂單：{archivable:,} 筆")
+    if dry_run or not archivable:
+        return
+
+    try:
+        archived = ArchiveService.archive_orders(cutoff, batch_size, max_batches)
+        logger.info(f"✅ 封存完成：{archived:,} 筆訂單")
+    except Exception as e:
+        logger.error(f"❌ 封存失敗：{e}")
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="封存超過保留期限的訂單")
+    parser.add_argument("--before", type=date.fromisoformat, default=None,
+                        help="封存此日期（店家當地）之前的訂單，預設依 ORDER_RETENTION_DAYS 計算")
+    parser.add_argument("--retention-days", type=int, default=None, help="覆寫 ORDER_RETENTION_DAYS")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批封存的訂單數（每批一個交易）")
+    parser.add_argument("--max-batches", type=int, default=None, help="最多執行幾批（分次封存大量舊資料）")
+    parser.add_argument("--dry-run", action="store_true", help="只回報可封存的訂單數")
+    args = parser.parse_args()
+
+    archive_orders(args.before, args.retention_days, args.batch_size, args.max_batches, args.dry_run)
@@ -0,0 +1,118 @@
+"""
+銷售預測回測
+以過去的每一天為預測起點（起點前一天為止的歷史），比較預測與實際的誤差，並量測擬合時間
+
+模型依正式環境的方式維護：每天遞增更新，每 FORECAST_REFIT_DAYS 天重新完整擬合；
+同時列出兩個簡單基準（上週同一天、近四週同星期平均）作為比較。
+誤差為 WAPE（絕對誤差總和 / 實際值總和），品項為最近有賣出的各品項合計
+
+使用方式：
+    python scripts/backtest_forecast.py                        # 最近 56 個起點，預測 7 天
+    python scripts/backtest_forecast.py --days 28 --horizon 3 --store-id main
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.services.forecast_service import ForecastService, StoreForecast
+from app.utils.timezone import store_today
+from datetime import timedelta
+import argparse
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _baselines(full, offset: int, horizon: int):
+    """(上週同一天, 近四週同星期平均) 的預測；full 為完整歷史陣列，offset 為預測起點的位置"""
+    import numpy as np
+
+    last_week, four_weeks = [], []
+    for h in range(horizon):
+        same_weekday = [offset + h - 7 * k for k in range(1, 5 + h // 7) if offset + h - 7 * k < offset]
+        same_weekday = [i for i in same_weekday if i >= 0][:4]
+        last_week.append(full[same_weekday[0]])
+        four_weeks.append(full[same_weekday].mean(axis=0))
+    return np.array(last_week), np.array(four_weeks)
+
+
+def backtest(days: int = 56, horizon: int = 7, store_id: str = None):
+    """以最近 days 個起點回測 horizon 天的預測"""
+    import numpy as np
+
+    settings = get_settings()
+    db = SessionLocal()
+
+    try:
+        last_closed_day = store_today() - timedelta(days=1)
+        last_origin = last_closed_day - timedelta(days=horizon - 1)
+        first_origin = last_origin - timedelta(days=days - 1)
+        history_start = ForecastService._history_start(db, first_origin - timedelta(days=1), store_id)
+        if history_start is None:
+            logger.error("❌ 沒有歷史訂單")
+            return
+
+        started = time.perf_counter()
+        sales = ForecastService.daily_sales(db, history_start, last_closed_day, store_id)
+        logger.info(f"讀取每日彙總：{history_start} ~ {last_closed_day}，{time.perf_counter() - started:.2f} 秒")
+    finally:
+        db.close()
+
+    names = ["季節性指數平滑", "上週同一天", "近四週同星期平均"]
+    errors = {name: np.zeros(3) for name in names}
+    actual_total = np.zeros(3)
+    fit_times, update_times, forecast_times = [], [], []
+    forecast = None
+
+    origin = first_origin
+    while origin <= last_origin:
+        train_end = origin - timedelta(days=1)
+        started = time.perf_counter()
+        if forecast is not None and train_end < forecast.fitted_through + timedelta(days=settings.forecast_refit_days) \
+                and forecast.update(sales.slice(forecast.model.last_day + timedelta(days=1), train_end)):
+            update_times.append(time.perf_counter() - started)
+        else:
+            train_start = max(history_start, train_end - timedelta(days=settings.forecast_history_days - 1))
+            forecast = StoreForecast.fit(sales.slice(train_start, train_end))
+            fit_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        _, predicted = forecast.model.forecast(horizon)
+        forecast_times.append(time.perf_counter() - started)
+
+        full = sales.matrix(forecast.items)
+        offset = (origin - history_start).days
+        actual = full[offset:offset + horizon]
+        columns = [0, 1, [2 + i for i in forecast.active_items()]]
+        for name, values in zip(names, (predicted,) + _baselines(full, offset, horizon)):
+            errors[name] += [np.abs(values[:, c] - actual[:, c]).sum() for c in columns]
+        actual_total += [actual[:, c].sum() for c in columns]
+        origin += timedelta(days=1)
+
+    logger.info(f"回測 {days} 個起點（{first_origin} ~ {last_origin}），每次預測 {horizon} 天，分店 {store_id or '全部'}")
+    logger.info(f"{'':<16}{'訂單數':>10}{'營收':>10}{'品項':>10}")
+    for name in names:
+        wape = errors[name] / np.maximum(actual_total, 1)
+        logger.info(f"{name:<16}" + "".join(f"{value:>10.1%}" for value in wape))
+
+    def average_ms(times):
+        return f"{sum(times) / len(times) * 1000:.1f} ms（{len(times)} 次）" if times else "—"
+
+    logger.info(f"完整擬合：平均 {average_ms(fit_times)}")
+    logger.info(f"遞增更新：平均 {average_ms(update_times)}")
+    logger.info(f"預測：平均 {average_ms(forecast_times)}")
+    logger.info("✅ 回測完成")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="銷售預測回測（準確度與擬合時間）")
+    parser.add_argument("--days", type=int, default=56, help="回測的預測起點天數")
+    parser.add_argument("--horizon", type=int, default=7, help="每次預測的天數")
+    parser.add_argument("--store-id", default=None, help="分店代碼（預設所有分店合計）")
+    args = parser.parse_args()
+
+    backtest(args.days, args.horizon, args.store_id)
@@ -0,0 +1,100 @@
+"""
+啟動時間檢查（冷啟動回歸測試）
+以 python -X importtime 量測 import app.main 的時間，並確認啟動時沒有載入大型套件
+（pandas / numpy / pyarrow 等只應在實際使用時才載入）
+
+每次都在新的子行程中執行，取多次中最快的一次以排除雜訊；超過門檻或載入了禁止的套件時結束碼為 1
+
+使用方式：
+    python scripts/bench_import_time.py
+    python scripts/bench_import_time.py --runs 10 --max-ms 800 --top 20
+"""
+import sys
+import os
+import argparse
+import subprocess
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 啟動時不應載入的模組（只在快照/資料產生等功能中延遲載入）
+FORBIDDEN_MODULES = ["pandas", "numpy", "pyarrow", "matplotlib", "seaborn", "plotly"]
+
+# 匯入 app.main 後再執行 lifespan 啟動流程（不處理任何請求）
+STARTUP_CODE = """
+from fastapi.testclient import TestClient
+import app.main
+with TestClient(app.main.app):
+    pass
+"""
+
+
+def run_python(args: list) -> subprocess.CompletedProcess:
+    """在專案根目錄以新的 Python 行程執行"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    return subprocess.run(
+        [sys.executable] + args, cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True, check=True
+    )
+
+
+def parse_importtime(stderr: str) -> dict:
+    """解析 -X importtime 輸出：模組 → (self μs, cumulative μs)"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_import(runs: int) -> dict:
+    """多次量測 import app.main，回傳最快一次的解析結果"""
+    best = None
+    for _ in range(runs):
+        result = run_python(["-X", "importtime", "-c", "import app.main"])
+        modules = parse_importtime(result.stderr)
+        if best is None or modules["app.main"][1] < best["app.main"][1]:
+            best = modules
+    return best
+
+
+def measure_startup(runs: int) -> float:
+    """多次量測「新行程 → 匯入 → lifespan 啟動完成」的時間（秒）"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_python(["-c", STARTUP_CODE])
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="量測 app.main 匯入與啟動時間")
+    parser.add_argument("--runs", type=int, default=5, help="量測次數（取最快一次）")
+    parser.add_argument("--max-ms", type=float, default=1500, help="import app.main 的時間上限（毫秒）")
+    parser.add_argument("--top", type=int, default=15, help="列出自身耗時最高的前 N 個模組")
+    parser.add_argument("--skip-startup", action="store_true", help="只量測匯入，不執行 lifespan")
+    args = parser.parse_args()
+
+    modules = measure_import(args.runs)
+    import_ms = modules["app.main"][1] / 1000
+
+    print(f"=== 自身耗時最高的 {args.top} 個模組 ===")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda m: -m[1][0])[:args.top]:
+        print(f"{self_us / 1000:>8.1f} ms  (累計 {cumulative_us / 1000:>7.1f} ms)  {name}")
+
+    print(f"\nimport app.main：{import_ms:.1f} ms（上限 {args.max_ms:.0f} ms）")
+    if not args.skip_startup:
+        print(f"啟動至可接受請求（含 Python 啟動）：{measure_startup(args.runs) * 1000:.1f} ms")
+
+    loaded = [name for name in FORBIDDEN_MODULES if name in modules]
+    ok = import_ms <= args.max_ms and not loaded
+    if loaded:
+        print(f"✗ 啟動時載入了大型套件：{', '.join(loaded)}")
+    if import_ms > args.max_ms:
+        print("✗ 匯入時間超過上限")
+    print("✓ 通過" if ok else "✗ 未通過")
+
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,107 @@
+"""
+訂單列表序列化效能比較
+以 1,000 筆訂單比較 FastAPI 預設（jsonable_encoder + json）與 serialize_order + orjson
+的序列化時間，以及未壓縮 / gzip / brotli 的傳輸大小
+
+不需要資料庫，訂單以記憶體中的 ORM 物件產生
+
+使用方式：
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --orders 5000 --repeat 20
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder
+from app.models.order import Order
+from app.services.menu_service import DEFAULT_MENU
+from app.services.order_service import OrderService
+from app.utils.compression import BROTLI_QUALITY, GZIP_LEVEL
+from app.utils.timezone import local_date_hour
+from datetime import datetime, timedelta, timezone
+import argparse
+import gzip
+import json
+import random
+import timeit
+import orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_orders(count: int) -> list:
+    """產生記憶體中的測試訂單"""
+    menu = DEFAULT_MENU
+    dishes = menu['mains'] + menu['soups'] + menu['desserts']
+    now = datetime.now(timezone.utc)
+    orders = []
+
+    for i in range(count):
+        created_at = now - timedelta(minutes=i * 7)
+        local_date, local_hour = local_date_hour(created_at)
+        items = [dict(d, quantity=random.randint(1, 3)) for d in random.sample(dishes, 3)]
+        drinks = [dict(random.choice(menu['drinks']), quantity=1, temperature="少冰", sweetness="半糖")]
+        orders.append(Order(
+            id=i + 1,
+            order_number=f"ORD{i:010d}",
+            customer_name=f"測試顧客{i}",
+            pickup_method=random.choice(["內用", "外帶"]),
+            items=items,
+            drinks=drinks,
+            total_amount=sum(d["price"] * d["quantity"] for d in items + drinks),
+            notes="不要香菜" if i % 5 == 0 else None,
+            created_at=created_at,
+            local_date=local_date,
+            local_hour=local_hour
+        ))
+
+    return orders
+
+
+def encode_default(orders: list) -> bytes:
+    """原本的路徑：回傳 ORM 物件，由 FastAPI 以 jsonable_encoder + json 序列化"""
+    return json.dumps(
+        jsonable_encoder(orders),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_orjson(orders: list) -> bytes:
+    """新的路徑：serialize_order + orjson"""
+    return orjson.dumps([OrderService.serialize_order(order) for order in orders])
+
+
+def bench(label: str, func, repeat: int) -> bytes:
+    """執行並印出平均時間"""
+    body = func()
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{label:<28} {seconds * 1000:>8.2f} ms")
+    return body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="訂單列表序列化效能比較")
+    parser.add_argument("--orders", type=int, default=1000, help="訂單筆數")
+    parser.add_argument("--repeat", type=int, default=10, help="重複次數（取最快一次）")
+    args = parser.parse_args()
+
+    orders = build_orders(args.orders)
+    print(f"=== 序列化時間（{args.orders} 筆訂單，取 {args.repeat} 次中最快）===")
+    default_body = bench("jsonable_encoder + json", lambda: encode_default(orders), args.repeat)
+    body = bench("serialize_order + orjson", lambda: encode_orjson(orders), args.repeat)
+
+    print("\n=== 傳輸大小 ===")
+    print(f"{'jsonable_encoder + json':<28} {len(default_body):>10,} B")
+    print(f"{'orjson':<28} {len(body):>10,} B")
+    print(f"{f'gzip (level {GZIP_LEVEL})':<28} {len(gzip.compress(body, compresslevel=GZIP_LEVEL)):>10,} B")
+    if brotli is not None:
+        print(f"{f'brotli (quality {BROTLI_QUALITY})':<28} {len(brotli.compress(body, quality=BROTLI_QUALITY)):>10,} B")
+    else:
+        print("未安裝 brotli，略過 brotli 大小")
@@ -0,0 +1,78 @@
+"""
+靜態資源 build
+將 static/ 下的 CSS / JS 以內容雜湊命名複製到 static/dist/，並預先產生 gzip 與 brotli 壓縮檔，
+最後寫出 manifest.json 供模板的 asset_url() 查詢
+
+部署時於 build 階段執行（見 zbpack.json），本機開發未執行時模板會直接使用原始檔案
+
+使用方式：
+    python scripts/build_assets.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.assets import BUILD_DIR, MANIFEST_PATH, STATIC_DIR
+from pathlib import Path
+import gzip
+import hashlib
+import json
+import logging
+import shutil
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件，沒有時只產生 gzip
+    brotli = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ASSET_SUFFIXES = {".css", ".js"}
+
+
+def hashed_name(path: Path, content: bytes) -> Path:
+    """styles.css → styles.<hash>.css"""
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+
+def build_assets():
+    """產生雜湊檔名、壓縮檔與 manifest"""
+    if BUILD_DIR.exists():
+        shutil.rmtree(BUILD_DIR)
+
+    manifest = {}
+    for source in sorted(STATIC_DIR.rglob("*")):
+        if source.suffix not in ASSET_SUFFIXES or BUILD_DIR in source.parents:
+            continue
+
+        content = source.read_bytes()
+        relative = source.relative_to(STATIC_DIR)
+        target_relative = hashed_name(relative, content)
+        target = BUILD_DIR / target_relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        target.write_bytes(content)
+        # mtime=0 讓相同內容產生相同的 .gz
+        gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+        target.with_name(target.name + ".gz").write_bytes(gzipped)
+        sizes = f"{len(content):>7,} B → gzip {len(gzipped):>6,} B"
+        if brotli is not None:
+            compressed = brotli.compress(content, quality=11)
+            target.with_name(target.name + ".br").write_bytes(compressed)
+            sizes += f" / br {len(compressed):>6,} B"
+
+        manifest[relative.as_posix()] = target_relative.as_posix()
+        logger.info(f"{relative.as_posix():<20} {sizes}")
+
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    if brotli is None:
+        logger.warning("未安裝 brotli，只產生 gzip 壓縮檔")
+    logger.info(f"✅ 已產生 {len(manifest)} 個靜態資源，manifest：{MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    # static/ 路徑相對於專案根目錄
+    os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    build_assets()
@@ -0,0 +1,158 @@
+"""
+建立每日訂單近似統計摘要（daily_order_sketches）
+不重複顧客數與訂單金額百分位數由每日摘要合併；建議每天營業結束後執行，補上前一天的摘要
+
+使用方式：
+    python scripts/build_order_sketches.py                          # 尚未建立摘要的已結束日期
+    python scripts/build_order_sketches.py --since 2025-01-01 --force
+    python scripts/build_order_sketches.py --since 2025-01-01 --verify   # 建立後與精確值比較誤差
+    python scripts/build_order_sketches.py --self-check             # 以固定種子的模擬資料檢查誤差（不連資料庫）
+
+誤差超過容許範圍時以非 0 結束：不重複顧客數 3 × HLL_RELATIVE_ERROR，
+分位數 DDSKETCH_RELATIVE_ACCURACY
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.analytics_service import AnalyticsService
+from app.services.order_sketch_service import OrderSketchService
+from app.utils.sketches import DDSketch, HyperLogLog, DDSKETCH_RELATIVE_ACCURACY, HLL_RELATIVE_ERROR
+from app.utils.timezone import store_today
+from datetime import date, timedelta
+import argparse
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 容許誤差：HyperLogLog 為標準誤差的 3 倍（正常情況幾乎不會超過），
+# DDSketch 為保證的相對誤差上限（加上浮點誤差）
+HLL_TOLERANCE = 3 * HLL_RELATIVE_ERROR
+DDSKETCH_TOLERANCE = DDSKETCH_RELATIVE_ACCURACY + 1e-9
+
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+
+def _relative_error(approx: float, exact: float) -> float:
+    return (approx - exact) / exact if exact else float(approx != exact)
+
+
+def check_customers(approx: int, exact: int) -> bool:
+    """記錄不重複顧客數的誤差，回傳是否在容許範圍內"""
+    error = _relative_error(approx, exact)
+    ok = abs(error) <= HLL_TOLERANCE
+    log = logger.info if ok else logger.error
+    log(f"{'✅' if ok else '❌'} 不重複顧客數：近似 {approx:,}，精確 {exact:,}，"
+        f"誤差 {error:+.2%}（容許 ±{HLL_TOLERANCE:.2%}）")
+    return ok
+
+
+def check_percentiles(approx: dict, amounts) -> bool:
+    """記錄各百分位數的誤差（精確值取 rank = q × (n - 1) 取整的值），回傳是否都在容許範圍內"""
+    import numpy as np
+
+    ok = True
+    for name, q in PERCENTILES:
+        exact = float(np.quantile(amounts, q, method='lower'))
+        error = _relative_error(approx[name], exact)
+        passed = abs(error) <= DDSKETCH_TOLERANCE
+        log = logger.info if passed else logger.error
+        log(f"{'✅' if passed else '❌'} {name}：近似 {approx[name]:,.2f}，精確 {exact:,.2f}，"
+            f"誤差 {error:+.2%}（容許 ±{DDSKETCH_RELATIVE_ACCURACY:.0%}）")
+        ok = ok and passed
+    return ok
+
+
+def verify(db, since: date, until: date) -> bool:
+    """比較摘要合併結果與精確的不重複顧客數、百分位數，回傳誤差是否都在容許範圍內"""
+    import numpy as np
+
+    rows = OrderSketchService._fetch(db, since, until)
+    if not rows:
+        logger.info("區間內沒有訂單，略過驗證")
+        return True
+
+    exact_customers = len({r.customer_name.strip() for r in rows})
+    customers = AnalyticsService.get_unique_customers(db, since, until)['unique_customers']
+    ok = check_customers(customers, exact_customers)
+
+    amounts = np.array([r.total_amount for r in rows])
+    percentiles = AnalyticsService.get_order_value_percentiles(db, since, until)
+    return check_percentiles(percentiles, amounts) and ok
+
+
+def self_check(seed: int = 42, days: int = 30) -> bool:
+    """
+    以固定種子的模擬資料檢查誤差（不連資料庫）
+
+    每天各建一份摘要後合併，與精確值比較；顧客數涵蓋線性計數與 HyperLogLog 估計兩種範圍，
+    金額為長尾分布並含 0 元訂單
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    ok = True
+    for customers, orders_per_day in ((500, 200), (200_000, 20_000)):
+        logger.info(f"模擬 {days} 天、顧客 {customers:,} 人、每天 {orders_per_day:,} 筆訂單")
+        names = rng.integers(0, customers, size=(days, orders_per_day))
+        amounts = np.round(rng.lognormal(5, 0.8, size=(days, orders_per_day)))
+        amounts[rng.random(amounts.shape) < 0.01] = 0
+
+        hll, sketch = HyperLogLog(), DDSketch()
+        for day in range(days):
+            hll.merge(HyperLogLog().add_all(f"顧客{n}" for n in names[day]))
+            sketch.merge(DDSketch().add_all(amounts[day]))
+
+        ok = check_customers(hll.estimate(), len(np.unique(names))) and ok
+        approx = {name: sketch.quantile(q) for name, q in PERCENTILES}
+        ok = check_percentiles(approx, amounts.ravel()) and ok
+    return ok
+
+
+def build_order_sketches(since: date = None, until: date = None, force: bool = False,
+                         check: bool = False) -> bool:
+    """
+    建立 since ~ until（店家當地日期，預設為全部已結束日期）的摘要
+
+    check=True 時建立後與精確值比較，回傳誤差是否都在容許範圍內
+    """
+    db = SessionLocal()
+    started = time.perf_counter()
+
+    try:
+        days = OrderSketchService.build_closed_days(db, since, until, force=force)
+        logger.info(f"✅ 摘要建立完成：{days:,} 天，{time.perf_counter() - started:.1f} 秒")
+
+        if check:
+            until = until or store_today() - timedelta(days=1)
+            return verify(db, since or until - timedelta(days=29), until)
+        return True
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ 建立訂單近似統計摘要失敗：{e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建立每日訂單近似統計摘要（不重複顧客數、金額百分位數）")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="開始日期（預設最早的訂單）")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="結束日期（預設昨天）")
+    parser.add_argument("--force", action="store_true", help="重建已有摘要的日期")
+    parser.add_argument("--verify", action="store_true", help="與精確值比較誤差（未指定 --since 時為最近 30 天）")
+    parser.add_argument("--self-check", action="store_true", help="只以模擬資料檢查誤差，不建立摘要")
+    parser.add_argument("--seed", type=int, default=42, help="--self-check 的亂數種子")
+    args = parser.parse_args()
+
+    if args.self_check:
+        ok = self_check(args.seed)
+    else:
+        ok = build_order_sketches(args.since, args.until, args.force, args.verify)
+    if not ok:
+        logger.error("❌ 近似統計摘要的誤差超過容許範圍")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,161 @@
+"""
+分析查詢執行計畫檢查（僅支援 PostgreSQL）
+執行每個 AnalyticsService 方法並擷取實際送出的 SQL，以 EXPLAIN 確認 orders
+是透過索引（Index Only Scan / Index Scan / Bitmap Index Scan）讀取，而不是 Seq Scan
+需要讀取 JSON 明細的查詢（熱門商品、飲料偏好）一定要回表，Bitmap Heap Scan 也視為通過
+檢查期間略過所有加速後端（物化檢視、rollup、快照、今天的即時彙總），只檢查 orders 的即時查詢
+
+使用方式：
+    python scripts/explain_analytics.py                # 使用現有資料
+    python scripts/explain_analytics.py --seed 200000  # 先產生 20 萬筆、跨兩年的測試訂單
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, insert, text
+from app.database import SessionLocal, engine
+from app.migrations import run_migrations
+from app.models.order import Order
+from app.services.analytics_service import AnalyticsService, live_queries_only
+from app.services.menu_service import MenuService
+from app.utils.stores import DEFAULT_STORE_ID
+from app.utils.timezone import local_date_hour, store_today
+from datetime import datetime, timedelta, timezone
+import argparse
+import json
+import random
+
+INDEX_SCANS = {"Index Only Scan", "Index Scan", "Bitmap Index Scan"}
+
+# 要檢查的分析方法（參數除了 db/start/end 以外）
+ANALYTICS_QUERIES = [
+    ("get_revenue (15m)", lambda db, s, e: AnalyticsService.get_revenue(db, s, e, '15m')),
+    ("get_revenue (hour)", lambda db, s, e: AnalyticsService.get_revenue(db, s, e, 'hour')),
+    ("get_daily_revenue", AnalyticsService.get_daily_revenue),
+    ("get_monthly_revenue", AnalyticsService.get_monthly_revenue),
+    ("get_average_order_value", AnalyticsService.get_average_order_value),
+    ("get_popular_dishes", AnalyticsService.get_popular_dishes),
+    ("get_popular_drinks", AnalyticsService.get_popular_drinks),
+    ("get_pickup_method_ratio", AnalyticsService.get_pickup_method_ratio),
+    ("get_peak_hours", AnalyticsService.get_peak_hours),
+    ("get_ice_level_preferences", AnalyticsService.get_ice_level_preferences),
+    ("get_sweetness_preferences", AnalyticsService.get_sweetness_preferences),
+    ("get_store_revenue", AnalyticsService.get_store_revenue),
+    ("get_average_order_value (store)",
+     lambda db, s, e: AnalyticsService.get_average_order_value(db, s, e, store_id=DEFAULT_STORE_ID)),
+    ("get_peak_hours (store)", lambda db, s, e: AnalyticsService.get_peak_hours(db, s, e, store_id=DEFAULT_STORE_ID)),
+]
+
+
+def seed_orders(count: int, days: int = 730, batch_size: int = 5000):
+    """產生跨 days 天的測試訂單（只用於量測執行計畫）"""
+    menu = MenuService.get_menu_data()
+    dishes = menu['mains'] + menu['soups'] + menu['desserts']
+    drinks = menu['drinks']
+    now = datetime.now(timezone.utc)
+    run_tag = now.strftime('%H%M%S')
+
+    rows = []
+    with engine.begin() as conn:
+        for i in range(count):
+            created_at = now - timedelta(seconds=random.randint(0, days * 86400))
+            local_date, local_hour = local_date_hour(created_at)
+            items = [dict(d, quantity=random.randint(1, 2)) for d in random.sample(dishes, 2)]
+            drink = dict(random.choice(drinks), quantity=1, temperature="少冰", sweetness="半糖")
+            rows.append({
+                "order_number": f"EXP{run_tag}{i:09d}",
+                "customer_name": "explain",
+                "pickup_method": random.choice(["內用", "外帶"]),
+                "items": items,
+                "drinks": [drink],
+                "total_amount": sum(d["price"] * d["quantity"] for d in items) + drink["price"],
+                "notes": "",
+                "created_at": created_at,
+                "local_date": local_date,
+                "local_hour": local_hour
+            })
+            if len(rows) >= batch_size:
+                conn.execute(insert(Order.__table__), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(Order.__table__), rows)
+
+    print(f"已產生 {count} 筆測試訂單")
+
+
+def plan_nodes(plan: dict):
+    """展開執行計畫中的所有節點"""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def capture_statements(func, db, start_date, end_date) -> list:
+    """執行分析方法並記錄送出的 SQL 與參數"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func(db, start_date, end_date)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def explain_analytics(days: int = 30) -> bool:
+    """檢查所有分析查詢，全部走索引時回傳 True"""
+    if engine.dialect.name != "postgresql":
+        print("此檢查僅支援 PostgreSQL")
+        return False
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE orders"))
+
+    end_date = store_today()
+    start_date = end_date - timedelta(days=days)
+    db = SessionLocal()
+    all_ok = True
+
+    try:
+        with live_queries_only():
+            for name, func in ANALYTICS_QUERIES:
+                for statement, parameters in capture_statements(func, db, start_date, end_date):
+                    with engine.connect() as conn:
+                        raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+                    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+
+                    scans = [
+                        (node["Node Type"], node.get("Index Name", "-"))
+                        for node in plan_nodes(plan)
+                        if node.get("Relation Name") == "orders" or node["Node Type"] in INDEX_SCANS
+                    ]
+                    ok = (
+                        any(node_type in INDEX_SCANS for node_type, _ in scans) and
+                        all(node_type != "Seq Scan" for node_type, _ in scans)
+                    )
+                    all_ok = all_ok and ok
+
+                    detail = ", ".join(f"{node_type} ({index})" for node_type, index in scans)
+                    print(f"{'✓' if ok else '✗'} {name}: {detail}")
+    finally:
+        db.close()
+
+    return all_ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="檢查分析查詢是否使用索引")
+    parser.add_argument("--seed", type=int, default=0, help="先產生 N 筆跨兩年的測試訂單")
+    parser.add_argument("--days", type=int, default=30, help="查詢區間天數")
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    if args.seed:
+        seed_orders(args.seed)
+
+    sys.exit(0 if explain_analytics(args.days) else 1)
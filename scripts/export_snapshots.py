@@ -0,0 +1,51 @@
+"""
+匯出歷史訂單快照（Parquet）
+建議每天營業結束後執行一次（例如排程於 00:30），也可隨時手動執行
+
+使用方式：
+    python scripts/export_snapshots.py                 # 匯出最近 30 天尚未匯出的日期
+    python scripts/export_snapshots.py --since 2025-01-01
+    python scripts/export_snapshots.py --since 2025-01-01 --force
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.snapshot_service import SnapshotService
+from app.utils.timezone import store_today
+from datetime import date, timedelta
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def export_snapshots(since: date, until: date = None, force: bool = False):
+    """匯出已結束日期的訂單快照"""
+    db = SessionLocal()
+
+    try:
+        logger.info(f"開始匯出快照：{since} 起")
+        exported = SnapshotService.export_closed_days(db, since, until, force=force)
+        total_orders = sum(exported.values())
+        logger.info(f"✅ 匯出完成：{len(exported)} 天，共 {total_orders} 筆訂單")
+
+    except Exception as e:
+        logger.error(f"❌ 匯出快照失敗：{e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="匯出歷史訂單快照（Parquet）")
+    parser.add_argument("--since", type=date.fromisoformat,
+                        default=store_today() - timedelta(days=30), help="起始日期 (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, default=None,
+                        help="結束日期 (YYYY-MM-DD)，預設為昨天")
+    parser.add_argument("--force", action="store_true", help="重新匯出已存在的日期")
+    args = parser.parse_args()
+
+    export_snapshots(args.since, args.until, args.force)
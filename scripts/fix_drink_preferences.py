@@ -1,74 +1,105 @@
 """
 補足訂單中飲料的溫度和甜度資料
+
+依主鍵範圍分批處理、每批提交，可中斷續傳（見 app/utils/backfill.py）；
+PostgreSQL 直接在資料庫端以 jsonb 運算更新，其他資料庫逐筆以 Python 修改
+
+使用方式：
+    python scripts/fix_drink_preferences.py --dry-run            # 只回報會修改的訂單數
+    python scripts/fix_drink_preferences.py
+    python scripts/fix_drink_preferences.py --batch-size 5000 --max-rows-per-second 20000
 """
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import SessionLocal
-from app.models.order import Order
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import flag_modified
+from app.schemas.order import TEMPERATURE_OPTIONS, SWEETNESS_OPTIONS
+from app.utils.backfill import OrderBackfill
+import argparse
+import logging
 import random
 
-# 溫度選項
-TEMPERATURES = ["正常冰", "少冰", "微冰", "去冰", "溫", "熱"]
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 缺少溫度或甜度的飲料（JSON null、空字串或沒有該欄位）
+MISSING_PREFERENCE = (
+    "(coalesce(drink->>'temperature', '') = '' OR coalesce(drink->>'sweetness', '') = '')"
+)
+
+# 隨機補上缺少的溫度和甜度，保留飲料原本的順序與其他欄位
+FIX_DRINKS_SQL = f"""
+UPDATE orders SET drinks = (
+    SELECT jsonb_agg(
+        CASE WHEN {MISSING_PREFERENCE} THEN drink || jsonb_build_object(
+            'temperature', coalesce(nullif(drink->>'temperature', ''),
+                (CAST(:temperatures AS text[]))[1 + floor(random() * cardinality(CAST(:temperatures AS text[])))::int]),
+            'sweetness', coalesce(nullif(drink->>'sweetness', ''),
+                (CAST(:sweetness AS text[]))[1 + floor(random() * cardinality(CAST(:sweetness AS text[])))::int])
+        ) ELSE drink END
+        ORDER BY position
+    )::json
+    FROM jsonb_array_elements(orders.drinks::jsonb) WITH ORDINALITY AS element(drink, position)
+)
+WHERE id >= :start_id AND id < :end_id
+  AND json_typeof(drinks) = 'array'
+  AND EXISTS (
+      SELECT 1 FROM jsonb_array_elements(orders.drinks::jsonb) AS element(drink)
+      WHERE {MISSING_PREFERENCE}
+  )
+"""
 
-# 甜度選項
-SWEETNESS = ["正常糖", "少糖", "半糖", "微糖", "無糖"]
 
-def fix_drink_preferences():
+class DrinkPreferencesBackfill(OrderBackfill):
     """補足所有訂單中缺少溫度和甜度的飲料"""
-    db = SessionLocal()
-
-    try:
-        # 取得所有訂單
-        orders = db.query(Order).all()
-
-        updated_count = 0
-        drink_count = 0
-
-        print(f"檢查 {len(orders)} 筆訂單...")
-
-        for order in orders:
-            # 檢查是否有飲料
-            if not order.drinks or len(order.drinks) == 0:
-                continue
-
-            # 檢查每杯飲料是否缺少溫度或甜度
-            order_updated = False
-
-            for drink in order.drinks:
-                # 如果缺少溫度，隨機補上
-                if not drink.get('temperature'):
-                    drink['temperature'] = random.choice(TEMPERATURES)
-                    order_updated = True
-                    drink_count += 1
-
-                # 如果缺少甜度，隨機補上
-                if not drink.get('sweetness'):
-                    drink['sweetness'] = random.choice(SWEETNESS)
-                    order_updated = True
-
-            # 如果有更新，標記為修改
-            if order_updated:
-                # 使用 flag_modified 告訴 SQLAlchemy JSON 欄位已修改
-                from sqlalchemy.orm.attributes import flag_modified
-                flag_modified(order, 'drinks')
-                updated_count += 1
-                print(f"  ✓ 訂單 {order.order_number}: 已補足 {len(order.drinks)} 杯飲料的資料")
-
-        # 提交變更
-        db.commit()
-
-        print(f"\n完成！")
-        print(f"  更新訂單數: {updated_count} 筆")
-        print(f"  補足飲料數: {drink_count} 杯")
-
-    except Exception as e:
-        db.rollback()
-        print(f"錯誤: {e}")
-        raise
-    finally:
-        db.close()
+
+    name = "fix_drink_preferences"
+
+    def fix_order(self, order) -> bool:
+        if not order.drinks:
+            return False
+
+        order_updated = False
+        for drink in order.drinks:
+            # 如果缺少溫度，隨機補上
+            if not drink.get('temperature'):
+                drink['temperature'] = random.choice(TEMPERATURE_OPTIONS)
+                order_updated = True
+
+            # 如果缺少甜度，隨機補上
+            if not drink.get('sweetness'):
+                drink['sweetness'] = random.choice(SWEETNESS_OPTIONS)
+                order_updated = True
+
+        if order_updated:
+            # 使用 flag_modified 告訴 SQLAlchemy JSON 欄位已修改
+            flag_modified(order, 'drinks')
+        return order_updated
+
+    def sql_update(self, db, start_id, end_id):
+        if db.bind.dialect.name != "postgresql":
+            return None
+        result = db.execute(text(FIX_DRINKS_SQL), {
+            "start_id": start_id,
+            "end_id": end_id,
+            "temperatures": TEMPERATURE_OPTIONS,
+            "sweetness": SWEETNESS_OPTIONS,
+        })
+        return result.rowcount
+
 
 if __name__ == "__main__":
-    fix_drink_preferences()
+    parser = argparse.ArgumentParser(description="補足訂單中飲料的溫度和甜度資料")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批處理的訂單數（每批一個交易）")
+    parser.add_argument("--max-rows-per-second", type=float, default=0, help="每秒最多處理的訂單數（0 = 不限制）")
+    parser.add_argument("--dry-run", action="store_true", help="只回報會修改的訂單數，不寫入")
+    parser.add_argument("--restart", action="store_true", help="忽略檢查點，從頭處理")
+    args = parser.parse_args()
+
+    DrinkPreferencesBackfill(
+        batch_size=args.batch_size,
+        max_rows_per_second=args.max_rows_per_second,
+        dry_run=args.dry_run,
+    ).run(restart=args.restart)
@@ -1,14 +1,43 @@
 """
-生成測試訂單資料
+生成測試訂單資料（容量測試用）
+
+以 NumPy 向量化抽樣產生大量擬真訂單，相同參數（seed、筆數、日期範圍、chunk 大小）每次產生完全相同的資料：
+- 訂單量依星期幾與營業時段（午餐、晚餐尖峰）分布，訂單時間大致依訂單 ID 遞增
+- 餐點、單價與分類取自目前的選單（MenuService），熱門程度依選單順序遞減
+- 每單的品項數、數量、是否點飲料、溫度與甜度依固定的機率分布抽樣
+- 訂單編號為 TEST{seed}-{序號}，不會與正式訂單衝突；以相同 seed 重複執行時已存在的訂單會略過
+
+每 chunk 筆批次寫入資料庫（PostgreSQL 用 COPY，其他用 executemany），
+或以 --output 寫成 CSV / Parquet（orders 資料表的欄位，items / drinks 為 JSON 字串）供離線效能測試
+
+使用方式：
+    python scripts/generate_test_orders.py                                  # 最近 30 天、30 筆
+    python scripts/generate_test_orders.py --count 2000000 --days 365 --seed 7
+    python scripts/generate_test_orders.py --count 1000000 --stores main,north
+    python scripts/generate_test_orders.py --count 5000000 --output orders.parquet --default-menu
 """
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import SessionLocal
-from app.models.order import Order
-from datetime import datetime, timedelta
-import random
+from app.services.menu_service import MenuService, DEFAULT_MENU, MENU_CATEGORIES
+from app.schemas.order import TEMPERATURE_OPTIONS, SWEETNESS_OPTIONS
+from app.utils.bulk_load import ORDER_COLUMNS, JSON_COLUMNS, resolve_method, write_orders
+from app.utils.http_cache import analytics_cache_notice
+from app.utils.stores import DEFAULT_STORE_ID, validate_store_id
+from app.utils.timezone import get_store_timezone, store_today, timezone_name
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import logging
+import time
+
+import numpy as np
+import orjson
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # 三個字的中文姓名
 NAMES = [
@@ -20,115 +49,324 @@ NAMES = [
     "詹美玲", "高志偉", "梁雅芬", "孫建宏", "石雅婷"
 ]
 
-# 菜單項目
-DISHES = [
-    {"id": "m1", "name": "貓爪咖哩飯", "price": 120},
-    {"id": "m2", "name": "喵喵義大利麵", "price": 150},
-    {"id": "m3", "name": "貓咪漢堡套餐", "price": 180},
-    {"id": "m4", "name": "虎斑三明治", "price": 100},
-    {"id": "m5", "name": "波斯貓沙拉", "price": 130}
-]
+# 取餐方式與比例
+PICKUP_METHODS = ["內用", "外帶"]
+PICKUP_WEIGHTS = [0.55, 0.45]
 
-DRINKS = [
-    {"id": "dr1", "name": "貓爪拿鐵", "price": 80},
-    {"id": "dr2", "name": "喵喵奶茶", "price": 70},
-    {"id": "dr3", "name": "橘貓果汁", "price": 60},
-    {"id": "dr4", "name": "黑貓可可", "price": 75},
-    {"id": "dr5", "name": "白貓優格飲", "price": 65}
-]
+# 備註（大多數訂單沒有備註）
+NOTES = ["", "不要香菜", "少辣", "不用餐具", "醬料分開", "飯少一點"]
+NOTE_WEIGHTS = [0.9, 0.02, 0.03, 0.02, 0.02, 0.01]
 
-# 飲料選項
-ICE_LEVELS = ["正常冰", "少冰", "微冰", "去冰", "溫", "熱"]
-SWEETNESS = ["正常糖", "少糖", "半糖", "微糖", "無糖"]
+# 星期一到星期日的相對訂單量
+WEEKDAY_WEIGHTS = [0.85, 0.9, 0.9, 0.95, 1.15, 1.35, 1.25]
+
+# 營業時間 10:00 - 21:59 各小時的相對訂單量（午餐、晚餐尖峰）
+HOUR_WEIGHTS = {10: 3, 11: 8, 12: 14, 13: 10, 14: 4, 15: 3, 16: 3, 17: 7, 18: 13, 19: 11, 20: 6, 21: 3}
+
+# 各分類被點的相對機率（同分類內依選單順序遞減）
+CATEGORY_WEIGHTS = {"mains": 3.0, "soups": 1.2, "desserts": 1.0}
+
+# 每單餐點品項數 = 1 + Poisson(平均)，最多 MAX_LINES 種；每個品項 QUANTITY_TWO 機率點 2 份
+MEAN_EXTRA_LINES = 0.7
+MAX_LINES = 4
+QUANTITY_TWO = 0.12
+
+# 點飲料的機率、點第二種飲料的機率
+DRINK_PROBABILITY = 0.7
+SECOND_DRINK_PROBABILITY = 0.2
+
+# 溫度、甜度的分布（對應 TEMPERATURE_OPTIONS / SWEETNESS_OPTIONS 的順序）
+TEMPERATURE_WEIGHTS = [0.3, 0.25, 0.1, 0.12, 0.08, 0.15]
+SWEETNESS_WEIGHTS = [0.15, 0.2, 0.3, 0.2, 0.15]
+
+
+def normalize(weights) -> np.ndarray:
+    weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum()
+
+
+class StoreMenu:
+    """單一分店的選單（抽樣用陣列與預先建立的品項 dict）"""
+
+    def __init__(self, menu: dict):
+        foods = [
+            (item, category)
+            for category in MENU_CATEGORIES if category != "drinks"
+            for item in menu.get(category, [])
+        ]
+        self.drinks = menu.get("drinks", [])
+        if not foods:
+            raise ValueError("選單中沒有餐點")
+
+        self.foods = [item for item, _ in foods]
+        self.food_prices = np.array([item["price"] for item in self.foods])
+        self.drink_prices = np.array([item["price"] for item in self.drinks] or [0])
+
+        # 熱門程度：分類權重 ÷ √(分類內名次)
+        positions = {}
+        weights = []
+        for item, category in foods:
+            rank = positions[category] = positions.get(category, 0) + 1
+            weights.append(CATEGORY_WEIGHTS.get(category, 1.0) / np.sqrt(rank))
+        self.log_food_weights = np.log(normalize(weights))
+        self.drink_weights = normalize(
+            [1 / np.sqrt(rank) for rank in range(1, len(self.drinks) + 1)] or [1]
+        )
+
+        # 同樣的品項 / 數量 / 選項組合共用同一個 dict
+        self._lines = {}
+
+    def food_line(self, index: int, quantity: int) -> dict:
+        key = ("food", index, quantity)
+        if key not in self._lines:
+            item = self.foods[index]
+            self._lines[key] = {
+                "id": item["id"], "name": item["name"], "quantity": quantity, "price": item["price"],
+                "temperature": None, "sweetness": None,
+            }
+        return self._lines[key]
+
+    def drink_line(self, index: int, quantity: int, temperature: int, sweetness: int) -> dict:
+        key = ("drink", index, quantity, temperature, sweetness)
+        if key not in self._lines:
+            item = self.drinks[index]
+            self._lines[key] = {
+                "id": item["id"], "name": item["name"], "quantity": quantity, "price": item["price"],
+                "temperature": TEMPERATURE_OPTIONS[temperature], "sweetness": SWEETNESS_OPTIONS[sweetness],
+            }
+        return self._lines[key]
+
+
+def day_counts(rng: np.random.Generator, count: int, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+    """依星期幾的權重把 count 筆訂單分配到每一天，回傳（日期陣列, 每天筆數）"""
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+    # 1970-01-01 是星期四
+    weekdays = (days.astype("int64") + 3) % 7
+    weights = normalize(np.array(WEEKDAY_WEIGHTS)[weekdays])
+    return days, rng.multinomial(count, weights)
 
-# 取餐方式
-PICKUP_METHODS = ["內用", "外帶"]
 
-def generate_order_number(index):
-    """生成訂單編號"""
-    timestamp = datetime.now().strftime("%y%m%d")
-    return f"ORD{timestamp}{index:04d}"
+def generate_chunk(rng: np.random.Generator, day_of_order: np.ndarray, first_index: int, seed: int,
+                   stores: List[str], menus: Dict[str, StoreMenu], tz_name: str) -> List[dict]:
+    """產生一批訂單（day_of_order 為每筆訂單的當地日期，已排序）"""
+    n = len(day_of_order)
 
-def generate_random_datetime(days_ago=30):
-    """生成隨機日期時間（最近N天內）"""
-    now = datetime.now()
-    days_offset = random.randint(0, days_ago)
-    hours_offset = random.randint(10, 21)  # 營業時間 10:00 - 21:00
-    minutes_offset = random.randint(0, 59)
+    # 訂單時間：小時依營業時段分布，分秒均勻；同一批內依時間排序
+    hours = rng.choice(list(HOUR_WEIGHTS), size=n, p=normalize(list(HOUR_WEIGHTS.values())))
+    seconds = hours * 3600 + rng.integers(0, 3600, size=n)
+    local = day_of_order.astype("datetime64[s]") + seconds.astype("timedelta64[s]")
+    order = np.argsort(local, kind="stable")
+    local, hours = local[order], hours[order]
 
-    random_date = now - timedelta(days=days_offset)
-    random_date = random_date.replace(hour=hours_offset, minute=minutes_offset, second=0, microsecond=0)
-    return random_date
+    created_at = (
+        pd.DatetimeIndex(local)
+        .tz_localize(tz_name, ambiguous=np.zeros(n, dtype=bool), nonexistent="shift_forward")
+        .tz_convert("UTC")
+        .to_pydatetime()
+    )
+    local_dates = local.astype("datetime64[D]").astype(object)
 
-def create_test_orders(count=30):
-    """建立測試訂單"""
-    db = SessionLocal()
+    store_index = rng.integers(0, len(stores), size=n)
+    customer = rng.integers(0, len(NAMES), size=n)
+    pickup = rng.choice(len(PICKUP_METHODS), size=n, p=normalize(PICKUP_WEIGHTS))
+    note = rng.choice(len(NOTES), size=n, p=normalize(NOTE_WEIGHTS))
+
+    # 餐點：品項數、各品項份數；以 Gumbel top-k 向量化地不重複抽出熱門度加權的品項
+    line_count = 1 + np.minimum(rng.poisson(MEAN_EXTRA_LINES, size=n), MAX_LINES - 1)
+    food_quantity = 1 + (rng.random((n, MAX_LINES)) < QUANTITY_TWO)
+    # 飲料：是否點、第二種、溫度、甜度
+    drink_count = (rng.random(n) < DRINK_PROBABILITY) * (1 + (rng.random(n) < SECOND_DRINK_PROBABILITY))
+    drink_quantity = 1 + (rng.random((n, 2)) < QUANTITY_TWO)
+    temperature = rng.choice(len(TEMPERATURE_OPTIONS), size=(n, 2), p=normalize(TEMPERATURE_WEIGHTS))
+    sweetness = rng.choice(len(SWEETNESS_OPTIONS), size=(n, 2), p=normalize(SWEETNESS_WEIGHTS))
+
+    foods = np.zeros((n, MAX_LINES), dtype=int)
+    drinks = np.zeros((n, 2), dtype=int)
+    totals = np.zeros(n, dtype=int)
+    for position, store_id in enumerate(stores):
+        mask = store_index == position
+        size = int(mask.sum())
+        if not size:
+            continue
+        menu = menus[store_id]
+
+        width = min(MAX_LINES, len(menu.foods))
+        keys = menu.log_food_weights + rng.gumbel(size=(size, len(menu.foods)))
+        foods[mask, :width] = np.argsort(-keys, axis=1)[:, :width]
+        drinks[mask] = rng.choice(len(menu.drink_weights), size=(size, 2), p=menu.drink_weights)
+        if len(menu.drinks) > 1:
+            # 第二種飲料與第一種不同
+            same = drinks[mask, 1] == drinks[mask, 0]
+            drinks[np.flatnonzero(mask)[same], 1] = (drinks[mask, 0][same] + 1) % len(menu.drinks)
+        line_count[mask] = np.minimum(line_count[mask], width)
+        if not menu.drinks:
+            drink_count[mask] = 0
+
+        used = np.arange(MAX_LINES) < line_count[mask][:, None]
+        totals[mask] = (menu.food_prices[foods[mask]] * food_quantity[mask] * used).sum(axis=1)
+        used = np.arange(2) < drink_count[mask][:, None]
+        totals[mask] += (menu.drink_prices[drinks[mask]] * drink_quantity[mask] * used).sum(axis=1)
+
+    # 逐筆組成資料列（品項 dict 由 StoreMenu 快取共用；先轉成 Python list，避免逐筆存取 NumPy 純量）
+    store_index, customer, pickup, note = store_index.tolist(), customer.tolist(), pickup.tolist(), note.tolist()
+    line_count, foods, food_quantity = line_count.tolist(), foods.tolist(), food_quantity.tolist()
+    drink_count, drinks, drink_quantity = drink_count.tolist(), drinks.tolist(), drink_quantity.tolist()
+    temperature, sweetness, totals, hours = temperature.tolist(), sweetness.tolist(), totals.tolist(), hours.tolist()
+
+    rows = []
+    for i in range(n):
+        store_id = stores[store_index[i]]
+        menu = menus[store_id]
+        rows.append({
+            "order_number": f"TEST{seed}-{first_index + i}",
+            "store_id": store_id,
+            "customer_name": NAMES[customer[i]],
+            "pickup_method": PICKUP_METHODS[pickup[i]],
+            "items": [menu.food_line(foods[i][k], food_quantity[i][k]) for k in range(line_count[i])],
+            "drinks": [
+                menu.drink_line(drinks[i][k], drink_quantity[i][k], temperature[i][k], sweetness[i][k])
+                for k in range(drink_count[i])
+            ],
+            "total_amount": totals[i],
+            "notes": NOTES[note[i]],
+            "created_at": created_at[i],
+            "local_date": local_dates[i],
+            "local_hour": hours[i],
+        })
+    return rows
+
+
+def generate_orders(count: int, start: date, end: date, seed: int, stores: List[str],
+                    menus: Dict[str, StoreMenu], chunk_size: int) -> Iterator[List[dict]]:
+    """依序產生每一批訂單"""
+    rng = np.random.default_rng(seed)
+    days, counts = day_counts(rng, count, start, end)
+    boundaries = np.cumsum(counts)
+    tz_name = timezone_name(get_store_timezone())
+
+    for first in range(0, count, chunk_size):
+        positions = np.arange(first, min(first + chunk_size, count))
+        day_of_order = days[np.searchsorted(boundaries, positions, side="right")]
+        yield generate_chunk(rng, day_of_order, first + 1, seed, stores, menus, tz_name)
+
+
+def to_frame(rows: List[dict]) -> pd.DataFrame:
+    """資料列 → orders 欄位的 DataFrame（items / drinks 轉成 JSON 字串）"""
+    frame = pd.DataFrame(rows, columns=ORDER_COLUMNS)
+    for column in JSON_COLUMNS:
+        frame[column] = [orjson.dumps(value).decode() for value in frame[column]]
+    frame["created_at"] = pd.to_datetime(frame["created_at"], utc=True)
+    frame["local_date"] = pd.to_datetime(frame["local_date"]).dt.date
+    return frame
+
+
+class FileWriter:
+    """依副檔名寫入 CSV 或 Parquet（逐批附加）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        if not self.parquet and not path.endswith(".csv"):
+            raise ValueError("輸出檔只支援 .csv 或 .parquet")
+        self._writer = None
+        self._first = True
+
+    def write(self, rows: List[dict]) -> int:
+        frame = to_frame(rows)
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+        return len(rows)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def load_menus(stores: List[str], default_menu: bool) -> Dict[str, StoreMenu]:
+    """各分店目前的選單（default_menu 時使用內建的初始選單，不需連線資料庫）"""
+    return {
+        store_id: StoreMenu(DEFAULT_MENU if default_menu else MenuService.get_menu_data(store_id))
+        for store_id in stores
+    }
+
+
+def create_test_orders(count: int = 30, days: int = 30, end: Optional[date] = None, seed: int = 0,
+                       stores: Optional[List[str]] = None, chunk_size: int = 50000,
+                       method: str = "auto", output: Optional[str] = None,
+                       default_menu: bool = False) -> int:
+    """建立測試訂單，回傳新增（或寫入檔案）的筆數"""
+    if not 0 <= seed < 1000000:
+        raise ValueError("seed 需介於 0 到 999999")
+    if count >= 1000000000:
+        raise ValueError("筆數需小於 10 億")
+    stores = [validate_store_id(store_id) for store_id in (stores or [DEFAULT_STORE_ID])]
+    end = end or store_today()
+    start = end - timedelta(days=days - 1)
+
+    menus = load_menus(stores, default_menu)
+    writer = FileWriter(output) if output else None
+    method = None if output else resolve_method(method)
+
+    logger.info(
+        f"開始生成 {count:,} 筆測試訂單：{start} ~ {end}，分店 {', '.join(stores)}，seed {seed}，"
+        f"寫入 {output or method}"
+    )
+    started = time.perf_counter()
+    generated = written = 0
 
     try:
-        print(f"開始生成 {count} 筆測試訂單...")
-
-        for i in range(count):
-            # 隨機選擇客戶
-            customer_name = random.choice(NAMES)
-            pickup_method = random.choice(PICKUP_METHODS)
-
-            # 隨機選擇餐點（1-3 種）
-            num_dishes = random.randint(1, 3)
-            selected_dishes = random.sample(DISHES, num_dishes)
-            items = []
-            total_amount = 0
-
-            for dish in selected_dishes:
-                quantity = random.randint(1, 2)
-                items.append({
-                    "id": dish["id"],
-                    "name": dish["name"],
-                    "price": dish["price"],
-                    "quantity": quantity
-                })
-                total_amount += dish["price"] * quantity
-
-            # 隨機選擇飲料（0-2 種）
-            drinks = []
-            if random.random() > 0.2:  # 80% 機率點飲料
-                num_drinks = random.randint(1, 2)
-                selected_drinks = random.sample(DRINKS, num_drinks)
-
-                for drink in selected_drinks:
-                    quantity = random.randint(1, 2)
-                    drinks.append({
-                        "id": drink["id"],
-                        "name": drink["name"],
-                        "price": drink["price"],
-                        "quantity": quantity,
-                        "temperature": random.choice(ICE_LEVELS),
-                        "sweetness": random.choice(SWEETNESS)
-                    })
-                    total_amount += drink["price"] * quantity
-
-            # 建立訂單
-            order = Order(
-                order_number=generate_order_number(i + 1),
-                customer_name=customer_name,
-                pickup_method=pickup_method,
-                items=items,
-                drinks=drinks if drinks else None,
-                total_amount=total_amount,
-                created_at=generate_random_datetime(30)
-            )
-
-            db.add(order)
-            print(f"[{i+1}/{count}] {customer_name} - {pickup_method} - NT$ {total_amount}")
-
-        db.commit()
-        print(f"\n✓ 成功建立 {count} 筆測試訂單！")
-
-    except Exception as e:
-        db.rollback()
-        print(f"錯誤: {e}")
-        raise
+        for rows in generate_orders(count, start, end, seed, stores, menus, chunk_size):
+            written += writer.write(rows) if writer else write_orders(rows, method)
+            generated += len(rows)
+            elapsed = time.perf_counter() - started
+            logger.info(f"已生成 {generated:,} / {count:,} 筆（{generated / elapsed:,.0f} 筆/秒）")
     finally:
-        db.close()
+        if writer:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"✓ 完成：生成 {generated:,} 筆、寫入 {written:,} 筆（已存在 {generated - written:,} 筆），"
+        f"{elapsed:.1f} 秒"
+    )
+    if written and not output:
+        logger.info(f"品項組合統計請執行 scripts/rebuild_item_pairs.py --since {start} --until {end} 更新")
+        logger.info(f"訂單近似統計摘要請執行 scripts/build_order_sketches.py --since {start} --until {end} --force 更新")
+        logger.info(analytics_cache_notice())
+    return written
+
 
 if __name__ == "__main__":
-    create_test_orders(30)
+    parser = argparse.ArgumentParser(description="生成測試訂單資料")
+    parser.add_argument("--count", type=int, default=30, help="訂單筆數")
+    parser.add_argument("--days", type=int, default=30, help="分布的天數（到 --end 為止）")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="最後一天（預設今天）")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子（0-999999，也用於訂單編號）")
+    parser.add_argument("--stores", default=DEFAULT_STORE_ID, help="分店代碼，以逗號分隔")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="每批產生與寫入的筆數")
+    parser.add_argument("--method", choices=["auto", "copy", "insert"], default="auto",
+                        help="寫入方式（auto：PostgreSQL 用 COPY，其他用 executemany）")
+    parser.add_argument("--output", default=None, help="改寫入 CSV / Parquet 檔（依副檔名），不寫入資料庫")
+    parser.add_argument("--default-menu", action="store_true", help="使用內建的初始選單（不讀取資料庫）")
+    args = parser.parse_args()
+
+    create_test_orders(
+        count=args.count,
+        days=args.days,
+        end=args.end,
+        seed=args.seed,
+        stores=args.stores.split(","),
+        chunk_size=args.chunk_size,
+        method=args.method,
+        output=args.output,
+        default_menu=args.default_menu,
+    )
@@ -1,6 +1,10 @@
 """
 資料庫初始化腳本
-建立所有資料表
+建立所有資料表並套用尚未執行的 schema 遷移
+
+使用方式：
+    python scripts/init_db.py
+    python scripts/init_db.py --recompute-local-time   # 變更 STORE_TIMEZONE 後重算訂單當地日期/小時
 """
 import sys
 import os
@@ -8,30 +12,40 @@ import os
 # 加入專案根目錄到 Python 路徑
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import engine, Base
-from app.models.order import Order
+from app.database import engine
+from app.migrations import run_migrations, recompute_local_time
+import argparse
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def init_database():
+def init_database(recompute: bool = False):
     """初始化資料庫"""
     try:
-        logger.info("開始建立資料表...")
+        logger.info("開始套用資料庫遷移...")
+
+        applied = run_migrations(engine)
 
-        # 建立所有資料表
-        Base.metadata.create_all(bind=engine)
+        logger.info("✅ 資料庫已是最新版本！")
+        for version in applied:
+            logger.info(f"  - {version}")
 
-        logger.info("✅ 資料表建立成功！")
-        logger.info("已建立的資料表：")
-        logger.info("  - orders (訂單)")
+        if recompute:
+            with engine.begin() as conn:
+                recompute_local_time(conn, only_missing=False)
+            logger.info("✅ 已依店家時區重算訂單當地日期/小時")
 
     except Exception as e:
-        logger.error(f"❌ 建立資料表失敗：{e}")
+        logger.error(f"❌ 資料庫初始化失敗：{e}")
         raise
 
 
 if __name__ == "__main__":
-    init_database()
+    parser = argparse.ArgumentParser(description="初始化資料庫")
+    parser.add_argument("--recompute-local-time", action="store_true",
+                        help="依目前的 STORE_TIMEZONE 重算所有訂單的當地日期/小時")
+    args = parser.parse_args()
+
+    init_database(args.recompute_local_time)
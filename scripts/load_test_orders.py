@@ -0,0 +1,135 @@
+"""
+訂單送出負載測試（多 worker 擴展性）
+依序以不同 worker 數啟動 gunicorn（gunicorn.conf.py），對 POST /api/orders/ 併發送出訂單，
+比較每秒處理的訂單數，確認吞吐量隨 worker 數近似線性成長
+
+注意：
+- 會寫入真實訂單到 DATABASE_URL 指定的資料庫，請使用測試資料庫
+- SQLite 同時只允許一個寫入者，擴展性測試請使用 PostgreSQL
+- worker 數超過 CPU 核心數後吞吐量不會再成長
+
+使用方式：
+    python scripts/load_test_orders.py
+    python scripts/load_test_orders.py --workers 1,2,4 --requests 2000 --concurrency 64
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.menu_service import MenuService
+import argparse
+import asyncio
+import random
+import subprocess
+import time
+import httpx
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def build_order_payload() -> dict:
+    """以目前選單產生一筆合法的訂單"""
+    menu = MenuService.get_menu_data()
+    dishes = random.sample(menu['mains'] + menu['soups'] + menu['desserts'], 2)
+    drink = random.choice(menu['drinks'])
+    items = [dict(item, quantity=random.randint(1, 2)) for item in dishes]
+    items.append(dict(drink, quantity=1, temperature="少冰", sweetness="半糖"))
+    return {
+        "customerName": "壓力測試",
+        "diningOption": random.choice(["內用", "外帶"]),
+        "note": "",
+        "items": items,
+        "totalAmount": sum(item["price"] * item["quantity"] for item in items)
+    }
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """以指定 worker 數啟動 gunicorn（所有請求都來自同一個 IP，關閉頻率限制）"""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), RATE_LIMIT_ENABLED="false")
+    return subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", "app.main:app"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+    """等待伺服器可以回應 /health"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("伺服器啟動逾時")
+
+
+async def submit_orders(base_url: str, total: int, concurrency: int) -> dict:
+    """併發送出 total 筆訂單，回傳吞吐量與延遲統計"""
+    payloads = [build_order_payload() for _ in range(total)]
+    latencies = []
+    failures = 0
+    queue = iter(payloads)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal failures
+        for payload in queue:
+            started = time.perf_counter()
+            response = await client.post("/api/orders/", json=payload)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "failures": failures
+    }
+
+
+async def run(worker_counts: list, total: int, concurrency: int, port: int) -> None:
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+
+    for workers in worker_counts:
+        server = start_server(workers, port)
+        try:
+            await wait_until_ready(base_url)
+            # 先送少量請求讓每個 worker 完成預熱
+            await submit_orders(base_url, workers * 10, workers)
+            stats = await submit_orders(base_url, total, concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        results.append((workers, stats))
+        print(f"workers={workers}: {stats['throughput']:.0f} 筆/秒，"
+              f"p50 {stats['p50_ms']:.1f} ms，p95 {stats['p95_ms']:.1f} ms，失敗 {stats['failures']}")
+
+    baseline = results[0][1]["throughput"] / results[0][0]
+    print("\n=== 擴展性（相對單一 worker）===")
+    for workers, stats in results:
+        speedup = stats["throughput"] / baseline
+        print(f"{workers:>3} workers: {speedup:.2f}x（理想 {workers}x，效率 {speedup / workers:.0%}）")
+    print(f"（此機器 CPU 核心數：{os.cpu_count()}）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="訂單送出負載測試")
+    parser.add_argument("--workers", type=lambda v: [int(n) for n in v.split(",")],
+                        default=[1, 2, 4], help="要測試的 worker 數（逗號分隔）")
+    parser.add_argument("--requests", type=int, default=1000, help="每輪送出的訂單數")
+    parser.add_argument("--concurrency", type=int, default=32, help="同時進行的請求數")
+    parser.add_argument("--port", type=int, default=8765, help="測試伺服器埠號")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.workers, args.requests, args.concurrency, args.port))
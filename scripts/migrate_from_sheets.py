@@ -1,37 +1,347 @@
 """
 從 Google Sheets 遷移資料到 PostgreSQL
 （可選用，如果需要保留 Google Sheets 的歷史訂單資料）
+
+逐列串流讀取 Google Sheets 匯出的 CSV，將格式化的餐點字串（OrderService.format_items 的輸出）
+解析回 items / drinks JSON，每 chunk 筆批次寫入（PostgreSQL 用 COPY，其他資料庫用 executemany）。
+
+- 記憶體用量只與 chunk 大小有關，可匯入數百萬列的檔案
+- 每個 chunk 提交後將讀取位置寫入檢查點檔（<CSV>.checkpoint.json），中斷後重新執行會從該處繼續
+- 以 order_number 去除重複：已存在的訂單略過，重複匯入同一個檔案不會產生重複訂單
+
+CSV 欄位（依標題列辨識，中英文皆可）：
+    訂單編號、訂單時間、顧客姓名、取餐方式、餐點、飲料、總金額、備註、分店（可選）
+訂單時間視為店家當地時間；沒有時間欄位時由訂單編號（CAT + YYMMDDHHmmss）推算
+
+使用方式：
+    python scripts/migrate_from_sheets.py orders.csv
+    python scripts/migrate_from_sheets.py orders.csv --chunk-size 20000 --store main
+    python scripts/migrate_from_sheets.py orders.csv --restart   # 忽略檢查點，從頭匯入
 """
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import SessionLocal
-from app.models.order import Order
+from app.services.menu_service import MenuService, MENU_CATEGORIES
+from app.services.order_service import OrderService
+from app.utils.bulk_load import resolve_method, write_orders
+from app.utils.http_cache import analytics_cache_notice
+from app.utils.stores import DEFAULT_STORE_ID, validate_store_id
+from app.utils.timezone import get_store_timezone, local_date_hour
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import json
 import logging
+import re
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 欄位 → 可接受的標題名稱
+COLUMN_ALIASES = {
+    "order_number": ["訂單編號", "order_number"],
+    "created_at": ["訂單時間", "時間", "時間戳記", "建立時間", "created_at"],
+    "customer_name": ["顧客姓名", "姓名", "customer_name"],
+    "pickup_method": ["取餐方式", "pickup_method"],
+    "items": ["餐點", "餐點明細", "items"],
+    "drinks": ["飲料", "飲料明細", "drinks"],
+    "total_amount": ["總金額", "金額", "total_amount"],
+    "notes": ["備註", "notes"],
+    "store_id": ["分店", "店家", "store_id"],
+}
+REQUIRED_COLUMNS = ["order_number", "customer_name", "pickup_method", "items", "total_amount"]
+
+# Google Sheets 常見的日期時間格式（中文地區設定會輸出「上午/下午」）
+DATETIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d %p %I:%M:%S", "%Y/%m/%d %I:%M:%S %p",
+]
+ORDER_NUMBER_TIME = re.compile(r"^CAT(\d{12})")
+
+# 最多記錄幾筆錯誤列的詳細訊息
+MAX_LOGGED_ERRORS = 20
+
+
+class Checkpoint:
+    """匯入進度（CSV 讀取位置與已處理列數），每個 chunk 提交後更新"""
+
+    def __init__(self, csv_path: str):
+        self.path = f"{csv_path}.checkpoint.json"
+        stat = os.stat(csv_path)
+        self.file_id = {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+        self.offset = None
+        self.rows = 0
+        self.inserted = 0
+
+    def load(self) -> bool:
+        """讀取同一個檔案的檢查點，檔案內容已變動時不使用"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("file") != self.file_id:
+            logger.warning("CSV 檔案已變動，忽略舊的檢查點")
+            return False
+        self.offset, self.rows, self.inserted = state["offset"], state["rows"], state["inserted"]
+        return True
+
+    def save(self, offset: int) -> None:
+        """先寫暫存檔再取代，寫到一半中斷也不會損毀檢查點"""
+        self.offset = offset
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file": self.file_id, "offset": offset, "rows": self.rows, "inserted": self.inserted}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_records(f) -> Iterator[Tuple[List[str], int]]:
+    """
+    逐筆讀取 CSV，同時回傳每筆讀完後的檔案位置
+
+    以 readline 餵給 csv.reader（而非逐行迭代檔案），才能在每筆之後 tell()；
+    欄位中含換行的記錄也能正確處理
+    """
+    reader = csv.reader(iter(f.readline, ""))
+    for record in reader:
+        yield record, f.tell()
+
+
+def resolve_columns(header: List[str]) -> Dict[str, int]:
+    """標題列 → 欄位索引"""
+    positions = {name.strip(): index for index, name in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+    if missing:
+        raise ValueError(f"CSV 缺少欄位：{', '.join(COLUMN_ALIASES[field][0] for field in missing)}")
+    if "created_at" not in columns:
+        logger.warning("CSV 沒有時間欄位，訂單時間改由訂單編號推算")
+    return columns
+
+
+def parse_created_at(value: str, order_number: str) -> datetime:
+    """店家當地時間字串（或訂單編號中的時間）→ UTC"""
+    value = (value or "").strip().replace("上午", "AM").replace("下午", "PM")
+    local = None
+    for fmt in DATETIME_FORMATS:
+        try:
+            local = datetime.strptime(value, fmt)
+            break
+        except ValueError:
+            continue
+
+    if local is None:
+        match = ORDER_NUMBER_TIME.match(order_number)
+        if not match:
+            raise ValueError(f"無法解析訂單時間：{value or '（空白）'}")
+        local = datetime.strptime(match.group(1), "%y%m%d%H%M%S")
+
+    return local.replace(tzinfo=get_store_timezone()).astimezone(timezone.utc)
+
 
-def migrate_from_sheets():
+class ItemResolver:
+    """依餐點名稱找回餐點 ID、單價與分類（以各分店目前的選單為準）"""
+
+    def __init__(self):
+        self._menus = {}
+        self.unknown_names = set()
+
+    def _menu(self, store_id: str) -> Dict[str, Tuple[dict, str]]:
+        if store_id not in self._menus:
+            menu = MenuService.get_menu_data(store_id)
+            self._menus[store_id] = {
+                item["name"]: (item, category)
+                for category in MENU_CATEGORIES
+                for item in menu.get(category, [])
+            }
+        return self._menus[store_id]
+
+    def resolve(self, parsed: dict, store_id: str, default_category: str) -> Tuple[dict, str]:
+        """
+        解析結果 → 訂單中的品項 dict 與分類
+
+        選單中已不存在的餐點保留名稱，ID 記為 legacy:名稱、單價記為 0
+        """
+        found = self._menu(store_id).get(parsed["name"])
+        if found:
+            menu_item, category = found
+            item_id, price = menu_item["id"], menu_item["price"]
+        else:
+            self.unknown_names.add(parsed["name"])
+            category = default_category
+            item_id, price = f"legacy:{parsed['name']}", 0
+
+        # 與 API 建立的訂單（schemas.order.MenuItem）相同的欄位
+        item = {
+            "id": item_id,
+            "name": parsed["name"],
+            "quantity": parsed["quantity"],
+            "price": price,
+            "temperature": parsed.get("temperature"),
+            "sweetness": parsed.get("sweetness"),
+        }
+        return item, category
+
+
+def parse_record(record: List[str], columns: Dict[str, int], resolver: ItemResolver,
+                 default_store: str) -> dict:
+    """CSV 記錄 → orders 資料列，格式錯誤時拋出 ValueError"""
+    def field(name: str) -> str:
+        index = columns.get(name)
+        return record[index].strip() if index is not None and index < len(record) else ""
+
+    order_number = field("order_number")
+    if not order_number:
+        raise ValueError("缺少訂單編號")
+    if len(order_number) > 20:
+        raise ValueError(f"訂單編號過長：{order_number}")
+
+    store_id = validate_store_id(field("store_id") or default_store)
+    created_at = parse_created_at(field("created_at"), order_number)
+    local_date, local_hour = local_date_hour(created_at)
+
+    # 依選單分類放回餐點 / 飲料（舊資料的欄位分類不一定正確）
+    meals, drinks = [], []
+    for column, default_category in (("items", "mains"), ("drinks", "drinks")):
+        for parsed in OrderService.parse_items(field(column)):
+            item, category = resolver.resolve(parsed, store_id, default_category)
+            (drinks if category == "drinks" else meals).append(item)
+
+    total_amount = field("total_amount").replace(",", "").replace("NT$", "").replace("$", "")
+    try:
+        total_amount = int(float(total_amount))
+    except ValueError:
+        raise ValueError(f"無法解析總金額：{field('total_amount')}")
+
+    return {
+        "order_number": order_number,
+        "store_id": store_id,
+        "customer_name": field("customer_name")[:100],
+        "pickup_method": field("pickup_method"),
+        "items": meals,
+        "drinks": drinks,
+        "total_amount": total_amount,
+        "notes": field("notes"),
+        "created_at": created_at,
+        "local_date": local_date,
+        "local_hour": local_hour,
+    }
+
+
+def migrate_from_sheets(csv_path: str, chunk_size: int = 5000, store_id: str = DEFAULT_STORE_ID,
+                        method: str = "auto", restart: bool = False) -> Optional[dict]:
     """
-    從 Google Sheets 遷移資料
+    從 Google Sheets 匯出的 CSV 匯入訂單
 
-    使用方式：
-    1. 從 Google Sheets 匯出為 CSV
-    2. 讀取 CSV 檔案
-    3. 將資料寫入 PostgreSQL
+    回傳統計：處理列數、新增筆數、重複略過、錯誤列數
     """
-    logger.info("開始資料遷移...")
+    validate_store_id(store_id)
+    method = resolve_method(method)
+
+    checkpoint = Checkpoint(csv_path)
+    if restart:
+        checkpoint.clear()
+    resumed = checkpoint.load()
+
+    resolver = ItemResolver()
+    errors = 0
+    rows_at_start = checkpoint.rows
+    started = time.perf_counter()
+
+    logger.info(f"開始資料遷移：{csv_path}（{method}，每批 {chunk_size} 筆）")
+
+    with open(csv_path, encoding="utf-8-sig", newline="") as f:
+        records = read_records(f)
+        header, _ = next(records, (None, None))
+        if header is None:
+            logger.warning("CSV 是空的")
+            return None
+        columns = resolve_columns(header)
+
+        if resumed:
+            f.seek(checkpoint.offset)
+            records = read_records(f)
+            logger.info(f"從檢查點繼續：已處理 {checkpoint.rows:,} 列、新增 {checkpoint.inserted:,} 筆")
 
-    # TODO: 實作資料遷移邏輯
-    # 1. 讀取 Google Sheets CSV
-    # 2. 解析資料
-    # 3. 寫入 PostgreSQL
+        chunk = []
+        offset = None
+        for record, offset in records:
+            if not any(value.strip() for value in record):
+                continue
+            checkpoint.rows += 1
+            try:
+                chunk.append(parse_record(record, columns, resolver, store_id))
+            except ValueError as e:
+                errors += 1
+                if errors <= MAX_LOGGED_ERRORS:
+                    logger.warning(f"第 {checkpoint.rows:,} 筆略過：{e}")
 
-    logger.info("資料遷移完成！")
+            if len(chunk) >= chunk_size:
+                checkpoint.inserted += write_orders(chunk, method)
+                checkpoint.save(offset)
+                chunk = []
+
+                elapsed = time.perf_counter() - started
+                processed = checkpoint.rows - rows_at_start
+                logger.info(
+                    f"已處理 {checkpoint.rows:,} 列、新增 {checkpoint.inserted:,} 筆"
+                    f"（{processed / elapsed:,.0f} 列/秒）"
+                )
+
+        if chunk:
+            checkpoint.inserted += write_orders(chunk, method)
+        if offset is not None:
+            checkpoint.save(offset)
+
+    elapsed = time.perf_counter() - started
+    processed = checkpoint.rows - rows_at_start
+    stats = {
+        "rows": checkpoint.rows,
+        "inserted": checkpoint.inserted,
+        "duplicates": checkpoint.rows - checkpoint.inserted - errors,
+        "errors": errors,
+    }
+
+    logger.info(
+        f"資料遷移完成！共 {stats['rows']:,} 列，新增 {stats['inserted']:,} 筆，"
+        f"已存在略過 {stats['duplicates']:,} 筆，錯誤 {errors:,} 列；"
+        f"本次 {processed:,} 列、{elapsed:.1f} 秒（{processed / max(elapsed, 1e-9):,.0f} 列/秒）"
+    )
+    if errors > MAX_LOGGED_ERRORS:
+        logger.warning(f"另有 {errors - MAX_LOGGED_ERRORS} 列錯誤未列出")
+    if resolver.unknown_names:
+        logger.warning(f"目前選單中沒有的餐點（單價記為 0）：{', '.join(sorted(resolver.unknown_names))}")
+    logger.info(
+        "匯入歷史訂單後，請重新匯出快照（scripts/export_snapshots.py --force）"
+        "、重算品項組合（scripts/rebuild_item_pairs.py）"
+        "並重建訂單近似統計摘要（scripts/build_order_sketches.py --force）以更新分析資料"
+    )
+    logger.info(analytics_cache_notice())
+
+    checkpoint.clear()
+    return stats
 
 
 if __name__ == "__main__":
-    migrate_from_sheets()
+    parser = argparse.ArgumentParser(description="從 Google Sheets 匯出的 CSV 匯入歷史訂單")
+    parser.add_argument("csv_path", help="Google Sheets 匯出的 CSV 檔")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每批寫入的筆數")
+    parser.add_argument("--store", default=DEFAULT_STORE_ID, help="CSV 沒有分店欄位時使用的分店代碼")
+    parser.add_argument("--method", choices=["auto", "copy", "insert"], default="auto",
+                        help="寫入方式（auto：PostgreSQL 用 COPY，其他用 executemany）")
+    parser.add_argument("--restart", action="store_true", help="忽略檢查點，從頭匯入")
+    args = parser.parse_args()
+
+    migrate_from_sheets(args.csv_path, args.chunk_size, args.store, args.method, args.restart)
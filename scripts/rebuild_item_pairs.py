@@ -0,0 +1,48 @@
+"""
+重算品項組合統計（item_pair_counts）
+建立訂單時會自動累加；批次匯入歷史訂單或產生測試訂單後執行一次，更新該區間的統計
+
+使用方式：
+    python scripts/rebuild_item_pairs.py                          # 全部訂單（含已封存）
+    python scripts/rebuild_item_pairs.py --since 2025-01-01 --until 2025-06-30
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.item_pair_service import ItemPairService
+from datetime import date
+import argparse
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild_item_pairs(since: date = None, until: date = None, days_per_batch: int = 31):
+    """重算 since ~ until（店家當地日期，未指定時為全部訂單）的品項組合"""
+    db = SessionLocal()
+    started = time.perf_counter()
+
+    try:
+        total = ItemPairService.rebuild(db, since, until, days_per_batch)
+        logger.info(f"✅ 重算完成：{total:,} 筆訂單，{time.perf_counter() - started:.1f} 秒")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ 重算品項組合失敗：{e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重算品項組合統計")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="開始日期（預設最早的訂單）")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="結束日期（預設最晚的訂單）")
+    parser.add_argument("--days-per-batch", type=int, default=31, help="每批（一個交易）重算的天數")
+    args = parser.parse_args()
+
+    rebuild_item_pairs(args.since, args.until, args.days_per_batch)
@@ -70,6 +70,17 @@ function getDateParams() {
   return `start_date=${startDate}&end_date=${endDate}`;
 }
 
+// 取得分析資料；伺服器忙碌（503）或請求過於頻繁（429）時依 Retry-After 等待後重試
+async function fetchAnalytics(url, retries = 2) {
+  const response = await fetch(url);
+  if ((response.status === 429 || response.status === 503) && retries > 0) {
+    const seconds = parseInt(response.headers.get('Retry-After'), 10) || 1;
+    await new Promise(resolve => setTimeout(resolve, seconds * 1000));
+    return fetchAnalytics(url, retries - 1);
+  }
+  return response;
+}
+
 // 顯示載入中
 function showLoading() {
   document.getElementById('loading').style.display = 'block';
@@ -108,11 +119,11 @@ async function updateSummaryCards() {
   const dateParams = getDateParams();
 
   // 取得平均客單價
-  const avgResponse = await fetch(`/api/analytics/revenue/average-order-value?${dateParams}`);
+  const avgResponse = await fetchAnalytics(`/api/analytics/revenue/average-order-value?${dateParams}`);
   const avgData = await avgResponse.json();
 
   // 取得尖峰時段
-  const peakResponse = await fetch(`/api/analytics/customer-behavior/peak-hours?${dateParams}`);
+  const peakResponse = await fetchAnalytics(`/api/analytics/customer-behavior/peak-hours?${dateParams}`);
   const peakData = await peakResponse.json();
 
   document.getElementById('totalRevenue').textContent = `NT$ ${avgData.total_revenue.toLocaleString()}`;
@@ -141,7 +152,7 @@ async function updateRevenueChart() {
 
   if (isSingleDay) {
     // 單日：顯示每小時營收
-    const response = await fetch(`/api/analytics/customer-behavior/peak-hours?${dateParams}`);
+    const response = await fetchAnalytics(`/api/analytics/customer-behavior/peak-hours?${dateParams}`);
     const data = await response.json();
 
     chartData = {
@@ -156,14 +167,15 @@ async function updateRevenueChart() {
       }]
     };
   } else {
-    // 多日：顯示每日營收
-    const response = await fetch(`/api/analytics/revenue/daily?${dateParams}`);
+    // 多日：顯示每日營收（區間過長時後端會改為每週或每月）
+    const response = await fetchAnalytics(`/api/analytics/revenue/daily?${dateParams}`);
     const data = await response.json();
+    const periodLabels = { daily: '每日', weekly: '每週', monthly: '每月' };
 
     chartData = {
       labels: data.data.map(d => d.date),
       datasets: [{
-        label: '每日營收 (NT$)',
+        label: `${periodLabels[data.period] || '每日'}營收 (NT$)`,
         data: data.data.map(d => d.revenue),
         borderColor: COLORS.primary,
         backgroundColor: COLORS.primary + '20',
@@ -209,7 +221,7 @@ async function updateRevenueChart() {
 // 更新熱門餐點圖表
 async function updatePopularDishesChart() {
   const dateParams = getDateParams();
-  const response = await fetch(`/api/analytics/popular-items/dishes?${dateParams}&limit=10`);
+  const response = await fetchAnalytics(`/api/analytics/popular-items/dishes?${dateParams}&limit=10`);
   const data = await response.json();
 
   const ctx = document.getElementById('dishesChart');
@@ -260,7 +272,7 @@ async function updatePopularDishesChart() {
 // 更新熱門飲料圖表
 async function updatePopularDrinksChart() {
   const dateParams = getDateParams();
-  const response = await fetch(`/api/analytics/popular-items/drinks?${dateParams}&limit=10`);
+  const response = await fetchAnalytics(`/api/analytics/popular-items/drinks?${dateParams}&limit=10`);
   const data = await response.json();
 
   const ctx = document.getElementById('drinksChart');
@@ -311,7 +323,7 @@ async function updatePopularDrinksChart() {
 // 更新內用外帶比例圖表
 async function updatePickupMethodChart() {
   const dateParams = getDateParams();
-  const response = await fetch(`/api/analytics/customer-behavior/pickup-method-ratio?${dateParams}`);
+  const response = await fetchAnalytics(`/api/analytics/customer-behavior/pickup-method-ratio?${dateParams}`);
   const data = await response.json();
 
   const ctx = document.getElementById('pickupChart');
@@ -368,7 +380,7 @@ async function updatePickupMethodChart() {
 // 更新尖峰時段圖表
 async function updatePeakHoursChart() {
   const dateParams = getDateParams();
-  const response = await fetch(`/api/analytics/customer-behavior/peak-hours?${dateParams}`);
+  const response = await fetchAnalytics(`/api/analytics/customer-behavior/peak-hours?${dateParams}`);
   const data = await response.json();
 
   const ctx = document.getElementById('peakHoursChart');
@@ -421,7 +433,7 @@ async function updatePeakHoursChart() {
 // 更新冰度偏好圖表
 async function updateIceLevelChart() {
   const dateParams = getDateParams();
-  const response = await fetch(`/api/analytics/beverage-preferences/ice-level?${dateParams}`);
+  const response = await fetchAnalytics(`/api/analytics/beverage-preferences/ice-level?${dateParams}`);
   const data = await response.json();
 
   const ctx = document.getElementById('iceLevelChart');
@@ -483,7 +495,7 @@ async function updateIceLevelChart() {
 // 更新甜度偏好圖表
 async function updateSweetnessChart() {
   const dateParams = getDateParams();
-  const response = await fetch(`/api/analytics/beverage-preferences/sweetness?${dateParams}`);
+  const response = await fetchAnalytics(`/api/analytics/beverage-preferences/sweetness?${dateParams}`);
   const data = await response.json();
 
   const ctx = document.getElementById('sweetnessChart');
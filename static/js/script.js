@@ -1,6 +1,8 @@
 // ===== 全域變數 =====
 let cart = []; // 購物車
 let menuData = {}; // 選單資料
+// 分店代碼（網址 ?store=xxx，未指定時由後端使用預設店家）
+const storeId = new URLSearchParams(window.location.search).get('store');
 
 // ===== 頁面載入時執行 =====
 window.addEventListener('DOMContentLoaded', function() {
@@ -16,8 +18,16 @@ window.addEventListener('DOMContentLoaded', function() {
 // ===== 載入選單 =====
 async function loadMenu() {
   try {
+    // 頁面已內嵌（預設店家的）選單資料時直接使用，省下一次 API 請求
+    if (window.__MENU__ && !storeId) {
+      menuData = window.__MENU__;
+      renderMenu(menuData);
+      return;
+    }
+
     // 從後端 API 取得選單資料（改為 fetch，不再使用 google.script.run）
-    const response = await fetch('/api/menu/');
+    const url = storeId ? '/api/menu/?store_id=' + encodeURIComponent(storeId) : '/api/menu/';
+    const response = await fetch(url);
     if (!response.ok) {
       throw new Error('載入選單失敗');
     }
@@ -274,6 +284,9 @@ async function submitOrder() {
     items: cart,
     totalAmount: totalAmount
   };
+  if (storeId) {
+    orderData.storeId = storeId;
+  }
 
   // 除錯：顯示訂單資料
   console.log('準備送出訂單資料:', orderData);